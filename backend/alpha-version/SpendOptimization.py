@@ -1,7 +1,656 @@
-from scipy.optimize import minimize
+from scipy.optimize import minimize, milp, Bounds, LinearConstraint
+from scipy import sparse
 import pandas as pd
 import numpy as np
+import json
+import logging
 import os
+import time
+
+# Shared with the /optimize service; backend/ must be on the import path.
+from monte_carlo import MONTE_CARLO_CHUNK_BYTES, RISK_PERCENTILES, covariance_factor, sampled_totals, summarize_returns
+
+GRADIENT_FLOOR = 1e-6
+WATER_FILL_ITERATIONS = 64
+ENGINES = ('auto', 'water_filling', 'slsqp', 'trust_constr', 'piecewise')
+OUTPUT_FORMATS = ('nested', 'columnar')
+# Dollars off the bounds and budget at which a local solve that did not
+# converge still counts as a near-feasible allocation.
+NEAR_FEASIBLE_SLACK = 5
+# Piecewise-linear engine: initial segments per curve, the relative gap to
+# its bound at which it stops, and its round and time budget.
+PIECEWISE_SEGMENTS = 4
+PIECEWISE_TOLERANCE = 1e-4
+PIECEWISE_MAX_ROUNDS = 30
+PIECEWISE_TIME_LIMIT = 60
+
+logger = logging.getLogger(__name__)
+
+
+def is_concave(coef, beta):
+    """True when every curve term ``coef * x**beta`` is concave on x >= 0."""
+    return bool(np.all((coef == 0) | ((coef > 0) & (beta > 0) & (beta <= 1))))
+
+
+def choose_engine(coef, beta, n_vars):
+    """Engine the 'auto' policy runs for these curves: ``(engine, reason)``."""
+    if is_concave(coef, beta):
+        return 'water_filling', "concave response curves"
+    return 'piecewise', f"non-concave curves, {n_vars} variables"
+
+
+def constraint_violation(x, lower, upper, constraint):
+    """Largest amount by which ``x`` breaks its bounds or the rows of ``constraint``."""
+    rows = constraint.A @ x
+    return float(max(
+        0.0,
+        np.max(lower - x), np.max(x - upper),
+        np.max(constraint.lb - rows), np.max(rows - constraint.ub),
+    ))
+
+
+def feasibility_report(brands, medias, periods, lower, upper, locked, budget, brand_lower, brand_upper):
+    """
+    Check the bounds of a problem against each other and the budget in
+    linear time, before any solver runs.
+
+    ``lower``, ``upper`` and the ``locked`` mask are per variable in
+    (brand, media, period) order; ``brand_lower``/``brand_upper`` per brand.
+    Returns ``{'feasible', 'conflicts'}`` where every conflict names its
+    type and the brand/media/period entries involved.
+    """
+    B, M, T = len(brands), len(medias), len(periods)
+    tolerance = 1e-9 * max(1.0, abs(budget))
+    conflicts = []
+
+    def entry(i):
+        return {'brand': brands[i // (M * T)], 'media': medias[(i // T) % M], 'period': periods[i % T]}
+
+    for i in np.flatnonzero(lower > upper + tolerance):
+        conflicts.append({'type': 'lower_above_upper', **entry(i),
+                          'lower': float(lower[i]), 'upper': float(upper[i])})
+    for b in np.flatnonzero(brand_lower > brand_upper + tolerance):
+        conflicts.append({'type': 'brand_lower_above_upper', 'brand': brands[b],
+                          'lower': float(brand_lower[b]), 'upper': float(brand_upper[b])})
+
+    brand_min = lower.reshape(B, -1).sum(axis=1)
+    brand_max = upper.reshape(B, -1).sum(axis=1)
+    for b in np.flatnonzero(brand_min > brand_upper + tolerance):
+        conflicts.append({'type': 'brand_lower_bounds_over_cap', 'brand': brands[b],
+                          'lower': float(brand_min[b]), 'upper': float(brand_upper[b])})
+    for b in np.flatnonzero(brand_max < brand_lower - tolerance):
+        conflicts.append({'type': 'brand_upper_bounds_under_minimum', 'brand': brands[b],
+                          'upper': float(brand_max[b]), 'lower': float(brand_lower[b])})
+
+    locked_total = float(lower[locked].sum())
+    if locked_total > budget + tolerance:
+        conflicts.append({'type': 'locked_over_budget', 'locked': locked_total, 'budget': budget,
+                          'entries': [entry(i) for i in np.flatnonzero(locked & (lower > 0))]})
+    else:
+        required = float(np.maximum(brand_min, brand_lower).sum())
+        if required > budget + tolerance:
+            conflicts.append({'type': 'lower_bounds_over_budget', 'required': required, 'budget': budget,
+                              'brands': [brands[b] for b in np.flatnonzero(np.maximum(brand_min, brand_lower) > 0)]})
+
+    return {'feasible': not conflicts, 'conflicts': conflicts}
+
+
+def _spend_at_price(price, coef, beta, lower, upper):
+    # Per-variable maximizer of coef * x**beta - price * x on [lower, upper].
+    with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+        interior = (coef * beta / price) ** (1 / (1 - beta))
+        x = np.where((coef > 0) & (beta < 1), interior, np.where(coef > price, upper, lower))
+        x = np.where(price <= 0, np.where((coef > 0) | (price < 0), upper, lower), x)
+    return np.clip(x, lower, upper)
+
+
+def _spend_at_group_sums(target, coef, beta, lower, upper, groups):
+    """
+    Spend that makes each group's sum equal ``target[g]``, found by
+    bisecting one price per group. Only meaningful for groups whose target
+    lies between the sums of their lower and upper bounds.
+    """
+    n_groups = len(target)
+
+    def spend(prices):
+        x = _spend_at_price(prices[groups], coef, beta, lower, upper)
+        return x, np.bincount(groups, weights=x, minlength=n_groups)
+
+    # Groups whose target is at or beyond their bound sums never bind.
+    binding = (
+        (target > np.bincount(groups, weights=lower, minlength=n_groups))
+        & (target < np.bincount(groups, weights=upper, minlength=n_groups))
+    )
+    # lo is a price whose group sum is >= target, hi one whose sum is <= target.
+    lo = np.full(n_groups, -1.0)
+    hi = np.ones(n_groups)
+    for _ in range(2048):
+        _, sums = spend(hi)
+        grow = binding & (sums > target)
+        if not grow.any():
+            break
+        hi = np.where(grow, hi * 2, hi)
+    for _ in range(WATER_FILL_ITERATIONS):
+        mid = (lo + hi) / 2
+        _, sums = spend(mid)
+        take_lo = sums >= target
+        lo = np.where(take_lo, mid, lo)
+        hi = np.where(take_lo, hi, mid)
+
+    x_lo, sums_lo = spend(lo)
+    x_hi, sums_hi = spend(hi)
+    gap = sums_lo - sums_hi
+    theta = np.divide(target - sums_hi, gap, out=np.zeros(n_groups), where=gap > 0)
+    return x_hi + np.clip(theta, 0, 1)[groups] * (x_lo - x_hi)
+
+
+def water_fill(coef, beta, lower, upper, budget, groups, group_lower, group_upper):
+    """
+    Exact allocation for concave curves by Lagrangian water-filling.
+
+    Maximizes ``sum(coef * x**beta)`` subject to ``lower <= x <= upper``,
+    ``sum(x) <= budget`` and ``group_lower <= sum(x[groups == g]) <=
+    group_upper``. At a budget multiplier every variable has a closed-form
+    spend; a group whose sum would leave its bounds is held at the spend
+    that puts it exactly on the bound. The multiplier is bisected a fixed
+    number of times and the two bracketing allocations are blended so the
+    budget is met exactly. Raises ValueError when the bounds cannot be met.
+    """
+    upper = np.minimum(upper, budget)
+    group_upper = np.minimum(group_upper, budget)
+    n_groups = len(group_lower)
+    group_lower_sum = np.bincount(groups, weights=lower, minlength=n_groups)
+    group_upper_sum = np.bincount(groups, weights=upper, minlength=n_groups)
+    if np.any(lower > upper) or np.any(group_lower > group_upper):
+        raise ValueError("A lower bound is greater than its upper bound.")
+    if np.any(group_lower_sum > group_upper) or np.any(group_upper_sum < group_lower):
+        raise ValueError("Brand-level bounds cannot be met within the media-level bounds.")
+    if np.maximum(group_lower_sum, group_lower).sum() > budget:
+        raise ValueError(f"Lower bounds exceed total budget ({budget}).")
+
+    at_upper = _spend_at_group_sums(group_upper, coef, beta, lower, upper, groups)
+    at_lower = _spend_at_group_sums(group_lower, coef, beta, lower, upper, groups)
+
+    def fill(lam):
+        x = _spend_at_price(np.full(len(coef), lam), coef, beta, lower, upper)
+        sums = np.bincount(groups, weights=x, minlength=n_groups)
+        x = np.where((sums > group_upper)[groups], at_upper, x)
+        return np.where((sums < group_lower)[groups], at_lower, x)
+
+    x = fill(0.0)
+    if x.sum() <= budget:
+        return x
+
+    hi = 1.0
+    while fill(hi).sum() > budget:
+        hi *= 2
+    lo = hi / 2
+    if hi == 1.0:
+        while lo > 1e-300 and fill(lo).sum() <= budget:
+            hi, lo = lo, lo / 2
+    for _ in range(WATER_FILL_ITERATIONS):
+        mid = (lo + hi) / 2
+        if fill(mid).sum() > budget:
+            lo = mid
+        else:
+            hi = mid
+
+    x_lo, x_hi = fill(lo), fill(hi)
+    gap = x_lo.sum() - x_hi.sum()
+    theta = (budget - x_hi.sum()) / gap if gap > 0 else 0.0
+    return x_hi + min(max(theta, 0.0), 1.0) * (x_lo - x_hi)
+
+
+def _tangents(points, coef, beta):
+    # (slope, intercept) of the tangents to coef * x**beta at ``points`` (all > 0).
+    slope = coef * beta * points ** (beta - 1)
+    return slope, coef * points ** beta - slope * points
+
+
+def piecewise_milp(coef, beta, lower, upper, constraint, tolerance=PIECEWISE_TOLERANCE,
+                   max_rounds=PIECEWISE_MAX_ROUNDS, time_limit=PIECEWISE_TIME_LIMIT, progress=None):
+    """
+    Global allocation for curves of any shape by piecewise-linear MILPs.
+
+    Maximizes ``sum(coef * x**beta)`` subject to ``lower <= x <= upper``
+    and the rows of the LinearConstraint ``constraint``. Every curve is
+    replaced by a piecewise-linear function that lies above it: tangents
+    for the concave ones and chords over a breakpoint grid, with one binary
+    per segment, for the convex ones (Beta > 1 for a positive ``coef``). The MILP's
+    bound is then an upper bound on the true optimum, and the true return
+    of its solution a lower bound. Each round adds a breakpoint (or
+    tangent) at the incumbent of every curve the approximation overstates
+    there, until the relative gap is within ``tolerance``, ``max_rounds``
+    MILPs have been solved or ``time_limit`` seconds have passed.
+
+    Returns ``(x, stats)``; ``stats`` has the ``rounds``, upper ``bound``,
+    relative ``gap`` and number of ``breakpoints`` in the last model.
+    ``progress`` is called after every round like the other engines'.
+    """
+    start = time.perf_counter()
+    n = len(coef)
+    rows = sparse.coo_array(constraint.A)
+    row_ub = np.asarray(constraint.ub, dtype=float)
+    # A spend never exceeds the upper bound of a row it is in (all
+    # coefficients are 1), which caps the grid of curves without an upper bound.
+    cap = np.full(n, np.inf)
+    np.minimum.at(cap, rows.col, row_ub[rows.row])
+    cap = np.minimum(upper, cap)
+
+    active = (coef != 0) & (cap > lower)
+    bends_down = coef * beta * (beta - 1) <= 0
+    concave = np.flatnonzero(active & bends_down)
+    convex = np.flatnonzero(active & ~bends_down)
+    fixed = (coef != 0) & ~active
+    fixed_return = float(np.sum(coef[fixed] * np.maximum(lower[fixed], 0) ** beta[fixed]))
+    width = np.where(active, cap - lower, 0.0)
+    # Convex curves start on a uniform grid, concave ones with tangents at its midpoints.
+    grid = lower[:, None] + width[:, None] * np.linspace(0, 1, PIECEWISE_SEGMENTS + 1)
+    points = {i: list(grid[i]) for i in convex}
+    points.update({i: list((grid[i, 1:] + grid[i, :-1]) / 2) for i in concave})
+    t_col = n + np.arange(len(concave))
+
+    best_x, best_value, bound, gap = None, -np.inf, np.inf, np.inf
+    rounds = 0
+    while rounds < max_rounds:
+        remaining = time_limit - (time.perf_counter() - start)
+        if remaining <= 0:
+            break
+        rounds += 1
+
+        # Columns: x, one t per concave curve (its return), then the segment
+        # lengths d and segment binaries z of every convex curve.
+        c = [np.zeros(n), -np.ones(len(concave))]
+        col_lower = [lower, np.full(len(concave), -np.inf)]
+        col_upper = [cap, np.full(len(concave), np.inf)]
+        integrality = [np.zeros(n + len(concave))]
+        r_idx, c_idx, vals = [rows.row], [rows.col], [rows.data]
+        row_lower = [np.asarray(constraint.lb, dtype=float)]
+        row_upper = [row_ub]
+        n_rows, n_cols = constraint.A.shape[0], n + len(concave)
+        constant = fixed_return
+        segments = {}
+
+        for j, i in enumerate(concave):
+            slope, intercept = _tangents(np.maximum(points[i], GRADIENT_FLOOR), coef[i], beta[i])
+            k = len(slope)
+            # t - slope * x <= intercept for every tangent
+            r = n_rows + np.arange(k)
+            r_idx += [r, r]
+            c_idx += [np.full(k, t_col[j]), np.full(k, i)]
+            vals += [np.ones(k), -slope]
+            row_lower.append(np.full(k, -np.inf))
+            row_upper.append(intercept)
+            n_rows += k
+
+        for i in convex:
+            p = np.array(points[i])
+            f = coef[i] * p ** beta[i]
+            length = np.diff(p)
+            slope = np.diff(f) / length
+            k = len(length)
+            d = n_cols + np.arange(k)
+            z = n_cols + k + np.arange(k - 1)
+            n_cols += 2 * k - 1
+            segments[i] = (d, slope, f[0])
+            constant += f[0]
+            c += [-slope, np.zeros(k - 1)]
+            col_lower.append(np.zeros(2 * k - 1))
+            col_upper.append(np.concatenate([length, np.ones(k - 1)]))
+            integrality.append(np.concatenate([np.zeros(k), np.ones(k - 1)]))
+            # x - sum(d) = first breakpoint
+            r_idx.append(np.full(k + 1, n_rows))
+            c_idx.append(np.concatenate([[i], d]))
+            vals.append(np.concatenate([[1.0], -np.ones(k)]))
+            row_lower.append([p[0]])
+            row_upper.append([p[0]])
+            n_rows += 1
+            # Segments fill in order: d[s] >= length[s] * z[s] and d[s + 1] <= length[s + 1] * z[s]
+            r = n_rows + np.arange(k - 1)
+            r_idx += [r, r, r + k - 1, r + k - 1]
+            c_idx += [d[:-1], z, d[1:], z]
+            vals += [np.ones(k - 1), -length[:-1], np.ones(k - 1), -length[1:]]
+            row_lower += [np.zeros(k - 1), np.full(k - 1, -np.inf)]
+            row_upper += [np.full(k - 1, np.inf), np.zeros(k - 1)]
+            n_rows += 2 * (k - 1)
+
+        A = sparse.csr_array(
+            (np.concatenate(vals), (np.concatenate(r_idx), np.concatenate(c_idx))),
+            shape=(n_rows, n_cols),
+        )
+        res = milp(
+            np.concatenate(c),
+            integrality=np.concatenate(integrality),
+            bounds=Bounds(np.concatenate(col_lower), np.concatenate(col_upper)),
+            constraints=LinearConstraint(A, np.concatenate(row_lower), np.concatenate(row_upper)),
+            options={"disp": False, "time_limit": remaining, "mip_rel_gap": tolerance / 4},
+        )
+        if res.x is None:
+            break
+
+        x = np.clip(res.x[:n], lower, upper)
+        value = float(np.dot(coef, np.maximum(x, 0) ** beta))
+        if value > best_value:
+            best_x, best_value = x, value
+        dual_bound = getattr(res, "mip_dual_bound", None)
+        bound = min(bound, constant - (res.fun if dual_bound is None else dual_bound))
+        gap = max(bound - best_value, 0.0) / max(abs(bound), 1e-12)
+        if progress is not None:
+            progress({
+                "iteration": rounds,
+                "objective": best_value,
+                "bound": bound,
+                "violation": constraint_violation(best_x, lower, upper, constraint),
+                "elapsed": time.perf_counter() - start,
+            })
+        if gap <= tolerance:
+            break
+
+        # Refine every curve the model overstates at the incumbent.
+        curves = np.concatenate([concave, convex]).astype(int)
+        estimate = np.empty(n)
+        estimate[concave] = res.x[t_col]
+        for i, (d, slope, first) in segments.items():
+            estimate[i] = first + np.dot(slope, res.x[d])
+        excess = estimate[curves] - coef[curves] * np.maximum(x[curves], 0) ** beta[curves]
+        threshold = tolerance * abs(bound) / max(len(curves), 1)
+        refined = False
+        for i in curves[excess > threshold]:
+            if np.min(np.abs(np.array(points[i]) - x[i])) > 1e-9 * max(width[i], 1.0):
+                points[i] = sorted(points[i] + [x[i]])
+                refined = True
+        if not refined:
+            break
+
+    if best_x is None:
+        raise ValueError("The piecewise-linear model found no allocation within the time limit.")
+    stats = {
+        "rounds": rounds,
+        "bound": float(bound),
+        "gap": float(gap),
+        "breakpoints": sum(len(p) for p in points.values()),
+    }
+    return best_x, stats
+
+
+def monte_carlo_returns(x, coef, curve, alpha, beta, draws=None, factor=None, samples=0, seed=None,
+                        chunk_bytes=MONTE_CARLO_CHUNK_BYTES):
+    """
+    Total return of the allocation ``x`` for sampled curve parameters, one
+    total per sample.
+
+    Variable ``i`` lies on curve ``curve[i]``, fitted as ``alpha[c]`` and
+    ``beta[c]``, and ``coef[i]`` is its alpha * Base * Price. A sample
+    holds an (alpha, beta) pair per curve: either the rows of ``draws``
+    (samples x curves x 2) or the fitted values plus ``factor @ z`` for
+    standard normal ``z``. ``factor`` factors the covariance of either
+    every curve's pair on its own (curves x 2 x 2) or the whole vector
+    (alpha_0, beta_0, alpha_1, ...). Samples are evaluated a chunk at a
+    time, each as one samples x variables array pass of at most
+    ``chunk_bytes``.
+    """
+    spend = x > 0
+    curve = curve[spend]
+    log_x = np.log(x[spend])
+    # Base * Price of every spent variable; no curve (alpha 0) means no return.
+    fitted = alpha[curve]
+    scale = np.divide(coef[spend], fitted, out=np.zeros(len(curve)), where=fitted != 0)
+    nominal = np.stack([alpha, beta], axis=-1)
+    n_curves = len(alpha)
+    row_bytes = 8 * 3 * max(len(curve), 2 * n_curves, 1)
+
+    def totals(params):
+        return (params[:, curve, 0] * scale * np.exp(params[:, curve, 1] * log_x)).sum(axis=1)
+
+    def perturbed_totals(z):
+        if factor.ndim == 3:
+            deltas = np.einsum('pij,kpj->kpi', factor, z)
+        else:
+            deltas = (z.reshape(len(z), -1) @ factor.T).reshape(z.shape)
+        return totals(nominal + deltas)
+
+    if draws is not None:
+        return sampled_totals(totals, row_bytes, draws=draws, chunk_bytes=chunk_bytes)
+    return sampled_totals(perturbed_totals, row_bytes, shape=(n_curves, 2),
+                          samples=samples, seed=seed, chunk_bytes=chunk_bytes)
+
+
+SNAPSHOT_FORMAT = 2
+SNAPSHOT_ARRAYS = ('coef', 'alpha', 'beta', 'base', 'has_curve', 'has_base', 'prior_spending')
+
+
+class OptimizationDocument:
+    """
+    Columnar form of Optimization_document.xlsx.
+
+    ``brands``, ``medias`` and ``periods`` are the index tables (lower-cased
+    brand and media names, integer periods). The parameter arrays are dense:
+    ``coef[b, m, t]`` is ``alpha * Base * Price``, ``alpha[b, m]`` the fitted
+    alpha, ``beta[b, m, t]`` the curve exponent, ``base[b, t]`` the Base value, ``prior_spending[b, m, t]``
+    the 'Media Spending in prior year' value, and ``has_curve[b, m]`` /
+    ``has_base[b, t]`` mark which rows the workbook actually had.
+    """
+
+    def __init__(self, brands, medias, periods, arrays, source=None):
+        self.brands = list(brands)
+        self.medias = list(medias)
+        self.periods = [int(t) for t in periods]
+        self.arrays = arrays
+        self.source = source or {}
+        self.brand_idx = {b: i for i, b in enumerate(self.brands)}
+        self.media_idx = {m: i for i, m in enumerate(self.medias)}
+        self.period_idx = {t: i for i, t in enumerate(self.periods)}
+
+    @classmethod
+    def from_workbook(cls, file_path):
+        sheet_names = pd.ExcelFile(file_path).sheet_names
+        wanted = ['Base', 'Response Curve parameters']
+        if 'Media Spending in prior year' in sheet_names:
+            wanted.append('Media Spending in prior year')
+        sheets = pd.read_excel(file_path, sheet_name=wanted)
+        base = sheets['Base']
+        curve_df = sheets['Response Curve parameters']
+
+        base_brand = base['Brand'].str.lower()
+        curve_brand = curve_df['Brand'].str.lower()
+        curve_media = curve_df['media type'].str.lower()
+        brands = list(base_brand.unique())
+        medias = list(curve_media.unique())
+        periods = [int(t) for t in base['Period'].unique()]
+        brand_idx = {b: i for i, b in enumerate(brands)}
+        media_idx = {m: i for i, m in enumerate(medias)}
+        period_idx = {t: i for i, t in enumerate(periods)}
+        B, M, T = len(brands), len(medias), len(periods)
+
+        # Curve rows for brands without Base rows have no variables; drop them.
+        alpha = np.zeros((B, M))
+        beta = np.ones((B, M))
+        has_curve = np.zeros((B, M), dtype=bool)
+        curve_b = curve_brand.map(brand_idx)
+        known = curve_b.notna().to_numpy()
+        curve_b = curve_b[known].astype(int).to_numpy()
+        curve_m = curve_media[known].map(media_idx).astype(int).to_numpy()
+        alpha[curve_b, curve_m] = curve_df['alpha'].to_numpy(dtype=float)[known]
+        beta[curve_b, curve_m] = curve_df['Beta'].to_numpy(dtype=float)[known]
+        has_curve[curve_b, curve_m] = True
+
+        base_bt = np.zeros((B, T))
+        price_bt = np.zeros((B, T))
+        has_base = np.zeros((B, T), dtype=bool)
+        base_b = base_brand.map(brand_idx).astype(int).to_numpy()
+        base_t = base['Period'].astype(int).map(period_idx).astype(int).to_numpy()
+        base_bt[base_b, base_t] = base['Base'].to_numpy(dtype=float)
+        price_bt[base_b, base_t] = base['Price'].to_numpy(dtype=float)
+        has_base[base_b, base_t] = True
+
+        prior = np.zeros((B, M, T))
+        if 'Media Spending in prior year' in sheets:
+            prior_df = sheets['Media Spending in prior year']
+            prior_b = prior_df['Brand'].str.lower().map(brand_idx)
+            prior_m = prior_df['media'].str.lower().map(media_idx)
+            prior_t = prior_df['period'].astype(int).map(period_idx)
+            known = (prior_b.notna() & prior_m.notna() & prior_t.notna()).to_numpy()
+            prior[prior_b[known].astype(int), prior_m[known].astype(int), prior_t[known].astype(int)] = (
+                prior_df['spending'].to_numpy(dtype=float)[known]
+            )
+
+        arrays = {
+            'coef': alpha[:, :, None] * (base_bt * price_bt)[:, None, :],
+            'alpha': alpha,
+            'beta': np.broadcast_to(beta[:, :, None], (B, M, T)).copy(),
+            'base': base_bt,
+            'has_curve': has_curve,
+            'has_base': has_base,
+            'prior_spending': prior,
+        }
+        stat = os.stat(file_path)
+        source = {'path': os.path.basename(file_path), 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+        return cls(brands, medias, periods, arrays, source)
+
+    def save(self, snapshot_dir):
+        """Write the snapshot: one .npy per array plus meta.json with the index tables."""
+        os.makedirs(snapshot_dir, exist_ok=True)
+        for name in SNAPSHOT_ARRAYS:
+            np.save(os.path.join(snapshot_dir, name + '.npy'), np.ascontiguousarray(self.arrays[name]))
+        meta = {
+            'format': SNAPSHOT_FORMAT,
+            'brands': self.brands,
+            'medias': self.medias,
+            'periods': self.periods,
+            'source': self.source,
+        }
+        with open(os.path.join(snapshot_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, snapshot_dir):
+        """Memory-map a snapshot written by ``save``; None if it is missing or of another format."""
+        meta_path = os.path.join(snapshot_dir, 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get('format') != SNAPSHOT_FORMAT:
+            return None
+        arrays = {
+            name: np.load(os.path.join(snapshot_dir, name + '.npy'), mmap_mode='r')
+            for name in SNAPSHOT_ARRAYS
+        }
+        return cls(meta['brands'], meta['medias'], meta['periods'], arrays, meta.get('source'))
+
+    def is_current(self, file_path):
+        """True if the snapshot was compiled from the workbook as it is now (or the workbook is gone)."""
+        if not os.path.exists(file_path):
+            return True
+        stat = os.stat(file_path)
+        return (self.source.get('mtime_ns'), self.source.get('size')) == (stat.st_mtime_ns, stat.st_size)
+
+    def select(self, brand):
+        """
+        Index tables and parameter arrays for one brand (or 'all').
+
+        Returns ``(brands, medias, periods, coef, beta, base, prior_spending)``
+        restricted to the brand's Base periods and Response Curve medias.
+        """
+        if brand == 'all':
+            b_sel = np.arange(len(self.brands))
+            m_sel = np.arange(len(self.medias))
+            t_sel = np.arange(len(self.periods))
+        elif brand in self.brand_idx:
+            b = self.brand_idx[brand]
+            b_sel = np.array([b])
+            m_sel = np.flatnonzero(self.arrays['has_curve'][b])
+            t_sel = np.flatnonzero(self.arrays['has_base'][b])
+        else:
+            b_sel = m_sel = t_sel = np.array([], dtype=int)
+        grid = np.ix_(b_sel, m_sel, t_sel)
+        return (
+            [self.brands[i] for i in b_sel],
+            [self.medias[i] for i in m_sel],
+            [self.periods[i] for i in t_sel],
+            np.asarray(self.arrays['coef'][grid], dtype=float),
+            np.asarray(self.arrays['beta'][grid], dtype=float),
+            np.asarray(self.arrays['base'][np.ix_(b_sel, t_sel)], dtype=float),
+            np.asarray(self.arrays['prior_spending'][grid], dtype=float),
+        )
+
+    def curve_alpha(self, brands, medias):
+        """Fitted alpha of every (brand, media) curve, as a brands x medias array."""
+        grid = np.ix_([self.brand_idx[b] for b in brands], [self.media_idx[m] for m in medias])
+        return np.asarray(self.arrays['alpha'][grid], dtype=float)
+
+    def prior_spending(self, brand, media, period):
+        b = self.brand_idx.get(brand)
+        m = self.media_idx.get(media)
+        t = self.period_idx.get(int(period))
+        if b is None or m is None or t is None:
+            return 0
+        return float(self.arrays['prior_spending'][b, m, t])
+
+
+def nested_output(brands, medias, periods, spending, returns):
+    """
+    The brand -> media -> period dict of ``run``'s result, built from the
+    spending and return arrays (brands x medias x periods) in one pass.
+    """
+    spending = spending.tolist()
+    returns = returns.tolist()
+    return {
+        b: {
+            m: {
+                t: {'optimal_spending': s, 'incremental_dollar': r}
+                for t, s, r in zip(periods, spending[bi][mi], returns[bi][mi])
+            }
+            for mi, m in enumerate(medias)
+        }
+        for bi, b in enumerate(brands)
+    }
+
+
+def output_arrays(output, brands, medias, periods, key='optimal_spending'):
+    """
+    ``key`` of every (brand, media, period) of a nested or columnar output,
+    as a flat array in that order; NaN where the output has no value.
+    """
+    if isinstance(output.get(key), np.ndarray):
+        values = np.full((len(brands), len(medias), len(periods)), np.nan)
+        axes = []
+        for wanted, have in ((brands, output['brands']), (medias, output['medias']), (periods, output['periods'])):
+            position = {name: i for i, name in enumerate(have)}
+            axes.append(([i for i, name in enumerate(wanted) if name in position],
+                         [position[name] for name in wanted if name in position]))
+        values[np.ix_(*(to for to, _ in axes))] = output[key][np.ix_(*(frm for _, frm in axes))]
+        return values.ravel()
+    return np.array([
+        output.get(b, {}).get(m, {}).get(t, {}).get(key, np.nan)
+        for b in brands for m in medias for t in periods
+    ], dtype=float)
+
+
+def snapshot_path(file_path):
+    return os.path.splitext(file_path)[0] + '.snapshot'
+
+
+_documents = {}
+
+
+def load_document(file_path):
+    """
+    OptimizationDocument for ``file_path``, cached per process.
+
+    A snapshot compiled next to the workbook (see compile_snapshot.py) is
+    memory-mapped when it is current; otherwise the workbook is parsed.
+    """
+    cached = _documents.get(file_path)
+    if cached is not None and cached.is_current(file_path):
+        return cached
+    document = OptimizationDocument.load(snapshot_path(file_path))
+    if document is None or not document.is_current(file_path):
+        if document is not None:
+            logger.info("Snapshot %s is out of date; reading %s", snapshot_path(file_path), file_path)
+        document = OptimizationDocument.from_workbook(file_path)
+    _documents[file_path] = document
+    return document
 
 
 class SpendOptimization:
@@ -66,6 +715,13 @@ class SpendOptimization:
         Brand name for which to run optimization. Can be one of:
         'all', 'grizzly', 'izervay'..etc.
 
+    engine : str
+        'auto' (default) uses exact water-filling when every response curve
+        is concave (0 < Beta <= 1) and the global piecewise-linear MILP
+        otherwise; 'water_filling', 'piecewise', 'slsqp' and 'trust_constr'
+        force one of them. SLSQP and trust-constr only find a local
+        optimum, but they can warm-start from an earlier run.
+
     """
 
     def __init__(
@@ -75,7 +731,8 @@ class SpendOptimization:
         media_budget_limits_pct,
         locked_media_allocations,
         brand,
-        brand_budget_constraints
+        brand_budget_constraints,
+        engine='auto'
     ):
         self.budget = budget
         self.media_budget_limits = media_budget_limits
@@ -83,401 +740,382 @@ class SpendOptimization:
         self.locked_media_allocations = locked_media_allocations
         self.brand = brand.lower()
         self.brand_budget_constraints = brand_budget_constraints
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {engine}. Use one of {', '.join(ENGINES)}.")
+        self.engine = engine
+
+    def run(self, warm_start=None, progress=None, output_format='nested'):
+        """
+        Optimize and return ``{'output', 'total_return', 'engine'}``.
+
+        ``output`` is the brand -> media -> period dict of ``optimal_spending``
+        and ``incremental_dollar`` by default; ``output_format='columnar'``
+        returns the ``brands``, ``medias`` and ``periods`` lists and the two
+        values as brands x medias x periods arrays instead, which is much
+        cheaper to build and serialize for large portfolios.
+
+        ``warm_start`` may be the result of an earlier run of a similar
+        scenario (e.g. after changing one lock or bound); SLSQP then starts
+        from its spending instead of the fair-share guess.
+
+        ``progress`` is called with a dict of ``iteration``, ``objective``,
+        ``violation`` and ``elapsed`` after every SLSQP or trust-constr
+        iteration, every piecewise round (with its ``bound`` too) and once
+        for water-filling; an exception raised from it aborts the run.
+
+        ``backend`` in the result records the engine asked for, the one that
+        ran, why, and its solve time. The piecewise engine adds its
+        ``piecewise`` stats (see ``piecewise_milp``).
 
-    def run(self):
+        ``status`` is 'optimal', or for the local engines 'near_feasible'
+        when they stopped within ``NEAR_FEASIBLE_SLACK`` dollars of the
+        bounds and budget without converging and 'failed' when they stopped
+        further off.
+
+        Bounds that cannot all hold are reported instead of solved: the
+        result then has ``output`` None, ``status`` 'infeasible' and the
+        conflicts under ``feasibility`` (see ``feasibility_report``).
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {output_format}. Use one of {', '.join(OUTPUT_FORMATS)}.")
         if self.media_budget_limits and self.media_budget_limits_pct:
             raise ValueError("Only one limit set is allowed. " \
             "Please specify either fixed limits or percentage limits , not both.")
-        print("Current working directory:", os.getcwd())
+        logger.debug("Current working directory: %s", os.getcwd())
         file_path = os.path.join(os.getcwd(),'Optimization_document.xlsx')
-        base = pd.read_excel(file_path, sheet_name='Base')
-        curve_df = pd.read_excel(file_path, sheet_name='Response Curve parameters')
+        start = time.perf_counter()
+        document = load_document(file_path)
+        load_time = time.perf_counter() - start
         brand_map = {'veozah': 'veozah', 'grizzly': 'grizzly', 'izervay': 'izervay','xtandi':'xtandi'}
-        
-        # checking constraints 
-        self.validate_bounds(file_path=file_path)
 
         # brand level 
         if self.brand == 'all':
-            filtered_curve_df = curve_df
-            filtered_base = base
+            selected = document.select('all')
         elif self.brand in brand_map:
-            filtered_curve_df = curve_df[curve_df['Brand'].str.lower() == brand_map[self.brand]]
-            filtered_base = base[base['Brand'].str.lower() == brand_map[self.brand]]
+            selected = document.select(brand_map[self.brand])
         else:
             raise KeyError(f'Unknown brand: {self.brand}')
-        
-        filtered_base['Brand'] = filtered_base['Brand'].str.lower()
-        filtered_curve_df['Brand'] = filtered_curve_df['Brand'].str.lower()
-        filtered_curve_df['media type'] = filtered_curve_df['media type'].str.lower()
-
-        brands = filtered_base['Brand'].unique()
-        medias = filtered_curve_df['media type'].unique()
-        periods = filtered_base['Period'].unique()
+        brands, medias, periods, coef, beta, base_bt, prior_spending = selected
 
         brand_idx = {b: i for i, b in enumerate(brands)}
         media_idx = {m: i for i, m in enumerate(medias)}
         period_idx = {t: i for i, t in enumerate(periods)}
 
-        curve_dict = {
-            (row['Brand'], row['media type']): {'alpha': row['alpha'], 'beta': row['Beta']}
-            for _, row in filtered_curve_df.iterrows()
-        }
-        base_lookup = {
-            (row['Brand'], row['Period']): row['Base']
-            for _, row in filtered_base.iterrows()
-        }
-        price_lookup = {
-            (row['Brand'], row['Period']): row['Price']
-            for _, row in filtered_base.iterrows()
-        }
-        
         # Assign unique identifier to create decision variables
         B, M, T = len(brands), len(medias), len(periods)
         n_vars = B * M * T
 
-        def idx(b, m, t):
-            return brand_idx[b] * (M * T) + media_idx[m] * T + period_idx[t]
+        # Variable i is the C-order flat index of (brand, media, period).
+        coef = coef.ravel()
+        beta = beta.ravel()
 
         def objective(x):
-            total = 0
-            for b in brands:
-                for m in medias:
-                    for t in periods:
-                        i = idx(b, m, t)
-                        val = x[i]
-                        params = curve_dict.get((b, m))
-                        if params is None:
-                            continue
-                        base_val = base_lookup.get((b, t), 0)
-                        price = price_lookup.get((b, t), 0)
-                        beta = params.get('beta', 1)
-                        alpha = params.get('alpha', 0)
-                        if val > 0:
-                            total += alpha * (val ** beta) * base_val * price
-                        else:
-                            total += 0                       
-            return -total
-
-        # Setup constraints
-        constraints = []
-
-        # Total budget constraint: total spend ≤ budget
+            return -np.dot(coef, np.maximum(x, 0) ** beta)
+
+        def gradient(x):
+            # d/dx of x**beta is unbounded at 0 for beta < 1; evaluate it at a
+            # small positive spend there instead.
+            return -coef * beta * np.maximum(x, GRADIENT_FLOOR) ** (beta - 1)
+
+        def hessian_diagonal(x):
+            # The objective is separable, so its Hessian is diagonal.
+            return -coef * beta * (beta - 1) * np.maximum(x, GRADIENT_FLOOR) ** (beta - 2)
+
+        # Setup constraints: one sparse matrix for the total budget row
+        # (row 0) and the brand-sum rows.
         total_budget = self.budget
-        constraints.append({
-            'type': 'ineq',
-            'fun': lambda x: total_budget - np.sum(x)
-        })
+        constrained_brands = []
+        row_lower = [-np.inf]
+        row_upper = [total_budget]
 
         # Initialize bounds as usual
-        bounds = [(0, None)] * n_vars
+        lower = np.zeros(n_vars)
+        upper = np.full(n_vars, np.inf)
+        locked = np.zeros(n_vars, dtype=bool)
 
         if self.brand_budget_constraints:
             for brand in brands:
-                indices = [idx(brand, m, t) for m in medias for t in periods]
-
-                if brand in self.brand_budget_constraints:
-                    low = self.brand_budget_constraints[brand].get('lower bound', 0)
-                    high = self.brand_budget_constraints[brand].get('upper bound', self.budget)
-
-                    # If brand upper bound is 0, fix all related variables to 0
-                    if high == 0:
-                        for i in indices:
-                            bounds[i] = (0, 0)
-                    else:
-                        pass
-
-                    # Add brand sum constraints
-                    constraints.append({
-                        'type': 'ineq',
-                        'fun': lambda x, i=indices, h=high: h - sum(x[j] for j in i)
-                    })
-                    constraints.append({
-                        'type': 'ineq',
-                        'fun': lambda x, i=indices, l=low: sum(x[j] for j in i) - l
-                    })
+                if brand not in self.brand_budget_constraints:
+                    continue
+                b = brand_idx[brand]
+                low = self.brand_budget_constraints[brand].get('lower bound', 0)
+                high = self.brand_budget_constraints[brand].get('upper bound', self.budget)
+
+                # If brand upper bound is 0, fix all related variables to 0
+                if high == 0:
+                    upper[b * M * T:(b + 1) * M * T] = 0
+
+                # Add brand sum constraints
+                constrained_brands.append(b)
+                row_lower.append(low)
+                row_upper.append(high)
+
+        brand_rows = np.repeat(np.arange(1, len(constrained_brands) + 1), M * T)
+        brand_cols = (np.array(constrained_brands, dtype=int)[:, None] * M * T + np.arange(M * T)).ravel()
+        A = sparse.csr_array(
+            (np.ones(n_vars + len(brand_cols)),
+             (np.concatenate([np.zeros(n_vars, dtype=int), brand_rows]),
+              np.concatenate([np.arange(n_vars), brand_cols]))),
+            shape=(len(row_lower), n_vars),
+        )
+        constraints = [LinearConstraint(A, row_lower, row_upper)]
+
+        def idx(b, m, t):
+            return brand_idx[b] * (M * T) + media_idx[m] * T + period_idx[t]
+
+        def limit_entries(limits):
+            # (flat index, value) for every brand/media/period of `limits` in this problem
+            for brand, media_dict in limits.items():
+                if brand not in brand_idx:
+                    continue
+                for media, period_dict in media_dict.items():
+                    if media not in media_idx:
+                        continue
+                    for period, value in period_dict.items():
+                        if int(period) in period_idx:
+                            yield idx(brand, media, int(period)), brand, media, int(period), value
 
         # Add per-brand-media-period constraints/bound
         if self.media_budget_limits not in [None, [], {}, '']:
-            for brand in brands:
-                for media in medias:
-                    for period in periods:
-                        period_int = int(period)
-                        # Defaults
-                        lower = 0
-                        upper = None
-
-                        # If bounds are explicitly specified
-                        if (
-                            brand in self.media_budget_limits
-                            and media in self.media_budget_limits[brand]
-                            and period_int in self.media_budget_limits[brand][media]
-                        ):
-                            bounds_info = self.media_budget_limits[brand][media][period_int]
-                            lower = bounds_info.get('lower bound', 0)
-                            upper = bounds_info.get('upper bound', None)
-                            # Get index for this variable
-                            i = idx(brand, media, period)
-                            if i >= len(bounds):
-                                raise IndexError(f"Index {i} out of bounds for bounds of length {len(bounds)}")
-
-                            # Update the bounds at position i
-                            bounds[i] = (lower, upper)
-                
+            for i, _, _, _, bounds_info in limit_entries(self.media_budget_limits):
+                upper_bound = bounds_info.get('upper bound', None)
+                lower[i] = bounds_info.get('lower bound', 0) or 0
+                upper[i] = np.inf if upper_bound is None else upper_bound
+
         if self.media_budget_limits_pct not in [None, [], {}, '']:
-            prior_year_df = pd.read_excel(file_path, sheet_name='Media Spending in prior year')
-            prior_year_lookup = {
-                (row['Brand'].lower(), row['media'].lower(), int(row['period'])): row['spending']
-                for _, row in prior_year_df.iterrows()
-            }
-            for brand in brands:
-                for media in medias:
-                    for period in periods:
-                        period_int = int(period)
-                        # Default bounds
-                        lower = 0
-                        upper = None
-
-                        if (
-                            brand in self.media_budget_limits_pct
-                            and media in self.media_budget_limits_pct[brand]
-                            and period_int in self.media_budget_limits_pct[brand][media]
-                        ):
-                            percent_bound = self.media_budget_limits_pct[brand][media][period_int]
-                            prior_year_spending = prior_year_lookup.get((brand, media, period_int), 0)
-                            lower = prior_year_spending * (1 - percent_bound)
-                            upper = prior_year_spending * (1 + percent_bound)
-
-                            # Get index for this variable
-                            i = idx(brand, media, period)
-                            if i >= len(bounds):
-                                raise IndexError(f"Index {i} out of bounds for bounds of length {len(bounds)}")
-
-                            # Update the bounds at position i
-                            bounds[i] = (lower, upper)
+            prior_year_spending = prior_spending.ravel()
+            for i, brand, media, period, percent_bound in limit_entries(self.media_budget_limits_pct):
+                lower[i] = prior_year_spending[i] * (1 - percent_bound)
+                upper[i] = prior_year_spending[i] * (1 + percent_bound)
                 
         # Add freezing constraints/bound
         if self.locked_media_allocations not in [None, [], {}, '']:
-            for brand in brands:
-                for media in medias:
-                    for period in periods:
-                        period_int = int(period)
-
-                        if (
-                            brand in self.locked_media_allocations
-                            and media in self.locked_media_allocations[brand]
-                            and period_int in self.locked_media_allocations[brand][media]
-                        ):
-                            fixed_val = self.locked_media_allocations[brand][media][period_int]
-                            i = idx(brand, media, period)
-
-                            # Overwrite the bounds to fix the variable
-                            bounds[i] = (fixed_val, fixed_val)
-
-        if bounds not in [None, [], {}, '']:
-            total_lower = 0
-            for lower, upper in bounds:
-                total_lower += lower if lower is not None else 0
-                if total_lower > total_budget:
-                    return 'over'
+            for i, _, _, _, fixed_val in limit_entries(self.locked_media_allocations):
+                # Overwrite the bounds to fix the variable
+                lower[i] = fixed_val
+                upper[i] = fixed_val
+                locked[i] = True
+
+        brand_lower = np.array([self._brand_limit(b, 'lower bound', 0) for b in brands], dtype=float)
+        brand_upper = np.array([self._brand_limit(b, 'upper bound', np.inf) for b in brands], dtype=float)
+        report = feasibility_report(
+            brands, medias, periods, lower, upper, locked, total_budget, brand_lower, brand_upper
+        )
+        build_time = time.perf_counter() - start - load_time
+        if not report['feasible']:
+            return {
+                "output": None,
+                "total_return": None,
+                "status": "infeasible",
+                "engine": None,
+                "backend": {"requested": self.engine, "selected": None,
+                            "reason": "the bounds cannot be met", "seconds": 0.0},
+                "feasibility": report,
+                "timings": {"load": load_time, "build": build_time, "solve": 0.0},
+            }
+
+        engine, reason = self.engine, "requested"
+        piecewise = None
+        status = "optimal"
+        if engine == 'auto':
+            engine, reason = choose_engine(coef, beta, n_vars)
+        elif engine == 'water_filling' and not is_concave(coef, beta):
+            raise ValueError("Water-filling needs concave response curves (0 < Beta <= 1).")
+
+        if engine == 'water_filling':
+            x = water_fill(
+                coef, beta, lower, upper, total_budget,
+                np.arange(n_vars) // (M * T), brand_lower, brand_upper,
+            )
+            total_return = -objective(x)
+            if progress is not None:
+                progress({
+                    "iteration": 1,
+                    "objective": float(total_return),
+                    "violation": constraint_violation(x, lower, upper, constraints[0]),
+                    "elapsed": time.perf_counter() - start - load_time - build_time,
+                })
+        elif engine == 'piecewise':
+            x, piecewise = piecewise_milp(coef, beta, lower, upper, constraints[0], progress=progress)
+            total_return = -objective(x)
         else:
-            bounds = [(0,  None)] * n_vars
-       # print(bounds)
+            x_start = None
+            if warm_start is not None:
+                x_start = output_arrays(warm_start['output'], brands, medias, periods)
+            if engine == 'trust_constr':
+                x, total_return, status = self._solve_trust_constr(
+                    objective, gradient, hessian_diagonal, lower, upper, constraints, n_vars, x_start, progress
+                )
+            else:
+                x, total_return, status = self._solve_slsqp(
+                    objective, gradient, lower, upper, constraints, n_vars, x_start, progress
+                )
+        solve_time = time.perf_counter() - start - load_time - build_time
 
-        x0 = []
-        default_guess = self.budget / n_vars / 2  # overall fair share fallback
+        # Output
+        x = x.reshape(B, M, T)
+        returns = np.where(
+            base_bt[:, None, :] > 0,
+            coef.reshape(B, M, T) * np.maximum(x, 0) ** beta.reshape(B, M, T),
+            0
+        )
+        if output_format == 'columnar':
+            output = {'brands': brands, 'medias': medias, 'periods': periods,
+                      'optimal_spending': x, 'incremental_dollar': returns}
+        else:
+            output = nested_output(brands, medias, periods, x, returns)
+
+        result = {
+            "output": output,
+            "total_return": total_return,
+            "status": status,
+            "engine": engine,
+            "backend": {"requested": self.engine, "selected": engine, "reason": reason, "seconds": solve_time},
+            "feasibility": report,
+            "timings": {"load": load_time, "build": build_time, "solve": solve_time}
+        }
+        if piecewise is not None:
+            result["piecewise"] = piecewise
+        return result
 
-        for i, (lower, upper) in enumerate(bounds):
-            # Safe defaults
-            lo = lower if lower is not None else 0
-            hi = upper if upper is not None else default_guess * 2  # fallback upper
+    def _brand_limit(self, brand, key, default):
+        if self.brand_budget_constraints and brand in self.brand_budget_constraints:
+            return self.brand_budget_constraints[brand].get(key, default)
+        return default
 
-            # Start with fair guess, clipped within bounds
-            guess = min(default_guess, hi)
-            guess = max(guess, lo)
+    @staticmethod
+    def _start_point(default_guess, lower, upper, x_start=None):
+        # Start with fair guess, clipped within bounds
+        x0 = np.maximum(np.minimum(default_guess, np.where(np.isinf(upper), default_guess * 2, upper)), lower)
+        if x_start is not None:
+            # Warm start: previous spending where known, clipped to the new bounds
+            x0 = np.where(np.isnan(x_start), x0, np.clip(x_start, lower, upper))
+        return x0
 
-            x0.append(guess)
+    def _solve_slsqp(self, objective, gradient, lower, upper, constraints, n_vars, x_start=None, progress=None):
+        default_guess = self.budget / n_vars / 2  # overall fair share fallback
+        x0 = self._start_point(default_guess, lower, upper, x_start)
+
+        callback = None
+        if progress is not None:
+            start = time.perf_counter()
+            iterations = [0]
 
-        x0 = np.array(x0)
-       # print(x0)
+            def callback(xk):
+                iterations[0] += 1
+                progress({
+                    "iteration": iterations[0],
+                    "objective": float(-objective(xk)),
+                    "violation": constraint_violation(xk, lower, upper, constraints[0]),
+                    "elapsed": time.perf_counter() - start,
+                })
 
         result = minimize(
             objective, x0,
-            bounds=bounds,
+            jac=gradient,
+            bounds=Bounds(lower, upper),
             constraints=constraints,
             method='SLSQP',
-            options={'disp': True, 'maxiter': 5000}
+            callback=callback,
+            options={'maxiter': 5000}
         )
 
-        # Output
-        output = {}
-        for b in brands:
-            output[b] = {}
-            for m in medias:
-                output[b][m] = {}
-                for t in periods:
-                    i = idx(b, m, t)
-                    val = result.x[i]
-                    params = curve_dict.get((b, m), {'alpha': 0, 'beta': 0})
-                    base_val = base_lookup.get((b, t), 0)
-                    price = price_lookup.get((b, t), 0)
-                    ret = params['alpha'] * (val ** params['beta']) * base_val * price if base_val > 0 else 0
-                    output[b][m][t] = {
-                        'optimal_spending': val,
-                        'incremental_dollar': ret
-                    }
-
-        total_return = -result.fun
-
-        # If optimization failed, assess closeness to budget
-        if not result.success:
-            total_optimal_spending = 0
-            for brand_data in output.values():
-                for media_data in brand_data.values():  # e.g., 'pde', 'mab', etc.
-                    for time_data in media_data.values():  # e.g., 1, 2, 3...
-                        total_optimal_spending += time_data.get('optimal_spending', 0)
-            print(total_optimal_spending)
-            if abs(total_optimal_spending - self.budget) <= 5:
-                print("⚠️ Optimization couldn't fully satisfy all constraints, but since the result is within $5 of the budget, we're treating it as a near-feasible solution.")
-            else:
-                print("❌ Optimization failed!")
-                print("Reason:", result.message)
-                print(result)
-        
-        return {
-            "output": output,
-            "total_return": total_return
-        }
-
-    def validate_bounds(self, file_path=None):
+        if result.success:
+            return result.x, -result.fun, "optimal"
+        violation = constraint_violation(result.x, lower, upper, constraints[0])
+        if violation <= NEAR_FEASIBLE_SLACK:
+            logger.warning("SLSQP stopped %s from feasible, taken as near-feasible: %s", violation, result.message)
+            return result.x, -result.fun, "near_feasible"
+        logger.error("SLSQP stopped %s from feasible: %s", violation, result.message)
+        return result.x, -result.fun, "failed"
 
-        total_media_lower_bound = 0
-        total_brand_lower_bound = 0
-        total_frozen_spend = 0
+    def _solve_trust_constr(self, objective, gradient, hessian_diagonal, lower, upper, constraints,
+                            n_vars, x_start=None, progress=None):
+        """
+        Interior-point solve with the sparse constraint matrix and the exact
+        (diagonal) Hessian, so no iteration builds a dense n x n matrix.
 
-        # 1. Validate brand-level bounds
-        if self.brand_budget_constraints:
-            for brand, bounds in self.brand_budget_constraints.items():
-                lb = bounds.get('lower bound', 0)
-                ub = bounds.get('upper bound', float('inf'))
+        Spend is rescaled to units of the fair share ``budget / n_vars`` and
+        the objective to its value at the start, which makes the tolerances
+        relative; in raw dollars the barrier steps stall long before the
+        budget row is met, or crawl for hundreds of iterations. The cold start is the full fair share: on non-concave
+        curves, starting inside the budget tends to end in a poorer local
+        optimum.
+        """
+        scale = self.budget / n_vars if self.budget > 0 else 1.0
+        x0 = self._start_point(scale, lower, upper, x_start) / scale
+        norm = abs(objective(x0 * scale)) or 1.0
+        constraint = constraints[0]
+        scaled = LinearConstraint(constraint.A * scale, constraint.lb, constraint.ub)
 
-                if lb > ub:
-                    raise ValueError(
-                        f"Brand '{brand}': lower bound ({lb}) is greater than upper bound ({ub})."
-                    )
+        callback = None
+        if progress is not None:
+            start = time.perf_counter()
 
-                total_brand_lower_bound += lb
+            def callback(yk, state):
+                progress({
+                    "iteration": state.nit,
+                    "objective": float(-objective(yk * scale)),
+                    "violation": constraint_violation(yk * scale, lower, upper, constraint),
+                    "elapsed": time.perf_counter() - start,
+                })
 
-            if total_brand_lower_bound > self.budget:
-                raise ValueError(
-                    f"Sum of brand-level lower bounds ({total_brand_lower_bound}) "
-                    f"exceeds total budget ({self.budget})."
-                )
+        result = minimize(
+            lambda y: objective(y * scale) / norm, x0,
+            jac=lambda y: gradient(y * scale) * scale / norm,
+            hess=lambda y: sparse.diags(hessian_diagonal(y * scale) * scale ** 2 / norm),
+            bounds=Bounds(lower / scale, upper / scale),
+            constraints=[scaled],
+            method='trust-constr',
+            callback=callback,
+            options={'maxiter': 5000, 'gtol': 1e-9, 'xtol': 1e-8},
+        )
+        x = result.x * scale
+        violation = constraint_violation(x, lower, upper, constraint)
+        if violation > NEAR_FEASIBLE_SLACK:
+            logger.warning("trust-constr stopped %s from feasible: %s", violation, result.message)
+            return x, -objective(x), "failed"
+        return x, -objective(x), "optimal" if result.success else "near_feasible"
 
-        # 2. Validate media-level bounds
-        if self.media_budget_limits:
-            for brand, media_dict in self.media_budget_limits.items():
-                brand_media_lb = 0
+    def evaluate(self, result, covariance=None, draws=None, samples=1000, seed=None,
+                 percentiles=RISK_PERCENTILES):
+        """
+        Return distribution of ``result`` (from ``run``) when the fitted
+        alpha/Beta of the response curves are uncertain.
 
-                for media, period_dict in media_dict.items():
-                    for period, bounds in period_dict.items():
-                        lb = bounds.get('lower bound', 0)
-                        ub = bounds.get('upper bound', float('inf'))
-
-                        if lb > ub:
-                            raise ValueError(
-                                f"Brand '{brand}', media '{media}', period {period}: "
-                                f"lower bound ({lb}) is greater than upper bound ({ub})."
-                            )
-
-                        brand_media_lb += lb
-
-                if self.brand_budget_constraints and brand in self.brand_budget_constraints:
-                    brand_ub = self.brand_budget_constraints[brand].get('upper bound', float('inf'))
-                    if brand_media_lb > brand_ub:
-                        raise ValueError(
-                            f"Sum of media-level lower bounds ({brand_media_lb}) for brand '{brand}' "
-                            f"exceeds brand-level upper bound ({brand_ub})."
-                        )
-                        
-                total_media_lower_bound += brand_media_lb
-
-            if total_media_lower_bound > self.budget:
-                raise ValueError(
-                    f"Total sum of media-level lower bounds across all brands ({total_media_lower_bound}) "
-                    f"exceeds total budget ({self.budget})."
-                )
-
-        # 3. Validate frozen media spend
-        if self.locked_media_allocations:
-            for brand, media_dict in self.locked_media_allocations.items():
-                brand_frozen_total = 0
-                for media, period_dict in media_dict.items():
-                    for period, spend in period_dict.items():
-                        total_frozen_spend += spend
-                        brand_frozen_total += spend
-
-                if self.brand_budget_constraints and brand in self.brand_budget_constraints:
-                    brand_bounds = self.brand_budget_constraints[brand]
-                    lb = brand_bounds.get('lower bound', 0)
-                    ub = brand_bounds.get('upper bound', float('inf'))
-
-                    if not (lb <= brand_frozen_total <= ub):
-                        raise ValueError(
-                            f"Frozen media spend for brand '{brand}' = {brand_frozen_total} "
-                            f"is outside brand-level bounds ({lb}, {ub})."
-                        )
-
-            if total_frozen_spend > self.budget:
-                raise ValueError(
-                    f"Total frozen media spend across all brands ({total_frozen_spend}) "
-                    f"exceeds total budget ({self.budget})."
-                )
+        ``covariance`` maps brand -> media -> the 2 x 2 covariance of that
+        curve's (alpha, Beta); curves left out are taken as exact. It may
+        also be the full covariance array of the (alpha, Beta) pairs of all
+        curves, brand-major in the result's brand and media order. ``draws``
+        instead gives the parameter samples as an array of shape
+        (samples, brands, medias, 2). Returns ``summarize_returns`` of the
+        sampled totals against the result's ``total_return``.
+        """
+        if (covariance is None) == (draws is None):
+            raise ValueError("Give either covariance or draws.")
+        output = result['output']
+        if output is None:
+            raise ValueError("The result has no allocation to evaluate.")
+        document = load_document(os.path.join(os.getcwd(), 'Optimization_document.xlsx'))
+        brands, medias, periods, coef, beta = document.select(self.brand)[:5]
+        B, M, T = len(brands), len(medias), len(periods)
+        x = output_arrays(output, brands, medias, periods)
+        alpha = document.curve_alpha(brands, medias).ravel()
+        curve = np.arange(B * M * T) // T
 
-        # 4. Validate media_input_percentage-derived lower bounds
-        if self.media_budget_limits_pct:
-            prior_year_df = pd.read_excel(file_path, sheet_name='Media Spending in prior year')
-            prior_year_lookup = {
-                (row['Brand'].lower(), row['media'].lower(), int(row['period'])): row['spending']
-                for _, row in prior_year_df.iterrows()
-            }
-            
-            total_lower_bound = 0
-            for brand, media_dict in self.media_budget_limits_pct.items():
-                brand_lower_bound = 0
+        factor = None
+        if draws is not None:
+            draws = np.asarray(draws, dtype=float).reshape(-1, B * M, 2)
+        elif isinstance(covariance, dict):
+            factor = np.zeros((B * M, 2, 2))
+            for brand, by_media in covariance.items():
+                for media, cov in by_media.items():
+                    if brand in brands and media in medias:
+                        factor[brands.index(brand) * M + medias.index(media)] = covariance_factor(cov)
+        else:
+            factor = covariance_factor(covariance)
 
-                for media, period_dict in media_dict.items():
-                    for period, ratio in period_dict.items():
-                        key = (brand.lower(), media.lower(), int(period))
-                        prior_spend = prior_year_lookup.get(key, 0)
-
-                        # Get percentage bound from config
-                        percent_bound = 0
-                        if (
-                            brand in self.media_budget_limits_pct and
-                            media in self.media_budget_limits_pct[brand] and
-                            int(period) in self.media_budget_limits_pct[brand][media]
-                        ):
-                            percent_bound = self.media_budget_limits_pct[brand][media][int(period)]
-
-                        # Calculate lower bound as prior × (1 - %)
-                        lower = prior_spend * (1 - percent_bound)
-
-                        brand_lower_bound += lower
-                        total_lower_bound += lower
-
-                # Check if brand lower bound exceeds brand upper bound
-                if self.brand_budget_constraints and brand in self.brand_budget_constraints:
-                    brand_ub = self.brand_budget_constraints[brand].get('upper bound', float('inf'))
-                    if brand_lower_bound > brand_ub:
-                        raise ValueError(
-                            f"Brand '{brand}': sum of media-level lower bounds from media_input_percentage "
-                            f"({brand_lower_bound:.2f}) exceeds brand upper bound ({brand_ub})."
-                        )
-
-            # Check if total media-level lower bound exceeds total budget
-            if total_lower_bound > self.budget:
-                raise ValueError(
-                    f"Sum of all media-level lower bounds from media_input_percentage ({total_lower_bound:.2f}) "
-                    f"exceeds total budget ({self.budget})."
-                )
+        totals = monte_carlo_returns(
+            x, coef.ravel(), curve, alpha, beta.reshape(B * M, T)[:, 0], draws, factor, samples, seed
+        )
+        return summarize_returns(totals, result['total_return'], percentiles)
@@ -0,0 +1,35 @@
+"""
+Compile Optimization_document.xlsx into a memory-mappable snapshot.
+
+    python compile_snapshot.py [Optimization_document.xlsx] [-o Optimization_document.snapshot]
+
+SpendOptimization picks the snapshot up automatically when it sits next to
+the workbook and was compiled from its current version.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SpendOptimization import OptimizationDocument, snapshot_path  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('workbook', nargs='?', default=os.path.join(os.getcwd(), 'Optimization_document.xlsx'))
+    parser.add_argument('-o', '--output', help="snapshot directory (default: <workbook>.snapshot)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    document = OptimizationDocument.from_workbook(args.workbook)
+    output = args.output or snapshot_path(args.workbook)
+    document.save(output)
+    B, M, T = document.arrays['coef'].shape
+    print(f"Wrote {output}: {B} brands x {M} medias x {T} periods "
+          f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,606 @@
+"""
+End-to-end load test of the /optimize service.
+
+    python backend/benchmarks/load_test.py --duration 30 --rate 5 --concurrency 8
+    python backend/benchmarks/load_test.py --workers 4 --save-baseline backend/benchmarks/load_baseline.json
+    python backend/benchmarks/load_test.py --compare backend/benchmarks/load_baseline.json --threshold 0.25
+    python backend/benchmarks/load_test.py --url http://127.0.0.1:8000 --workbook public/data/Input.xlsx
+
+Starts the app under uvicorn on a synthetic workbook (see synthetic.py), or
+targets a running server with ``--url``, waits for /readyz and replays a
+mix of /optimize payloads generated from the OptimizationRequest schema.
+``--rate`` requests per second are scheduled open-loop and latency is
+measured from the scheduled send time, so a server that falls behind shows
+up in the percentiles instead of slowing the client down; at most
+``--concurrency`` requests are in flight. ``--rate 0`` runs closed-loop.
+
+The payloads are cycled, and the service caches the result of each
+distinct request (RESULT_CACHE_SIZE entries for RESULT_CACHE_TTL seconds),
+so past the first ``--payloads`` requests a run mostly measures cache hits.
+``--unique`` raises the budgets by a few hundred dollars per pass so that
+every request is distinct, which measures solves.
+
+The report has the throughput, the p50/p95/p99 latency, the error rate and,
+for a server started here, the CPU and peak RSS of each of its processes
+(read from /proc, so Linux only). ``--compare`` exits non-zero when the
+throughput dropped or a latency percentile rose by more than
+``--threshold`` (and by more than ``--min-ms``), or when the error rate
+rose by more than ``--max-error-increase``.
+
+A payload mix is a JSON object overriding any of the keys of DEFAULT_MIX:
+``brands`` (brand -> weight), ``budget`` (range as a fraction of the
+brand's maximum spend), ``frozen`` and ``limits`` (probability that a
+request freezes channels / bounds channels, and the share of channels it
+does it for) and ``engines`` (engine -> weight, ``default`` to leave it to the server).
+"""
+import argparse
+import http.client
+import json
+import os
+import queue
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.dirname(HERE)
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, HERE)
+
+import spend_optimization  # noqa: E402
+import synthetic  # noqa: E402
+
+DEFAULT_MIX = {
+    'brands': {'all': 2, 'velo': 1, 'grizzly': 1},
+    'budget': [0.2, 0.8],
+    'frozen': {'probability': 0.3, 'share': 0.1},
+    'limits': {'probability': 0.5, 'share': 0.25},
+    'engines': {'default': 1},
+}
+PERCENTILES = (50, 95, 99)
+OUTCOMES = ('ok', 'rejected', 'error')
+SAMPLE_INTERVAL = 0.5
+ROLES = ('supervisor', 'server', 'forkserver', 'worker', 'cbc', 'other')
+
+
+def load_mix(path):
+    mix = dict(DEFAULT_MIX)
+    if path:
+        with open(path) as f:
+            mix.update(json.load(f))
+    return mix
+
+
+class PayloadGenerator:
+    """
+    Random /optimize payloads for the curves of a workbook.
+
+    There is one generator per OptimizationRequest field; fields of the
+    schema without one (solver options, robustness) are left to the
+    server defaults. Every payload is validated against the model.
+    """
+
+    def __init__(self, curves, mix, seed=0):
+        self.rng = np.random.default_rng(seed)
+        self.mix = mix
+        self.fields = spend_optimization.OptimizationRequest.model_json_schema()['properties']
+        self.brands = {
+            'all': [curves.brands['velo'], curves.brands['grizzly']],
+            'velo': [curves.brands['velo']],
+            'grizzly': [curves.brands['grizzly']],
+        }
+        self.generators = {
+            'brand': self._brand,
+            'budget': self._budget,
+            'engine': self._engine,
+            'frozen_channels_data': self._frozen,
+            'channelLimits': self._limits,
+        }
+
+    def _choice(self, weights):
+        names = list(weights)
+        p = np.array([weights[n] for n in names], dtype=float)
+        return names[self.rng.choice(len(names), p=p / p.sum())]
+
+    def _brand(self, payload):
+        return self._choice(self.mix['brands'])
+
+    def _budget(self, payload):
+        sheets = self.brands[payload['brand']]
+        max_spend = sum(float(b['spend'][-1]) * len(b['channels']) for b in sheets)
+        low, high = self.mix['budget']
+        return int(max_spend * self.rng.uniform(low, high))
+
+    def _engine(self, payload):
+        engine = self._choice(self.mix['engines'])
+        return None if engine == 'default' else engine
+
+    def _channels(self, payload, share):
+        """``(channel, spend grid)`` of a random ``share`` of the payload's channels."""
+        pool = [(c, b['spend']) for b in self.brands[payload['brand']] for c in b['channels']]
+        picked = self.rng.choice(len(pool), size=max(1, int(len(pool) * share)), replace=False)
+        return [pool[k] for k in picked]
+
+    def _frozen(self, payload):
+        frozen = self.mix['frozen']
+        if self.rng.random() >= frozen['probability']:
+            return None
+        # The service only accepts frozen spends that are placements on the grid.
+        return {
+            c: int(spend[self.rng.integers(len(spend) // 2)]) for c, spend in self._channels(payload, frozen['share'])
+        }
+
+    def _limits(self, payload):
+        limits = self.mix['limits']
+        if self.rng.random() >= limits['probability']:
+            return None
+        bounds = {}
+        for c, spend in self._channels(payload, limits['share']):
+            if c in (payload.get('frozen_channels_data') or {}):
+                continue
+            top = float(spend[-1])
+            lower = self.rng.uniform(0, 0.3) * top
+            upper = self.rng.uniform(0.5, 1) * top
+            bounds[c] = {'lower': str(int(lower)), 'upper': str(int(upper))}
+        return bounds or None
+
+    def __call__(self):
+        payload = {}
+        for name in self.generators:
+            if name not in self.fields:
+                continue
+            value = self.generators[name](payload)
+            if value is not None:
+                payload[name] = value
+        spend_optimization.OptimizationRequest(**payload)
+        return payload
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(workdir, workers):
+    """Run the app under uvicorn in ``workdir``; returns ``(process, url)``."""
+    port = _free_port()
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [BACKEND, os.environ.get('PYTHONPATH')])))
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'spend_optimization:app', '--host', '127.0.0.1',
+         '--port', str(port), '--workers', str(workers), '--log-level', 'warning'],
+        cwd=workdir, env=env, start_new_session=True,
+    )
+    return process, f'http://127.0.0.1:{port}'
+
+
+def stop_server(process):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+    except ProcessLookupError:
+        pass
+
+
+def wait_ready(url, timeout, process=None, confirmations=1):
+    """
+    Poll /readyz until the service reports ready; RuntimeError if it fails
+    or times out. With several server processes any one of them may answer,
+    so it takes ``confirmations`` ready answers in a row.
+    """
+    parts = urllib.parse.urlsplit(url)
+    deadline = time.monotonic() + timeout
+    report = None
+    ready = 0
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=5)
+            connection.request('GET', '/readyz')
+            response = connection.getresponse()
+            report = json.loads(response.read())
+            connection.close()
+            if response.status == 200:
+                ready += 1
+                if ready >= confirmations:
+                    return report
+                continue
+            ready = 0
+            if report.get('status') == 'failed':
+                raise RuntimeError(f"Server failed to start: {report.get('errors')}")
+        except (OSError, http.client.HTTPException, ValueError):
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server not ready after {timeout:.0f}s: {report}")
+
+
+def _proc_tree(root):
+    """``{pid: parent pid}`` of ``root`` and all its descendants."""
+    parents = {}
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        parents[int(name)] = int(stat[stat.rindex(')') + 2:].split()[1])
+    tree = {root: None}
+    grew = True
+    while grew:
+        grew = False
+        for pid, parent in parents.items():
+            if parent in tree and pid not in tree:
+                tree[pid] = parent
+                grew = True
+    return tree
+
+
+def _proc_sample(pid):
+    """``(command line, cpu seconds, rss bytes)`` of a process, or None once it is gone."""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            stat = f.read()
+        with open(f'/proc/{pid}/status') as f:
+            status = f.read()
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            cmdline = f.read().replace(b'\0', b' ').decode(errors='replace')
+    except OSError:
+        return None
+    fields = stat[stat.rindex(')') + 2:].split()
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    rss = 0
+    for line in status.splitlines():
+        if line.startswith('VmRSS:'):
+            rss = int(line.split()[1]) * 1024
+    return cmdline, cpu, rss
+
+
+class ResourceSampler(threading.Thread):
+    """
+    Samples CPU time and RSS of a server process tree from /proc.
+
+    Processes are labelled by their place in the tree: the uvicorn
+    ``supervisor`` (with several workers), the ``server`` processes, the
+    ``forkserver`` each one starts its solver pool from, the processes
+    forked from it (``worker``: the solvers and the progress manager) and
+    the ``cbc`` binaries they run.
+    """
+
+    def __init__(self, root, supervised):
+        super().__init__(daemon=True)
+        self.root = root
+        self.supervised = supervised
+        self.stopped = threading.Event()
+        self.processes = {}
+
+    def _role(self, pid, parent, cmdline):
+        if pid == self.root:
+            return 'supervisor' if self.supervised else 'server'
+        parent_role = self.processes[parent]['role'] if parent in self.processes else None
+        if 'cbc' in os.path.basename(cmdline.split(' ')[0]):
+            return 'cbc'
+        if parent_role == 'forkserver':
+            return 'worker'
+        if 'multiprocessing.forkserver' in cmdline:
+            return 'forkserver'
+        if parent_role == 'supervisor' and 'multiprocessing.spawn' in cmdline:
+            return 'server'
+        return 'other'
+
+    def sample(self, now):
+        tree = _proc_tree(self.root)
+        # Parents before children, so that a role can depend on the parent's.
+        for pid in sorted(tree, key=lambda p: self._depth(p, tree)):
+            sample = _proc_sample(pid)
+            if sample is None:
+                continue
+            cmdline, cpu, rss = sample
+            entry = self.processes.get(pid)
+            if entry is None:
+                entry = self.processes[pid] = {
+                    'pid': pid, 'role': self._role(pid, tree[pid], cmdline),
+                    'cpu_start': cpu, 'first_seen': now, 'peak_rss': 0,
+                }
+            entry['cpu'] = cpu
+            entry['last_seen'] = now
+            entry['peak_rss'] = max(entry['peak_rss'], rss)
+
+    @staticmethod
+    def _depth(pid, tree):
+        depth = 0
+        while tree.get(pid) is not None:
+            pid = tree[pid]
+            depth += 1
+        return depth
+
+    def run(self):
+        while not self.stopped.wait(SAMPLE_INTERVAL):
+            self.sample(time.monotonic())
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.sample(time.monotonic())
+
+    def report(self, started, finished):
+        """Per-process CPU (percent of one core) and peak RSS over ``started``..``finished``."""
+        processes = []
+        for entry in self.processes.values():
+            elapsed = max(min(entry['last_seen'], finished) - max(entry['first_seen'], started), SAMPLE_INTERVAL)
+            processes.append({
+                'pid': entry['pid'],
+                'role': entry['role'],
+                'cpu_seconds': entry['cpu'] - entry['cpu_start'],
+                'cpu_percent': 100 * (entry['cpu'] - entry['cpu_start']) / elapsed,
+                'peak_rss': entry['peak_rss'],
+            })
+        order = {role: k for k, role in enumerate(ROLES)}
+        return sorted(processes, key=lambda p: (order[p['role']], p['pid']))
+
+
+class LoadGenerator:
+    """
+    Sends /optimize requests from ``concurrency`` threads, each with its own
+    keep-alive connection, and records one ``(sent, latency, outcome,
+    status)`` tuple per request. Open-loop with a ``rate``, closed-loop
+    (every thread sends as soon as its previous answer is in) without.
+    With ``unique``, request ``k`` is payload ``i = k % P`` of the ``P``
+    with its budget raised to the next multiple of ``P``, plus ``i``, plus
+    ``P`` per earlier pass: distinct payloads get distinct remainders and
+    each pass adds ``P``, so no request repeats another.
+    """
+
+    def __init__(self, url, payloads, concurrency, rate, accept='application/json', timeout=120, unique=False):
+        self.parts = urllib.parse.urlsplit(url)
+        self.payloads = payloads
+        self.bodies = [json.dumps(p).encode() for p in payloads]
+        self.unique = unique
+        self.concurrency = concurrency
+        self.rate = rate
+        self.headers = {'Content-Type': 'application/json', 'Accept': accept}
+        self.timeout = timeout
+        # Closed-loop, the scheduler can only hand out a request once a thread is free for it.
+        self.queue = queue.Queue(maxsize=0 if rate else 1)
+        self.records = []
+        self.lock = threading.Lock()
+
+    def _connect(self):
+        return http.client.HTTPConnection(self.parts.hostname, self.parts.port, timeout=self.timeout)
+
+    def _send(self, connection, body):
+        connection.request('POST', '/optimize', body=body, headers=self.headers)
+        response = connection.getresponse()
+        content = response.read()
+        if response.status != 200:
+            return 'error', response.status
+        if response.getheader('Content-Type', '').startswith('application/json'):
+            # An infeasible request is answered 200 with an "error" and no solve.
+            if b'"error"' in content[:64] and 'error' in json.loads(content):
+                return 'rejected', response.status
+        return 'ok', response.status
+
+    def _body(self, k):
+        P = len(self.bodies)
+        n, i = divmod(k, P)
+        if not self.unique:
+            return self.bodies[i]
+        budget = (self.payloads[i]['budget'] // P + 1 + n) * P + i
+        return json.dumps({**self.payloads[i], 'budget': budget}).encode()
+
+    def _worker(self):
+        connection = self._connect()
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            k, scheduled = item
+            sent = scheduled if scheduled is not None else time.perf_counter()
+            try:
+                outcome, status = self._send(connection, self._body(k))
+            except (OSError, http.client.HTTPException, ValueError):
+                outcome, status = 'error', None
+                connection.close()
+                connection = self._connect()
+            latency = time.perf_counter() - sent
+            with self.lock:
+                self.records.append((sent - self.started, latency, outcome, status))
+        connection.close()
+
+    def run(self, duration, requests=None):
+        """Send for ``duration`` seconds (or ``requests`` requests, whichever comes first)."""
+        threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        self.started = time.perf_counter()
+        k = 0
+        while requests is None or k < requests:
+            if self.rate:
+                scheduled = self.started + k / self.rate
+                if scheduled - self.started >= duration:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                self.queue.put((k, scheduled))
+            else:
+                if time.perf_counter() - self.started >= duration:
+                    break
+                self.queue.put((k, None))
+            k += 1
+        for _ in threads:
+            self.queue.put(None)
+        for thread in threads:
+            thread.join()
+        self.finished = time.perf_counter()
+        return self.records
+
+
+def summarize(records, elapsed):
+    """Throughput, error rate and latency percentiles (ms, answered requests only) of ``records``."""
+    outcomes = [r[2] for r in records]
+    counts = {outcome: outcomes.count(outcome) for outcome in OUTCOMES}
+    statuses = {}
+    for r in records:
+        key = str(r[3]) if r[3] is not None else 'connection'
+        statuses[key] = statuses.get(key, 0) + 1
+    answered = np.array([r[1] for r in records if r[2] != 'error']) * 1000
+    summary = {
+        'requests': len(records),
+        **counts,
+        'statuses': statuses,
+        'elapsed': elapsed,
+        'throughput': (counts['ok'] + counts['rejected']) / elapsed if elapsed else 0.0,
+        'error_rate': counts['error'] / len(records) if records else 0.0,
+    }
+    for q in PERCENTILES:
+        summary[f'p{q}'] = float(np.percentile(answered, q)) if answered.size else None
+    summary['mean'] = float(answered.mean()) if answered.size else None
+    summary['max'] = float(answered.max()) if answered.size else None
+    return summary
+
+
+def compare(report, baseline, threshold, min_ms, max_error_increase):
+    """Regressions of ``report`` against ``baseline`` as printable strings."""
+    new, old = report['summary'], baseline['summary']
+    regressions = []
+    if new['throughput'] < old['throughput'] * (1 - threshold):
+        regressions.append(f"throughput: {old['throughput']:.2f}/s -> {new['throughput']:.2f}/s")
+    for q in PERCENTILES:
+        key = f'p{q}'
+        if new[key] is None or old[key] is None:
+            continue
+        if new[key] > old[key] * (1 + threshold) and new[key] - old[key] > min_ms:
+            regressions.append(f"{key} latency: {old[key]:.1f}ms -> {new[key]:.1f}ms")
+    if new['error_rate'] - old['error_rate'] > max_error_increase:
+        regressions.append(f"error rate: {old['error_rate']:.2%} -> {new['error_rate']:.2%}")
+    return regressions
+
+
+def _print_report(report):
+    s = report['summary']
+    c = report['config']
+    offered = f"{c['rate']:g}/s offered" if c['rate'] else 'closed-loop'
+    print(f"{s['requests']} requests in {s['elapsed']:.1f}s ({offered}, concurrency {c['concurrency']})")
+    print(f"  ok {s['ok']}  rejected {s['rejected']}  errors {s['error']} ({s['error_rate']:.2%})  "
+          f"statuses {s['statuses']}")
+    print(f"  throughput {s['throughput']:.2f}/s")
+    if s['p50'] is not None:
+        print('  latency ' + '  '.join(f"{key} {s[key]:.1f}ms" for key in ('p50', 'p95', 'p99', 'mean', 'max')))
+    if report['processes']:
+        print(f"{'role':<12} {'pid':>8} {'cpu s':>8} {'cpu %':>7} {'peak MB':>8}")
+        for p in report['processes']:
+            print(f"{p['role']:<12} {p['pid']:>8} {p['cpu_seconds']:>8.2f} {p['cpu_percent']:>7.1f} "
+                  f"{p['peak_rss'] / 2 ** 20:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the /optimize service.")
+    parser.add_argument('--url', help="target a running server instead of starting one")
+    parser.add_argument('--workbook', help="Input.xlsx to serve (and to build payloads for) instead of a synthetic one")
+    parser.add_argument('--channels', type=int, default=20, help="channels per brand of the synthetic workbook")
+    parser.add_argument('--placements', type=int, default=101, help="spend rows of the synthetic workbook")
+    parser.add_argument('--workers', type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument('--mix', help="JSON file overriding the default payload mix")
+    parser.add_argument('--payloads', type=int, default=200, help="distinct payloads to cycle through; the server "
+                        f"caches {spend_optimization.RESULT_CACHE_SIZE} results for "
+                        f"{spend_optimization.RESULT_CACHE_TTL}s, so longer runs mostly hit the cache")
+    parser.add_argument('--unique', action='store_true',
+                        help="raise the budgets slightly on every pass so that no request repeats")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rate', type=float, default=5, help="requests per second, 0 for closed-loop")
+    parser.add_argument('--concurrency', type=int, default=8, help="maximum requests in flight")
+    parser.add_argument('--duration', type=float, default=30, help="seconds to send requests for")
+    parser.add_argument('--requests', type=int, help="stop after this many requests")
+    parser.add_argument('--accept', default='application/json', help="Accept header of the requests")
+    parser.add_argument('--ready-timeout', type=float, default=120, help="seconds to wait for /readyz")
+    parser.add_argument('--output', help="write the report JSON here")
+    parser.add_argument('--save-baseline', help="write the report as the new baseline JSON")
+    parser.add_argument('--compare', help="baseline JSON to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed relative throughput/latency change")
+    parser.add_argument('--min-ms', type=float, default=20, help="ignore latency increases smaller than this")
+    parser.add_argument('--max-error-increase', type=float, default=0.01, help="allowed error rate increase")
+    args = parser.parse_args()
+    if args.url and not args.workbook:
+        parser.error("--url needs the --workbook the server runs on, to build payloads for it")
+
+    mix = load_mix(args.mix)
+    process = sampler = None
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.url:
+            url, path = args.url, args.workbook
+        else:
+            data_dir = os.path.join(workdir, 'public', 'data')
+            os.makedirs(data_dir)
+            path = os.path.join(data_dir, 'Input.xlsx')
+            if args.workbook:
+                with open(args.workbook, 'rb') as src, open(path, 'wb') as dst:
+                    dst.write(src.read())
+            else:
+                synthetic.write_curve_workbook(path, args.channels, args.placements,
+                                               seed=args.seed, overview_weeks=52)
+            process, url = start_server(workdir, args.workers)
+        try:
+            generator = PayloadGenerator(spend_optimization.load_curves(path), mix, args.seed)
+            payloads = [generator() for _ in range(args.payloads)]
+            wait_ready(url, args.ready_timeout, process, confirmations=2 * args.workers if process else 1)
+            if process is not None and os.path.isdir('/proc'):
+                sampler = ResourceSampler(process.pid, supervised=args.workers > 1)
+                sampler.sample(time.monotonic())
+                sampler.start()
+            load = LoadGenerator(url, payloads, args.concurrency, args.rate, args.accept, unique=args.unique)
+            started = time.monotonic()
+            records = load.run(args.duration, args.requests)
+            finished = time.monotonic()
+            processes = []
+            if sampler is not None:
+                sampler.stop()
+                processes = sampler.report(started, finished)
+        finally:
+            if process is not None:
+                stop_server(process)
+
+    report = {
+        'python': sys.version.split()[0],
+        'config': {
+            'url': args.url, 'workers': None if args.url else args.workers,
+            'workbook': args.workbook or f'synthetic {args.channels}ch x {args.placements}pl',
+            'mix': mix, 'payloads': args.payloads, 'unique': args.unique, 'seed': args.seed,
+            'rate': args.rate, 'concurrency': args.concurrency,
+            'duration': args.duration, 'requests': args.requests, 'accept': args.accept,
+        },
+        'summary': summarize(records, load.finished - load.started),
+        'processes': processes,
+    }
+    _print_report(report)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline['config'] != report['config']:
+            print("note: the baseline was recorded with a different configuration")
+        regressions = compare(report, baseline, args.threshold, args.min_ms, args.max_error_increase)
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""
+Scaling benchmarks for both optimizers.
+
+    python backend/benchmarks/run_benchmarks.py --suite small --output results.json
+    python backend/benchmarks/run_benchmarks.py --save-baseline backend/benchmarks/baseline.json
+    python backend/benchmarks/run_benchmarks.py --compare backend/benchmarks/baseline.json --threshold 0.25
+
+Every case is run on synthetic data (see synthetic.py) and records, per
+engine, the data-load, model-build and solve times, the peak Python heap
+during the solve and the objective. ``--compare`` exits non-zero when a
+phase got slower than the baseline by more than ``--threshold`` (and by
+more than ``--min-seconds``, to ignore timer noise).
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.dirname(HERE)
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, HERE)
+
+import spend_optimization  # noqa: E402
+import synthetic  # noqa: E402
+
+
+def _load_alpha():
+    path = os.path.join(BACKEND, 'alpha-version', 'SpendOptimization.py')
+    spec = importlib.util.spec_from_file_location('alpha_spend_optimization', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+alpha = _load_alpha()
+
+PLACEMENT_ENGINES = ('pulp', 'highs', 'dp')
+ALPHA_ENGINES = ('water_filling', 'piecewise', 'slsqp', 'trust_constr')
+# SLSQP works on a dense Jacobian and stops scaling beyond a few hundred
+# variables, trust-constr a few thousand, so the bigger alpha cases drop them.
+SUITES = {
+    'small': {
+        'placement': [(5, 41), (20, 101)],
+        'alpha': [
+            (3, 4, 4, ALPHA_ENGINES),
+            (3, 6, 8, ALPHA_ENGINES),
+            (5, 10, 12, ('water_filling', 'piecewise', 'trust_constr')),
+        ],
+    },
+    'large': {
+        'placement': [(5, 41), (20, 101), (50, 201), (100, 401)],
+        'alpha': [
+            (3, 4, 4, ALPHA_ENGINES),
+            (5, 10, 12, ALPHA_ENGINES),
+            (10, 20, 52, ('water_filling',)),
+            (20, 30, 52, ('water_filling',)),
+        ],
+    },
+}
+PHASES = ('load', 'build', 'solve')
+
+
+def _quiet(fn):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn()
+
+
+def _peak_memory(fn):
+    """Peak traced Python heap of one extra run of ``fn``, kept out of the timed runs."""
+    tracemalloc.start()
+    try:
+        _quiet(fn)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_placement(workdir, channels, placements, engines, repeat):
+    path = os.path.join(workdir, f'curves_{channels}x{placements}.xlsx')
+    synthetic.write_curve_workbook(path, channels, placements)
+    request = synthetic.placement_request(channels, placements)
+    results = []
+    for engine in engines:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            curves = spend_optimization.load_curves(path)
+            load_time = time.perf_counter() - start
+            opt = spend_optimization.SpendOptimization(curves=curves, engine=engine, **request)
+            result = _quiet(opt.run)
+            samples.append({
+                'load': load_time,
+                'build': result['timings']['build'],
+                'solve': result['timings']['solve'],
+                'objective': result['total_return'],
+                'status': result.get('status'),
+            })
+        peak = _peak_memory(spend_optimization.SpendOptimization(curves=curves, engine=engine, **request).run)
+        results.append(_summarize(f'placement/{channels}ch x {placements}pl', engine, samples, peak))
+    return results
+
+
+def bench_alpha(workdir, brands, medias, periods, engines, repeat):
+    case_dir = os.path.join(workdir, f'document_{brands}x{medias}x{periods}')
+    os.makedirs(case_dir, exist_ok=True)
+    prior_total = synthetic.write_document_workbook(
+        os.path.join(case_dir, 'Optimization_document.xlsx'), brands, medias, periods
+    )
+    results = []
+    cwd = os.getcwd()
+    os.chdir(case_dir)
+    try:
+        for engine in engines:
+            samples = []
+            optimizer = lambda: alpha.SpendOptimization(  # noqa: E731
+                budget=prior_total, media_budget_limits=None, media_budget_limits_pct=None,
+                locked_media_allocations=None, brand='all', brand_budget_constraints=None,
+                engine=engine,
+            )
+            for _ in range(repeat):
+                # Drop the cached document so every sample pays the (snapshot) load.
+                alpha._documents.clear()
+                result = _quiet(optimizer().run)
+                samples.append({
+                    'load': result['timings']['load'],
+                    'build': result['timings']['build'],
+                    'solve': result['timings']['solve'],
+                    'objective': float(result['total_return']),
+                    'status': result['engine'],
+                })
+            peak = _peak_memory(optimizer().run)
+            results.append(_summarize(f'alpha/{brands}b x {medias}m x {periods}t', engine, samples, peak))
+    finally:
+        os.chdir(cwd)
+    return results
+
+
+def _summarize(case, engine, samples, peak_memory):
+    summary = {'case': case, 'engine': engine, 'repeat': len(samples)}
+    for key in PHASES:
+        summary[key] = statistics.median(s[key] for s in samples)
+    summary['peak_memory'] = peak_memory
+    summary['objective'] = samples[-1]['objective']
+    summary['status'] = samples[-1]['status']
+    return summary
+
+
+def compare(results, baseline, threshold, min_seconds):
+    """Phase regressions of ``results`` against ``baseline`` as printable strings."""
+    previous = {(r['case'], r['engine']): r for r in baseline['results']}
+    regressions = []
+    for r in results:
+        base = previous.get((r['case'], r['engine']))
+        if base is None:
+            continue
+        for phase in PHASES:
+            new, old = r[phase], base[phase]
+            if new > old * (1 + threshold) and new - old > min_seconds:
+                regressions.append(
+                    f"{r['case']} [{r['engine']}] {phase}: {old * 1000:.1f}ms -> {new * 1000:.1f}ms"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the /optimize and alpha optimizers.")
+    parser.add_argument('--suite', choices=sorted(SUITES), default='small')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="write results JSON here")
+    parser.add_argument('--save-baseline', help="write results as the new baseline JSON")
+    parser.add_argument('--compare', help="baseline JSON to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed relative slowdown per phase")
+    parser.add_argument('--min-seconds', type=float, default=0.005, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    suite = SUITES[args.suite]
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for channels, placements in suite['placement']:
+            results += bench_placement(workdir, channels, placements, PLACEMENT_ENGINES, args.repeat)
+        for brands, medias, periods, engines in suite['alpha']:
+            results += bench_alpha(workdir, brands, medias, periods, engines, args.repeat)
+
+    print(f"{'case':<34} {'engine':<14} {'load':>9} {'build':>9} {'solve':>9} {'peak MB':>8} {'objective':>14}")
+    for r in results:
+        print(f"{r['case']:<34} {r['engine']:<14} {r['load'] * 1000:>7.1f}ms {r['build'] * 1000:>7.1f}ms "
+              f"{r['solve'] * 1000:>7.1f}ms {r['peak_memory'] / 2 ** 20:>8.1f} {r['objective']:>14.2f}")
+
+    report = {'suite': args.suite, 'python': sys.version.split()[0], 'results': results}
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold, args.min_seconds)
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Synthetic inputs for the optimizer benchmarks.
+
+``write_curve_workbook`` produces an Input.xlsx-style workbook with
+Velo_Curve/Grizzly_Curve sheets for the /optimize placement model (and
+optionally the overview sheets), and
+``write_document_workbook`` an Optimization_document.xlsx-style workbook
+(Base, Response Curve parameters, Media Spending in prior year) for the
+alpha optimizer. Both are deterministic for a given seed.
+"""
+import numpy as np
+import pandas as pd
+
+SPEND_STEP = 500
+
+
+def write_curve_workbook(path, channels, placements, seed=0, overview_weeks=0):
+    """
+    Velo/Grizzly curve sheets with ``channels`` channels each and
+    ``placements`` spend rows. With ``overview_weeks`` the workbook also
+    gets the overview sheets in front of them, like the real Input.xlsx.
+    """
+    rng = np.random.default_rng(seed)
+    spend = np.arange(placements) * SPEND_STEP
+    with pd.ExcelWriter(path) as writer:
+        if overview_weeks:
+            names = [f"{'DTC' if c % 2 == 0 else 'HCP'} Channel {c}" for c in range(channels)]
+            write_overview_sheets(writer, names, overview_weeks, rng)
+        for sheet in ('Velo_Curve', 'Grizzly_Curve'):
+            columns = {'Spend': spend}
+            for c in range(channels):
+                prefix = 'DTC' if c % 2 == 0 else 'HCP'
+                scale = rng.uniform(0.5, 3)
+                saturation = rng.uniform(0.1, 0.5) * spend[-1] + SPEND_STEP
+                # Return per dollar of a saturating response curve.
+                roi = scale * saturation * (1 - np.exp(-spend / saturation)) / np.maximum(spend, 1)
+                columns[f'{prefix} Channel {c}'] = np.round(roi, 4)
+            pd.DataFrame(columns).to_excel(writer, sheet_name=sheet, index=False)
+    return spend
+
+
+def write_overview_sheets(writer, names, weeks, rng, segments=('High', 'Medium', 'Low')):
+    """Channel mapping, weekly activity per segment and weekly Rx sheets for the channels ``names``."""
+    week = pd.date_range('2023-01-02', periods=weeks, freq='7D').strftime('%Y-%m-%d')
+    pd.DataFrame({
+        'variable': names,
+        'Channel': [name.split()[0] for name in names],
+        'Sub_Category': [f'{name.split()[0]} {c % 3}' for c, name in enumerate(names)],
+        'Category': ['Media' if name.startswith('DTC') else 'Field' for name in names],
+    }).to_excel(writer, sheet_name='Mapping', index=False)
+    activity = rng.uniform(0, 100, size=(weeks * len(segments), len(names)))
+    segment_sheet = pd.DataFrame(activity, columns=names)
+    segment_sheet.insert(0, 'HCP', rng.integers(10, 100, size=len(segment_sheet)))
+    segment_sheet.insert(0, 'Segment', np.tile(segments, weeks))
+    segment_sheet.insert(0, 'Week', np.repeat(week, len(segments)))
+    segment_sheet.to_excel(writer, sheet_name='Segment', index=False)
+    weekly = pd.DataFrame(rng.uniform(0, 300, size=(weeks, len(names))), columns=names)
+    actual = rng.integers(100, 300, size=weeks)
+    weekly.insert(0, 'Predicted Rx', np.round(actual * rng.uniform(0.9, 1.1, size=weeks)))
+    weekly.insert(0, 'Actual Rx', actual)
+    weekly.insert(0, 'Week', week)
+    weekly.to_excel(writer, sheet_name='Data', index=False)
+
+
+def placement_request(channels, placements, seed=0):
+    """OptimizationRequest payload with a few limits and one frozen channel."""
+    rng = np.random.default_rng(seed)
+    max_spend = (placements - 1) * SPEND_STEP
+    names = [f"{'dtc' if c % 2 == 0 else 'hcp'} channel {c}_velo" for c in range(channels)]
+    limited = rng.choice(names, size=max(1, channels // 4), replace=False)
+    return {
+        'budget': int(channels * max_spend * 0.6),
+        'brand': 'all',
+        'channelLimits': {
+            c: {'lower': str(SPEND_STEP), 'upper': str(int(max_spend * 0.8))} for c in limited
+        },
+        'frozen_channels_data': {names[0]: int(SPEND_STEP * (placements // 3))},
+    }
+
+
+def write_document_workbook(path, brands, medias, periods, seed=0, beta_range=(0.3, 0.9)):
+    """Base / Response Curve parameters / prior-year sheets for a brands x medias x periods portfolio."""
+    rng = np.random.default_rng(seed)
+    brand_names = [f'Brand{b}' for b in range(brands)]
+    media_names = [f'Media {m}' for m in range(medias)]
+    period_ids = list(range(1, periods + 1))
+    base = pd.DataFrame(
+        [(b, t, rng.uniform(50, 150), rng.uniform(1, 5)) for b in brand_names for t in period_ids],
+        columns=['Brand', 'Period', 'Base', 'Price'],
+    )
+    curve = pd.DataFrame(
+        [(b, m, rng.uniform(0.001, 0.01), rng.uniform(*beta_range)) for b in brand_names for m in media_names],
+        columns=['Brand', 'media type', 'alpha', 'Beta'],
+    )
+    prior = pd.DataFrame(
+        [(b, m, t, rng.uniform(10, 100)) for b in brand_names for m in media_names for t in period_ids],
+        columns=['Brand', 'media', 'period', 'spending'],
+    )
+    with pd.ExcelWriter(path) as writer:
+        base.to_excel(writer, sheet_name='Base', index=False)
+        curve.to_excel(writer, sheet_name='Response Curve parameters', index=False)
+        prior.to_excel(writer, sheet_name='Media Spending in prior year', index=False)
+    return float(prior['spending'].sum())
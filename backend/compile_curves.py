@@ -0,0 +1,31 @@
+"""
+Compile the curve sheets of Input.xlsx into a snapshot the service loads without pandas.
+
+    python compile_curves.py [public/data/Input.xlsx] [-o public/data/Input.snapshot]
+
+The service picks the snapshot up automatically when it sits next to the
+workbook and was compiled from its current content.
+"""
+import argparse
+import time
+
+from spend_optimization import INPUT_PATH, load_curves, snapshot_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('workbook', nargs='?', default=INPUT_PATH)
+    parser.add_argument('-o', '--output', help="snapshot directory (default: <workbook>.snapshot)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    curves = load_curves(args.workbook)
+    output = args.output or snapshot_path(args.workbook)
+    curves.save(output)
+    shapes = ", ".join(f"{brand}: {sheet['returns'].shape[0]} channels x {sheet['returns'].shape[1]} placements"
+                       for brand, sheet in curves.brands.items())
+    print(f"Wrote {output} ({shapes}) in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Monte Carlo return distributions, shared by the /optimize service and the
+alpha optimizer.
+
+Each model supplies its own per-sample total; this module draws the
+samples a memory-bounded chunk at a time and summarizes the totals the
+same way for both.
+"""
+import numpy as np
+
+# Reported percentiles, the share of worst samples behind the downside
+# figures, and the memory budget of one chunk of samples.
+RISK_PERCENTILES = (5, 25, 50, 75, 95)
+RISK_TAIL = 0.05
+MONTE_CARLO_CHUNK_BYTES = 32 * 2**20
+
+
+def covariance_factor(covariance):
+    """``L`` with ``L @ L.T == covariance``; an eigendecomposition covers semi-definite matrices."""
+    covariance = np.asarray(covariance, dtype=float)
+    try:
+        return np.linalg.cholesky(covariance)
+    except np.linalg.LinAlgError:
+        w, v = np.linalg.eigh(covariance)
+        if w.min() < -1e-9 * max(abs(w).max(), 1.0):
+            raise ValueError("covariance is not positive semi-definite")
+        return v * np.sqrt(np.clip(w, 0, None))
+
+
+def sampled_totals(totals, row_bytes, draws=None, shape=(), samples=0, seed=None,
+                   chunk_bytes=MONTE_CARLO_CHUNK_BYTES):
+    """
+    ``totals(batch)`` of every sample, one total per sample.
+
+    The samples are the rows of ``draws`` if given, otherwise ``samples``
+    standard normal arrays of ``shape`` drawn from ``seed``. They are
+    passed to ``totals`` in chunks of as many samples as fit in
+    ``chunk_bytes`` at ``row_bytes`` each.
+    """
+    chunk = max(1, chunk_bytes // max(row_bytes, 1))
+    if draws is not None:
+        batches = (draws[i:i + chunk] for i in range(0, len(draws), chunk))
+    else:
+        rng = np.random.default_rng(seed)
+        batches = (rng.standard_normal((min(chunk, samples - i),) + tuple(shape)) for i in range(0, samples, chunk))
+    return np.concatenate([totals(batch) for batch in batches] or [np.empty(0)])
+
+
+def summarize_returns(totals, nominal, percentiles=RISK_PERCENTILES, tail=RISK_TAIL):
+    """
+    Distribution summary of sampled total returns against the ``nominal``
+    one: mean, spread, ``percentiles`` and the downside, i.e. how likely
+    and how deep a shortfall is (value at risk and expected shortfall of
+    the worst ``tail`` of samples, and the semi-deviation below nominal).
+    """
+    k = max(1, int(np.ceil(tail * len(totals))))
+    worst = np.partition(totals, k - 1)[:k]
+    shortfall = np.minimum(totals - nominal, 0)
+    return {
+        "samples": len(totals),
+        "nominal": float(nominal),
+        "mean": float(totals.mean()),
+        "std": float(totals.std()),
+        "min": float(totals.min()),
+        "max": float(totals.max()),
+        "percentiles": {f"p{q:g}": float(v) for q, v in zip(percentiles, np.percentile(totals, percentiles))},
+        "downside": {
+            "tail": tail,
+            "probability_below_nominal": float(np.mean(totals < nominal)),
+            "value_at_risk": float(nominal - worst.max()),
+            "expected_shortfall": float(nominal - worst.mean()),
+            "semi_deviation": float(np.sqrt(np.mean(shortfall ** 2))),
+        },
+    }
@@ -1,12 +1,48 @@
-from pulp import LpMaximize, LpMinimize, LpProblem, LpVariable, lpSum, LpInteger
-import pandas as pd
-from fastapi import FastAPI
+import time
+
+_import_started = time.perf_counter()
+
+from pulp import LpMaximize, LpProblem, LpVariable, LpInteger
+from pulp import LpAffineExpression, LpConstraint, LpConstraintEQ, LpConstraintGE, LpConstraintLE
+import numpy as np
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, Histogram, generate_latest
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+import asyncio
+import contextlib
+import gzip
+import hashlib
+import json
+import logging
+import multiprocessing
 import os
-from pulp import LpStatus, value
-from typing import Optional, Dict, Any, Union
+import queue
+import re
+import signal
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from pulp import LpStatus, value, PULP_CBC_CMD, PulpSolverError
+from pulp import LpSolutionIntegerFeasible, LpSolutionOptimal
+from typing import Optional, Dict, Any, List, Union
+
+from monte_carlo import MONTE_CARLO_CHUNK_BYTES, RISK_PERCENTILES, covariance_factor, sampled_totals, summarize_returns
+
+# Optional encoders of the compact response formats (see encode_content).
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -18,121 +54,2725 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+INPUT_PATH = os.path.join(os.getcwd(), 'public', 'data', 'Input.xlsx')
+CURVE_SHEETS = {'velo': 'Velo_Curve', 'grizzly': 'Grizzly_Curve'}
+# Brands a request may optimize: one curve sheet or 'all' of them.
+BRANDS = ('all',) + tuple(CURVE_SHEETS)
+
+
+CURVE_SNAPSHOT_FORMAT = 1
+
+
+class CurveData:
+    """
+    Parsed curve sheets of Input.xlsx.
+
+    ``brands`` maps each brand to a dict with the spend column (``spend``),
+    the channel names as the optimizer sees them (``channels``, e.g.
+    ``'dtc tv_velo'``) and the return matrix laid out channels x placements
+    (``returns``). ``version`` is the content hash of the workbook.
+    """
+
+    def __init__(self, version, brands):
+        self.version = version
+        self.brands = brands
+
+    def save(self, snapshot_dir):
+        """Write the snapshot: one .npy per brand array plus meta.json with the channel names."""
+        os.makedirs(snapshot_dir, exist_ok=True)
+        for brand, sheet in self.brands.items():
+            for name in ('spend', 'returns'):
+                np.save(os.path.join(snapshot_dir, f"{brand}_{name}.npy"), np.ascontiguousarray(sheet[name]))
+        meta = {
+            'format': CURVE_SNAPSHOT_FORMAT,
+            'version': self.version,
+            'channels': {brand: sheet['channels'] for brand, sheet in self.brands.items()},
+        }
+        with open(os.path.join(snapshot_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, snapshot_dir):
+        """Read a snapshot written by ``save``; None if it is missing or of another format."""
+        meta_path = os.path.join(snapshot_dir, 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get('format') != CURVE_SNAPSHOT_FORMAT:
+            return None
+        brands = {
+            brand: {
+                'spend': np.load(os.path.join(snapshot_dir, f"{brand}_spend.npy")),
+                'channels': channels,
+                'returns': np.load(os.path.join(snapshot_dir, f"{brand}_returns.npy")),
+            }
+            for brand, channels in meta['channels'].items()
+        }
+        return cls(meta['version'], brands)
+
+
+def snapshot_path(file_path):
+    return os.path.splitext(file_path)[0] + '.snapshot'
+
+
+def _file_digest(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_curves(file_path, version=None):
+    # pandas is only needed to parse the workbook, which a current snapshot skips.
+    import pandas as pd
+
+    sheets = pd.read_excel(file_path, sheet_name=list(CURVE_SHEETS.values()))
+    brands = {}
+    for brand, sheet in CURVE_SHEETS.items():
+        df = sheets[sheet]
+        brands[brand] = {
+            'spend': df.iloc[:, 0].to_numpy(dtype=float),
+            'channels': [str(x).lower() + '_' + brand for x in df.columns[1:]],
+            'returns': np.ascontiguousarray(df.iloc[:, 1:].to_numpy(dtype=float).T),
+        }
+    return CurveData(version or _file_digest(file_path), brands)
+
+
+class CurveStore:
+    """
+    Process-wide cache of the curve sheets.
+
+    The curves are loaded once and kept as NumPy arrays, from the snapshot
+    next to the workbook (see compile_curves.py) when it was compiled from
+    the workbook's current content, otherwise by parsing the workbook. ``get``
+    only stats the file; it is re-hashed when its mtime moves and reloaded
+    when the content hash actually changed. Without a workbook the snapshot
+    is served as is.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.snapshot_path = snapshot_path(file_path)
+        self._lock = threading.Lock()
+        self._data = None
+        self._mtime = None
+
+    def get(self):
+        try:
+            mtime = os.stat(self.file_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        data = self._data
+        if data is not None and mtime == self._mtime:
+            return data
+        with self._lock:
+            if self._data is None or mtime != self._mtime:
+                self._data = self._load(mtime)
+                self._mtime = mtime
+            return self._data
+
+    def _load(self, mtime):
+        if mtime is None:
+            data = CurveData.load(self.snapshot_path)
+            if data is None:
+                raise FileNotFoundError(f"Curve workbook not found at {self.file_path}")
+            logger.info("Loading curve data from %s", self.snapshot_path)
+            return data
+        version = _file_digest(self.file_path)
+        if self._data is not None and version == self._data.version:
+            return self._data
+        data = CurveData.load(self.snapshot_path)
+        if data is not None and data.version == version:
+            logger.info("Loading curve data from %s", self.snapshot_path)
+            return data
+        if data is not None:
+            logger.info("Snapshot %s is out of date; reading %s", self.snapshot_path, self.file_path)
+        logger.info("Loading curve data from %s", self.file_path)
+        return load_curves(self.file_path, version)
+
+
+curve_store = CurveStore(INPUT_PATH)
+
+
+def _limit_value(limit):
+    # Limits arrive from the frontend as strings; only plain digit strings count.
+    if isinstance(limit, str):
+        return int(limit) if limit and limit.isdigit() else None
+    if isinstance(limit, (int, float)) and not isinstance(limit, bool):
+        return int(limit)
+    return None
+
+
+def channel_limits(channels, bounds_dict, frozen_channels_data):
+    """
+    Normalize channelLimits/frozen_channels_data into per-channel arrays.
+
+    Returns ``(lower, upper, frozen)``, aligned with ``channels``; NaN marks
+    a missing limit. A frozen channel ignores its lower/upper limits.
+    """
+    n = len(channels)
+    lower = np.full(n, np.nan)
+    upper = np.full(n, np.nan)
+    frozen = np.full(n, np.nan)
+    for k, c in enumerate(channels):
+        frozen_spend = frozen_channels_data.get(c, None)
+        if frozen_spend not in [None, [], {}, '']:
+            frozen[k] = int(frozen_spend)
+            continue
+        spend_bounds = bounds_dict.get(c) or {}
+        lower_bound = _limit_value(spend_bounds.get("lower"))
+        upper_bound = _limit_value(spend_bounds.get("upper"))
+        if lower_bound is not None:
+            lower[k] = lower_bound
+        if upper_bound is not None:
+            upper[k] = upper_bound
+    return lower, upper, frozen
+
+
+MAX_KNAPSACK_CELLS = 50_000_000
+
+
+MAX_REPORTED_CONFLICTS = 50
+
+
+def feasibility_report(channels, spend_grid, lower, upper, frozen, budget):
+    """
+    Check a request's limits against the spend grid and the budget before
+    anything is solved.
+
+    Looks for channels whose lower limit exceeds the upper one, frozen
+    spend that is not a placement on the grid, limits that no placement
+    satisfies, frozen spend over the budget and the cheapest spend the
+    limits require over the budget. Returns ``{"feasible", "conflicts",
+    "n_conflicts"}``; each conflict names its type and channels. Costs
+    O(channels * log(placements)).
+    """
+    conflicts = []
+    grid = np.unique(spend_grid)
+    tolerance = 1e-6 * np.maximum(1, np.abs(frozen))
+
+    with np.errstate(invalid='ignore'):
+        crossed = lower > upper
+    for k in np.flatnonzero(crossed):
+        conflicts.append({"type": "lower_above_upper", "channel": channels[k],
+                          "lower": float(lower[k]), "upper": float(upper[k])})
+
+    is_frozen = ~np.isnan(frozen)
+    # The grid values on either side of each frozen spend.
+    position = np.searchsorted(grid, frozen)
+    above = grid[np.minimum(position, len(grid) - 1)]
+    below = grid[np.maximum(position - 1, 0)]
+    with np.errstate(invalid='ignore'):
+        on_grid = (np.abs(above - frozen) <= tolerance) | (np.abs(below - frozen) <= tolerance) | (frozen == 0)
+    for k in np.flatnonzero(is_frozen & ~on_grid):
+        conflicts.append({"type": "frozen_off_grid", "channel": channels[k], "frozen": float(frozen[k])})
+
+    # Cheapest placement that meets each channel's lower limit (or 0 when
+    # spending nothing is allowed).
+    needs_spend = ~is_frozen & (np.nan_to_num(lower) > 0)
+    first = np.searchsorted(grid, np.where(needs_spend, lower, 0) - 1e-9)
+    min_spend = np.where(first < len(grid), grid[np.minimum(first, len(grid) - 1)], np.inf)
+    with np.errstate(invalid='ignore'):
+        unreachable = needs_spend & ~crossed & ((min_spend == np.inf) | (min_spend > upper))
+    for k in np.flatnonzero(unreachable):
+        conflicts.append({"type": "no_placement_within_limits", "channel": channels[k],
+                          "lower": float(lower[k]), "upper": None if np.isnan(upper[k]) else float(upper[k])})
+
+    frozen_total = float(np.nansum(frozen))
+    if frozen_total > budget:
+        conflicts.append({"type": "frozen_over_budget", "frozen": frozen_total, "budget": budget,
+                          "channels": [channels[k] for k in np.flatnonzero(is_frozen & (frozen > 0))]})
+    required = np.where(is_frozen, np.nan_to_num(frozen), np.where(needs_spend, min_spend, 0.0))
+    if not unreachable.any() and frozen_total <= budget and required.sum() > budget:
+        conflicts.append({"type": "required_spend_over_budget", "required": float(required.sum()),
+                          "budget": budget, "channels": [channels[k] for k in np.flatnonzero(required > 0)]})
+
+    return {
+        "feasible": not conflicts,
+        "conflicts": conflicts[:MAX_REPORTED_CONFLICTS],
+        "n_conflicts": len(conflicts),
+    }
+
+
+def placement_objective(returns):
+    """Objective weight of every channel x placement cell, shared by all engines."""
+    return returns * np.arange(returns.shape[1])
+
+
+def spend_unit(spend_grid, max_decimals=4):
+    """
+    Largest step that every spend value is an integer multiple of.
+
+    Raises ValueError when the spend column is not on a discrete grid with
+    at most ``max_decimals`` decimals, since the DP engine cannot be exact then.
+    """
+    for decimals in range(max_decimals + 1):
+        scaled = spend_grid * 10 ** decimals
+        ints = np.rint(scaled)
+        if np.allclose(scaled, ints, rtol=0, atol=1e-6):
+            step = np.gcd.reduce(np.abs(ints).astype(np.int64))
+            return step / 10 ** decimals if step else 1.0
+    raise ValueError("spend grid is not on a discrete step; use the 'pulp' engine")
+
+
+def allowed_placements(spend_grid, lower, upper, frozen):
+    """
+    Channel x placement mask of rows that satisfy each channel's limits,
+    plus a per-channel mask of whether selecting no placement (zero spend)
+    is allowed.
+    """
+    spend = spend_grid[None, :]
+    lo = lower[:, None]
+    hi = upper[:, None]
+    fz = frozen[:, None]
+    tolerance = 1e-6 * np.maximum(1, np.abs(fz))
+    with np.errstate(invalid='ignore'):
+        allowed = (
+            (np.isnan(lo) | (spend >= lo))
+            & (np.isnan(hi) | (spend <= hi))
+            & (np.isnan(fz) | (np.abs(spend - fz) <= tolerance))
+        )
+        allow_none = (
+            (np.isnan(lower) | (lower <= 0))
+            & (np.isnan(upper) | (upper >= 0))
+            & (np.isnan(frozen) | (frozen == 0))
+        )
+    return allowed, allow_none
+
+
+def placement_rows(lower, upper, frozen):
+    """Row count of the full placement MILP: a choice row per channel, the budget row and the limit rows."""
+    limited = ~(np.isnan(lower) & np.isnan(upper) & np.isnan(frozen))
+    return len(lower) + 1 + int(np.count_nonzero(limited))
+
+
+class Presolve:
+    """
+    The placement problem reduced before it goes to an engine.
+
+    ``keep`` marks the channel x placement rows that remain variables and
+    ``must_choose`` the channels whose limits rule out spending nothing, so
+    they have to pick one of them; together they replace the limit rows.
+    Every other row was out of the channel's limits, over the budget the
+    other channels leave it, or dominated by a row (or by no spend) that
+    costs no more and returns at least as much. Frozen channels are fixed
+    outright: ``fixed`` is their placement row (-1 for none) and ``budget``
+    what is left for the rest. ``infeasible`` is set when the reduction
+    already shows there is no solution.
+    """
+
+    def __init__(self, keep, must_choose, fixed, budget, infeasible, removed):
+        self.keep = keep
+        self.must_choose = must_choose
+        self.fixed = fixed
+        self.budget = budget
+        self.infeasible = infeasible
+        self.removed = removed
+
+    @property
+    def n_vars(self):
+        return int(np.count_nonzero(self.keep))
+
+    @property
+    def n_rows(self):
+        return int(np.count_nonzero(self.keep.any(axis=1))) + 1
+
+    def selection(self, x):
+        """Channel x placement selection of the free channels ``x`` plus the fixed ones."""
+        x = x.copy()
+        chosen = np.flatnonzero(self.fixed >= 0)
+        x[chosen, self.fixed[chosen]] = 1
+        return x
+
+
+def presolve(spend_grid, objective, lower, upper, frozen, budget):
+    """
+    Reduce the placement problem without changing its optimal value.
+
+    Rows outside a channel's limits go first. Frozen channels are fixed to
+    their best matching row. Then every free channel drops the rows that
+    cost more than the budget minus the cheapest feasible spend of all
+    other channels, and finally the rows that do not beat every cheaper
+    row of the channel (and zero spend, where that is allowed).
+    """
+    n_channels = objective.shape[0]
+    spend = np.broadcast_to(spend_grid, objective.shape)
+    allowed, allow_none = allowed_placements(spend_grid, lower, upper, frozen)
+    removed = {
+        "out_of_limits": int(objective.size - np.count_nonzero(allowed)),
+        "over_budget": 0,
+        "dominated": 0,
+        "fixed_channels": 0,
+    }
+
+    is_frozen = ~np.isnan(frozen)
+    candidates = np.where(allowed, objective, -np.inf)
+    best = candidates.argmax(axis=1)
+    best_value = candidates[np.arange(n_channels), best]
+    fixed = np.full(n_channels, -1)
+    pick = is_frozen & np.isfinite(best_value) & ~(allow_none & (best_value <= 0))
+    fixed[pick] = best[pick]
+    removed["fixed_channels"] = int(np.count_nonzero(is_frozen))
+    infeasible = bool(np.any(is_frozen & ~np.isfinite(best_value) & ~allow_none))
+    budget_left = budget - spend_grid[fixed[pick]].sum()
+
+    keep = allowed & ~is_frozen[:, None]
+    must_choose = ~is_frozen & ~allow_none
+    # The cheapest spend that meets each channel's limits, and what the
+    # others leave for it.
+    min_spend = np.where(must_choose, np.where(keep, spend, np.inf).min(axis=1), 0.0)
+    tolerance = 1e-6 * max(1, abs(budget))
+    infeasible = infeasible or not np.all(np.isfinite(min_spend)) or min_spend.sum() > budget_left + tolerance
+    if not infeasible:
+        residual = budget_left - (min_spend.sum() - min_spend)
+        within_budget = spend <= residual[:, None] + tolerance
+        removed["over_budget"] = int(np.count_nonzero(keep & ~within_budget))
+        keep &= within_budget
+
+        # Sorted by spend (best objective first among equal spend), a row
+        # stays only if it beats every cheaper row of its channel.
+        values = np.where(keep, objective, -np.inf)
+        order = np.lexsort((-values, spend), axis=1)
+        sorted_values = np.take_along_axis(values, order, axis=1)
+        floor = np.where(must_choose, -np.inf, 0.0)
+        previous = np.maximum.accumulate(
+            np.concatenate([floor[:, None], sorted_values[:, :-1]], axis=1), axis=1
+        )
+        frontier = np.zeros(keep.shape, dtype=bool)
+        np.put_along_axis(frontier, order, sorted_values > previous, axis=1)
+        removed["dominated"] = int(np.count_nonzero(keep & ~frontier))
+        keep &= frontier
+    else:
+        keep[:] = False
+
+    pre = Presolve(keep, must_choose, fixed, budget_left, infeasible, removed)
+    removed["variables"] = int(objective.size - pre.n_vars)
+    removed["constraints"] = placement_rows(lower, upper, frozen) - pre.n_rows
+    return pre
+
+
+class KnapsackTable:
+    """
+    Exact dynamic program for the placement problem.
+
+    It is a multiple-choice knapsack: every channel picks at most one
+    placement row and the total spend must fit the budget. The table is
+    built once up to ``budget`` over the integer spend grid; ``choices``
+    then reads the optimal selection off for any budget up to that, which
+    is what the frontier sweep relies on. ``progress`` (a SolveProgress)
+    gets an event per channel folded in. ``allowed`` may replace the
+    ``(allowed, allow_none)`` masks derived from the limits, e.g. with a
+    Presolve's.
+    """
+
+    def __init__(self, spend_grid, objective, lower, upper, frozen, budget, progress=None, allowed=None):
+        self.unit = spend_unit(spend_grid)
+        self.units = np.rint(spend_grid / self.unit).astype(np.int64)
+        n_channels = objective.shape[0]
+        capacity = max(int(np.floor(budget / self.unit + 1e-9)), 0)
+        if n_channels * (capacity + 1) > MAX_KNAPSACK_CELLS:
+            raise ValueError("budget is too large for the 'dp' engine at this spend step")
+        self.capacity = capacity
+
+        if allowed is None:
+            allowed = allowed_placements(spend_grid, lower, upper, frozen)
+        allowed, allow_none = allowed
+        # value[w]: best objective of the channels seen so far within w units.
+        value = np.zeros(capacity + 1)
+        choice = np.full((n_channels, capacity + 1), -1, dtype=np.int32)
+        for k in range(n_channels):
+            if progress is not None:
+                progress.check()
+            best = value.copy() if allow_none[k] else np.full(capacity + 1, -np.inf)
+            for i in np.flatnonzero(allowed[k]):
+                s = self.units[i]
+                if s > capacity:
+                    continue
+                candidate = value[:capacity + 1 - s] + objective[k, i]
+                better = candidate > best[s:]
+                best[s:][better] = candidate[better]
+                choice[k, s:][better] = i
+            value = best
+            if progress is not None:
+                progress.report(event="channel", channel=k + 1, channels=n_channels)
+        self.value = value
+        self.choice = choice
+
+    def best(self, budget):
+        return self.value[self._budget_units(budget)]
+
+    def choices(self, budget):
+        """Placement row per channel (-1 for none), or None when infeasible."""
+        w = self._budget_units(budget)
+        if not np.isfinite(self.value[w]):
+            return None
+        picks = np.full(self.choice.shape[0], -1)
+        for k in range(self.choice.shape[0] - 1, -1, -1):
+            i = self.choice[k, w]
+            if i >= 0:
+                picks[k] = i
+                w -= self.units[i]
+        return picks
+
+    def _budget_units(self, budget):
+        w = int(np.floor(budget / self.unit + 1e-9))
+        if w < 0:
+            raise ValueError("budget must not be negative")
+        return min(w, self.capacity)
+
+
+class PlacementModel:
+    """
+    The placement MILP in matrix form.
+
+    Variable ``j`` selects placement row ``cells[j] % n_placements`` for
+    channel ``cells[j] // n_placements``; without a presolve every cell is a
+    variable and variable ``k * n_placements + i`` is channel ``k``, row
+    ``i``. The problem is: maximize ``objective @ x`` subject to
+    ``row_lower <= A @ x <= row_upper`` with binary ``x``, where ``A`` is
+    kept in coordinate form (``rows``, ``cols``, ``vals``).
+    """
+
+    def __init__(self, channels, n_placements, cells, objective, rows, cols, vals,
+                 row_lower, row_upper, row_names):
+        self.channels = channels
+        self.n_placements = n_placements
+        self.cells = cells
+        self.objective = objective
+        self.rows = rows
+        self.cols = cols
+        self.vals = vals
+        self.row_lower = row_lower
+        self.row_upper = row_upper
+        self.row_names = row_names
+
+    @property
+    def n_vars(self):
+        return len(self.objective)
+
+    @property
+    def n_rows(self):
+        return len(self.row_lower)
+
+    def selection(self, values):
+        """Channel x placement matrix from the variable ``values``."""
+        x = np.zeros(len(self.channels) * self.n_placements)
+        x[self.cells] = values
+        return x.reshape(len(self.channels), self.n_placements)
+
+
+def build_placement_model(channels, spend_grid, returns, budget, lower, upper, frozen, pre=None):
+    """
+    Build the placement MILP from arrays in one pass.
+
+    ``spend_grid`` is the shared spend column, ``returns`` the channels x
+    placements return matrix and ``lower``/``upper``/``frozen`` the arrays
+    from ``channel_limits``. Rows are: one "at most one placement" row per
+    channel, the total budget row, then one spend row per limited channel.
+
+    With a Presolve ``pre`` only its kept rows become variables, the budget
+    row gets the budget left after the fixed channels and the limit rows
+    are replaced by "exactly one placement" for the channels that must
+    spend; channels without variables get no row at all.
+    """
+    n_channels, n_placements = returns.shape
+    if pre is None:
+        cells = np.arange(n_channels * n_placements)
+        choice_channels = np.arange(n_channels)
+        must_choose = np.zeros(n_channels, dtype=bool)
+        limited = np.flatnonzero(~(np.isnan(lower) & np.isnan(upper) & np.isnan(frozen)))
+    else:
+        cells = np.flatnonzero(pre.keep)
+        choice_channels = np.flatnonzero(pre.keep.any(axis=1))
+        must_choose = pre.must_choose[choice_channels]
+        limited = np.array([], dtype=int)
+        budget = pre.budget
+    n_vars = len(cells)
+    var_channel = cells // n_placements
+    objective = placement_objective(returns).ravel()[cells]
+    spend_coef = spend_grid[cells % n_placements]
+
+    choice_row = np.full(n_channels, -1)
+    choice_row[choice_channels] = np.arange(len(choice_channels))
+    budget_row = len(choice_channels)
+    limit_row = np.full(n_channels, -1)
+    limit_row[limited] = budget_row + 1 + np.arange(len(limited))
+    limit_vars = np.flatnonzero(limit_row[var_channel] >= 0)
+    limit_lower = np.where(np.isnan(frozen[limited]), lower[limited], frozen[limited])
+    limit_upper = np.where(np.isnan(frozen[limited]), upper[limited], frozen[limited])
+
+    rows = np.concatenate([
+        choice_row[var_channel],
+        np.full(n_vars, budget_row),
+        limit_row[var_channel[limit_vars]],
+    ])
+    cols = np.concatenate([np.arange(n_vars), np.arange(n_vars), limit_vars])
+    vals = np.concatenate([np.ones(n_vars), spend_coef, spend_coef[limit_vars]])
+    row_lower = np.concatenate([
+        np.where(must_choose, 1.0, -np.inf), [-np.inf], np.nan_to_num(limit_lower, nan=-np.inf),
+    ])
+    row_upper = np.concatenate([
+        np.ones(len(choice_channels)), [budget], np.nan_to_num(limit_upper, nan=np.inf),
+    ])
+    row_names = (
+        [f"{channels[k]}_choice" for k in choice_channels]
+        + ["total_budget"]
+        + [f"{channels[k]}_{'frozen' if not np.isnan(frozen[k]) else 'limit'}_spend" for k in limited]
+    )
+    return PlacementModel(channels, n_placements, cells, objective, rows, cols, vals,
+                          row_lower, row_upper, row_names)
+
+
+def add_pulp_row(problem, terms, name, lo, hi):
+    """Add ``lo <= sum(terms) <= hi`` to ``problem``; returns the keys of the constraints added."""
+    added = []
+    if lo == hi:
+        senses = [(LpConstraintEQ, name, lo)]
+    else:
+        senses = []
+        if np.isfinite(lo):
+            senses.append((LpConstraintGE, name + "_min", lo))
+        if np.isfinite(hi):
+            senses.append((LpConstraintLE, name + "_max", hi))
+    for sense, row_name, rhs in senses:
+        constraint = LpConstraint(LpAffineExpression(terms), sense, row_name, rhs)
+        problem += constraint
+        added.append(constraint.name)
+    return added
+
+
+def to_pulp(model):
+    """
+    Translate a PlacementModel into a PuLP problem.
+
+    Returns ``(problem, variables, row_constraints)``; ``row_constraints``
+    maps each model row name to the keys of its constraints in
+    ``problem.constraints`` (PuLP sanitizes names, and a ranged row becomes
+    a _min and a _max constraint).
+    """
+    problem = LpProblem("Maximize_Return_All", LpMaximize)
+    variables = [
+        LpVariable(f"{model.channels[cell // model.n_placements]}_{cell % model.n_placements}",
+                   cat=LpInteger, lowBound=0, upBound=1)
+        for cell in model.cells.tolist()
+    ]
+    problem += LpAffineExpression(zip(variables, model.objective.tolist()))
+
+    order = np.argsort(model.rows, kind='stable')
+    bounds = np.searchsorted(model.rows[order], np.arange(model.n_rows + 1))
+    cols = model.cols[order].tolist()
+    vals = model.vals[order].tolist()
+    row_constraints = {}
+    for r, name in enumerate(model.row_names):
+        start, stop = bounds[r], bounds[r + 1]
+        terms = [(variables[j], v) for j, v in zip(cols[start:stop], vals[start:stop])]
+        row_constraints[name] = add_pulp_row(
+            problem, terms, name, model.row_lower[r], model.row_upper[r]
+        )
+    return problem, variables, row_constraints
+
+
+class SolveCancelled(Exception):
+    pass
+
+
+class SolveProgress:
+    """
+    Progress channel between a streaming request and the worker solving it.
+
+    The solver ``report``s events and polls ``cancelled``/``check``; the
+    request reads the events with ``next_event`` and may ``cancel``. The
+    queue and flag are multiprocessing manager proxies, so the object can
+    be pickled into a pool task.
+    """
+
+    def __init__(self, events, cancel_event):
+        self.events = events
+        self.cancel_event = cancel_event
+        self.started = time.time()
+
+    def report(self, **event):
+        self.events.put({"elapsed": time.time() - self.started, **event})
+
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def check(self):
+        if self.cancelled():
+            raise SolveCancelled()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def next_event(self, timeout):
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class ReturnUnitsProgress:
+    """
+    SolveProgress of a placement MILP that reports the incumbents'
+    ``objective`` and ``bound`` in the units of the result's
+    ``total_return``.
+
+    The model weighs each placement by its index rather than its spend and
+    leaves out the channels presolve fixed, so a model value converts as
+    ``offset + unit * value`` when every spend column is ``unit`` times
+    the placement index. Otherwise there is no exact conversion and the
+    raw values are reported as ``model_objective`` and ``model_bound``.
+    """
+
+    def __init__(self, progress, returns, channel_spend_grid, pre):
+        self.progress = progress
+        n_placements = channel_spend_grid.shape[1]
+        unit = float(channel_spend_grid[0, -1]) / max(n_placements - 1, 1)
+        self.unit = unit if np.allclose(channel_spend_grid, unit * np.arange(n_placements)) else None
+        fixed = pre.selection(np.zeros(returns.shape))
+        self.offset = float(np.nansum(fixed * returns * channel_spend_grid))
+
+    def report(self, **event):
+        for key in ("objective", "bound"):
+            if key not in event:
+                continue
+            if self.unit is None:
+                event[f"model_{key}"] = event.pop(key)
+            elif event[key] is not None:
+                event[key] = self.offset + self.unit * event[key]
+        self.progress.report(**event)
+
+    def __getattr__(self, name):
+        return getattr(self.progress, name)
+
+
+def _kill_child_processes():
+    """
+    Terminate this process's children, i.e. a running CBC.
+
+    Children are found through /proc; elsewhere a cancelled CBC run goes on
+    until it finishes by itself.
+    """
+    task_dir = f"/proc/{os.getpid()}/task"
+    try:
+        tasks = os.listdir(task_dir)
+    except OSError:
+        return
+    for task in tasks:
+        try:
+            with open(os.path.join(task_dir, task, "children")) as f:
+                children = [int(pid) for pid in f.read().split()]
+        except OSError:
+            continue
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+
+CBC_LOG_COUNTS = {"iterations": r"Total iterations:\s+(\d+)", "nodes": r"Enumerated nodes:\s+(\d+)"}
+CBC_INCUMBENT = re.compile(r"Integer solution of (\S+) found .*?after (\d+) iterations and (\d+) nodes")
+CBC_BOUND = re.compile(r"After \d+ nodes, \d+ on tree, \S+ best solution, best possible (\S+)")
+CBC_BOUND_SUMMARY = re.compile(r"(?:Upper|Lower) bound:\s+(\S+)")
+CBC_POLL_INTERVAL = 0.1
+
+
+def _watch_cbc(problem, log_path, progress, done):
+    """
+    Follow the CBC log while it solves: report every new incumbent and
+    kill CBC once the solve is cancelled.
+    """
+    position = 0
+    bound = None
+    while True:
+        finished = done.wait(CBC_POLL_INTERVAL)
+        with open(log_path, 'rb') as f:
+            f.seek(position)
+            chunk = f.read()
+        complete = chunk.rfind(b'\n') + 1
+        position += complete
+        for line in chunk[:complete].decode(errors='replace').splitlines():
+            match = CBC_BOUND.search(line)
+            if match:
+                bound = problem.sense * float(match.group(1))
+            match = CBC_INCUMBENT.search(line)
+            if match:
+                # CBC minimizes, so a maximization's objective is logged negated.
+                progress.report(
+                    event="incumbent",
+                    objective=problem.sense * float(match.group(1)),
+                    bound=bound,
+                    violation=0.0,
+                    iterations=int(match.group(2)),
+                    nodes=int(match.group(3)),
+                )
+        if finished:
+            return
+        if progress.cancelled():
+            _kill_child_processes()
+
+
+def solution_status(problem):
+    """
+    Status of a solved problem: ``'Optimal'`` only for a proven optimum
+    (within the requested gap), ``'Feasible'`` for an incumbent that was cut
+    short by the time limit, otherwise PuLP's status.
+    """
+    if problem.sol_status == LpSolutionOptimal:
+        return "Optimal"
+    if problem.sol_status == LpSolutionIntegerFeasible:
+        return "Feasible"
+    # PuLP reports "Optimal" for a time limit without any solution too.
+    return "Not Solved" if problem.status == 1 else LpStatus[problem.status]
+
+
+def solve_cbc(problem, warm_start=False, progress=None, time_limit=None, mip_gap=None, threads=None):
+    """
+    Solve ``problem`` with CBC without echoing its log to stdout.
+
+    Returns ``(status, stats)``: the ``solution_status`` and the iteration
+    and node counts read from the log (None when CBC did not report them),
+    the relative gap between the incumbent and the best bound, and PuLP's
+    own status. With a SolveProgress, incumbents are reported as CBC finds
+    them and cancelling it stops CBC and raises SolveCancelled.
+    """
+    # PuLP's model/solution files go into the same directory as the log, so a
+    # CBC killed on cancel leaves nothing behind.
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_path = os.path.join(tmp_dir, 'cbc.log')
+        open(log_path, 'w').close()
+        solver = PULP_CBC_CMD(
+            msg=False, warmStart=warm_start, logPath=log_path,
+            timeLimit=time_limit, gapRel=mip_gap, threads=threads,
+        )
+        solver.tmpDir = tmp_dir
+        watcher = None
+        if progress is not None:
+            progress.check()
+            done = threading.Event()
+            watcher = threading.Thread(target=_watch_cbc, args=(problem, log_path, progress, done), daemon=True)
+            watcher.start()
+        try:
+            problem.solve(solver)
+        except PulpSolverError:
+            if progress is None or not progress.cancelled():
+                raise
+        finally:
+            if watcher is not None:
+                done.set()
+                watcher.join()
+        if progress is not None:
+            progress.check()
+        with open(log_path) as f:
+            log = f.read()
+    stats = {}
+    for name, pattern in CBC_LOG_COUNTS.items():
+        match = re.search(pattern, log)
+        stats[name] = int(match.group(1)) if match else None
+
+    status = solution_status(problem)
+    stats["gap"] = None
+    if status == "Optimal":
+        stats["gap"] = 0.0
+    if status in ("Optimal", "Feasible"):
+        match = CBC_BOUND_SUMMARY.search(log)
+        if match:
+            objective = value(problem.objective) or 0.0
+            bound = float(match.group(1))
+            stats["gap"] = abs(bound - objective) / max(abs(objective), 1e-10)
+    stats["lp_status"] = LpStatus[problem.status]
+    return status, stats
+
+
+def solution_values(variables, status):
+    """Values of ``variables`` after a solve; all zero when the solve produced no solution."""
+    if status not in ("Optimal", "Feasible"):
+        return np.zeros(len(variables))
+    return np.fromiter((v.varValue or 0 for v in variables), dtype=float, count=len(variables))
+
+
+def picks_to_selection(picks, shape):
+    """One-hot channel x placement matrix from KnapsackTable.choices output."""
+    x = np.zeros(shape)
+    if picks is not None:
+        chosen = np.flatnonzero(picks >= 0)
+        x[chosen, picks[chosen]] = 1
+    return x
+
+
+HIGHS_STATUS = {0: "Optimal", 1: "Not Solved", 2: "Infeasible", 3: "Unbounded"}
+
+
+class CbcBackend:
+    """
+    CBC through PuLP. Every solve writes the model out and runs the cbc
+    binary, which costs a fixed few milliseconds, but CBC streams its
+    incumbents and can be killed on cancel.
+
+    A backend ``build``s its own problem from a PlacementModel, can move
+    that problem's budget row with ``set_budget`` and ``solve``s it into
+    ``(values, status, stats)``, with ``stats`` as from ``solve_cbc``.
+    """
+
+    name = 'pulp'
+
+    def build(self, model):
+        problem, variables, row_constraints = to_pulp(model)
+        return problem, variables, problem.constraints[row_constraints["total_budget"][0]]
+
+    def set_budget(self, problem, budget):
+        problem[2].changeRHS(budget)
+
+    def solve(self, problem, progress=None, **options):
+        problem, variables, _ = problem
+        status, stats = solve_cbc(problem, progress=progress, **options)
+        return solution_values(variables, status), status, stats
+
+
+class HighsBackend:
+    """
+    HiGHS through ``scipy.optimize.milp``, solved in-process straight from
+    the model's arrays. It has no incumbent log to stream and ignores
+    ``threads``; a cancel takes effect once the solve returns. SciPy is
+    imported on first use, which the workers' warm-up solve takes care of.
+    """
+
+    name = 'highs'
+
+    def build(self, model):
+        from scipy import sparse
+
+        return {
+            "c": -model.objective,
+            "A": sparse.csr_array((model.vals, (model.rows, model.cols)), shape=(model.n_rows, model.n_vars)),
+            "row_lower": model.row_lower,
+            "row_upper": model.row_upper.copy(),
+            "budget_row": model.row_names.index("total_budget"),
+        }
+
+    def set_budget(self, problem, budget):
+        problem["row_upper"][problem["budget_row"]] = budget
+
+    def solve(self, problem, progress=None, time_limit=None, mip_gap=None, threads=None):
+        from scipy.optimize import Bounds, LinearConstraint, milp
+
+        if progress is not None:
+            progress.check()
+        n_vars = len(problem["c"])
+        options = {"disp": False}
+        if time_limit is not None:
+            options["time_limit"] = time_limit
+        if mip_gap is not None:
+            options["mip_rel_gap"] = mip_gap
+        res = milp(
+            problem["c"], integrality=np.ones(n_vars), bounds=Bounds(0, 1),
+            constraints=LinearConstraint(problem["A"], problem["row_lower"], problem["row_upper"]),
+            options=options,
+        )
+        if progress is not None:
+            progress.check()
+
+        lp_status = HIGHS_STATUS.get(res.status, "Not Solved")
+        status = "Feasible" if res.status == 1 and res.x is not None else lp_status
+        stats = {
+            "iterations": None,
+            "nodes": getattr(res, "mip_node_count", None),
+            "gap": None,
+            "lp_status": lp_status,
+        }
+        if status not in ("Optimal", "Feasible"):
+            return np.zeros(n_vars), status, stats
+        stats["gap"] = float(getattr(res, "mip_gap", 0.0) or 0.0)
+        if progress is not None:
+            progress.report(
+                event="incumbent",
+                objective=-res.fun,
+                bound=-res.mip_dual_bound if getattr(res, "mip_dual_bound", None) is not None else None,
+                violation=0.0,
+                iterations=None,
+                nodes=stats["nodes"],
+            )
+        return np.rint(res.x), status, stats
+
+
+MILP_BACKENDS = {backend.name: backend for backend in (CbcBackend(), HighsBackend())}
+
+ENGINES = ('auto', 'pulp', 'highs', 'dp')
+
+# Bounds of the 'auto' policy, measured with the benchmark suite: the DP
+# table beats both MILP solvers by an order of magnitude while it stays
+# below a few hundred million updates, and HiGHS beats CBC's start-up cost
+# until models reach a couple thousand variables.
+AUTO_DP_MAX_WORK = 200_000_000
+AUTO_HIGHS_MAX_VARS = 2_000
+
+
+def knapsack_work(spend_grid, n_channels, n_vars, budget):
+    """
+    Table updates a KnapsackTable for ``budget`` would make (one per
+    variable and budget unit), or None when the DP engine cannot take the
+    problem: the spend grid is not discrete or the table would be too big.
+    """
+    try:
+        unit = spend_unit(spend_grid)
+    except ValueError:
+        return None
+    width = max(int(np.floor(budget / unit + 1e-9)), 0) + 1
+    if n_channels * width > MAX_KNAPSACK_CELLS:
+        return None
+    return n_vars * width
+
+
+def choose_engine(spend_grid, n_channels, n_vars, budget, streaming=False):
+    """
+    Engine the 'auto' policy runs for a problem of ``n_channels`` channels
+    and ``n_vars`` variables: ``(engine, reason)``.
+
+    The exact DP wins whenever the spend grid allows a small enough table;
+    otherwise HiGHS takes small models and CBC large ones, and a streamed
+    solve (``streaming``) stays on CBC, whose incumbents can be reported.
+    """
+    work = knapsack_work(spend_grid, n_channels, n_vars, budget)
+    if work is not None and work <= AUTO_DP_MAX_WORK:
+        return 'dp', f"discrete spend grid, {work} table updates"
+    if streaming:
+        return 'pulp', "progress is streamed from CBC's incumbents"
+    if n_vars <= AUTO_HIGHS_MAX_VARS:
+        return 'highs', f"{n_vars} variables, at most {AUTO_HIGHS_MAX_VARS}"
+    return 'pulp', f"{n_vars} variables, more than {AUTO_HIGHS_MAX_VARS}"
+
+
 class SpendOptimization:
-    def __init__(self, budget, channelLimits, frozen_channels_data, brand):
+    """
+    Picks one placement row of the curve sheets per channel to maximize
+    return within ``budget``.
+
+    ``engine`` selects the solver: ``'pulp'`` solves the MILP with CBC,
+    ``'highs'`` with HiGHS, ``'dp'`` solves the same problem exactly as a
+    multiple-choice knapsack over the discrete spend grid and ``'auto'``
+    (default) picks one of them per problem with ``choose_engine``.
+
+    ``time_limit`` (seconds), ``mip_gap`` (relative) and ``threads`` are
+    passed on to the MILP solver; the DP engine is exact and ignores them.
+    """
+
+    def __init__(self, budget, channelLimits, frozen_channels_data, brand, curves=None, engine=None,
+                 time_limit=None, mip_gap=None, threads=None):
 
         self.budget = budget
-        self.bounds_dict = channelLimits
-        self.frozen_channels_data = frozen_channels_data
+        self.bounds_dict = channelLimits or {}
+        self.frozen_channels_data = frozen_channels_data or {}
         self.brand = brand
+        self.curves = curves
+        self.engine = engine or 'auto'
+        if self.engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {self.engine}")
+        self.solver_options = {"time_limit": time_limit, "mip_gap": mip_gap, "threads": threads}
 
-    def run(self):
-        print("Current working directory:", os.getcwd())
-        file_path = os.path.join(os.getcwd(), 'public', 'data', 'Input.xlsx')
-        print("Resolved path:", file_path, flush=True)
-        df_Velo = pd.read_excel(file_path, sheet_name='Velo_Curve')
-        df_Velo.columns = [x.lower() + '_velo' for x in df_Velo.columns]
-        channels_Velo = df_Velo.columns.to_list()[1:]
-        df_Grizzly = pd.read_excel(file_path, sheet_name='Grizzly_Curve')
-        df_Grizzly.columns = [x.lower() + '_grizzly' for x in df_Grizzly.columns]
-        channels_Grizzly = df_Grizzly.columns.to_list()[1:]
+    def _brand_sheets(self, curves):
+        velo = curves.brands['velo']
+        grizzly = curves.brands['grizzly']
         if self.brand == 'all':
-            channels = [x for x in channels_Velo] + [x for x in channels_Grizzly]
-            df_place_hodler = df_Velo
+            return [velo, grizzly], velo
         elif self.brand == 'velo':
-            channels = [x for x in channels_Velo]
-            df_place_hodler = df_Velo
+            return [velo], velo
         elif self.brand == 'grizzly':
-            channels = [x for x in channels_Grizzly]
-            df_place_hodler = df_Grizzly
+            return [grizzly], grizzly
+        raise KeyError('unknown brand')
+
+    def select_curves(self, curves):
+        """Return ``(channels, spend_grid, returns, channel_spend)`` for the requested brand."""
+        brands, place_holder = self._brand_sheets(curves)
+        channels = [c for b in brands for c in b['channels']]
+        returns = np.vstack([b['returns'] for b in brands])
+        # The model prices every channel on the selected spend column, but the
+        # reported spend/return use each channel's own brand sheet.
+        channel_spend = np.vstack([np.broadcast_to(b['spend'], b['returns'].shape) for b in brands])
+        return channels, place_holder['spend'], returns, channel_spend
+
+    def check_feasibility(self, curves=None):
+        """``feasibility_report`` of this request, without building or solving anything."""
+        brands, place_holder = self._brand_sheets(curves or self.curves or curve_store.get())
+        channels = [c for b in brands for c in b['channels']]
+        lower, upper, frozen = channel_limits(channels, self.bounds_dict, self.frozen_channels_data)
+        return feasibility_report(channels, place_holder['spend'], lower, upper, frozen, self.budget)
+
+    def run(self, progress=None):
+        """
+        Solve the scenario. ``progress`` is an optional SolveProgress that
+        receives solver events and can cancel the solve.
+        """
+        start = time.perf_counter()
+        curves = self.curves or curve_store.get()
+        load_time = time.perf_counter() - start
+        channels, spend_grid, returns, channel_spend_grid = self.select_curves(curves)
+        lower, upper, frozen = channel_limits(channels, self.bounds_dict, self.frozen_channels_data)
+
+        start = time.perf_counter()
+        report = feasibility_report(channels, spend_grid, lower, upper, frozen, self.budget)
+        pre = None
+        if report["feasible"]:
+            pre = presolve(spend_grid, placement_objective(returns), lower, upper, frozen, self.budget)
+        presolve_time = time.perf_counter() - start
+        if pre is None or pre.infeasible:
+            x, status = np.zeros(returns.shape), "Infeasible"
+            timings = {"build": 0.0, "solve": 0.0}
+            model = {"variables": 0, "constraints": 0, "iterations": 0, "nodes": None}
+            backend = self.backend('none', "the limits cannot be met")
         else:
-            raise KeyError('unknown brand')
-        # Create the optimization problem
-        model = LpProblem("Maximize_Return_All", LpMaximize)
-        # Define decision variables for each channel and placement
-        vars = {
-            c: [LpVariable(f"{c}_{i}", cat=LpInteger, lowBound=0, upBound=1) for i in range(len(df_place_hodler))]
-            for c in channels
-        }
-        # Ensure that one placement is selected for each channel
-        for c in channels:
-            model += lpSum(vars[c]) <= 1
-        # Total spend constraint (ensure total spend does not exceed the available budget)
-        total_spend = lpSum(
-            vars[c][i] * df_place_hodler.iloc[i, 0]
-            for c in channels
-            for i in range(len(df_place_hodler))
-        )
-        model += total_spend <= self.budget  # Total spend must not exceed the available budget
-        # Apply constraints for each channel (lower bounds, upper bounds, and frozen spends)
-        for c in channels:
-            spend_bounds = self.bounds_dict.get(c, {})
-            lower_bound = spend_bounds.get("lower")
-            upper_bound = spend_bounds.get("upper")
-            frozen_spend = self.frozen_channels_data.get(c, None)
-            spend_expr = lpSum(vars[c][i] * df_place_hodler.iloc[i, 0] for i in range(len(df_place_hodler)))
-            # Apply frozen spend if available
-            if frozen_spend not in [None, [], {}, '']:
-                model += spend_expr == int(frozen_spend), f"{c}_frozen_spend"
+            backend = self.select_engine(spend_grid, len(channels), pre.n_vars, pre.budget, progress is not None)
+            if backend["selected"] == 'dp':
+                x, status, timings, model = self._solve_dp(spend_grid, returns, pre, progress)
             else:
-                # Apply lower bound constraint if it exists
-                if lower_bound and lower_bound.isdigit():
-                    model += spend_expr >= int(lower_bound), f"{c}_min_spend"
-
-                # Apply upper bound constraint if it exists
-                if upper_bound and upper_bound.isdigit():
-                    model += spend_expr <= int(upper_bound), f"{c}_max_spend"
-        total_return_expr = lpSum(
-            vars[c][i] * (
-                df_Grizzly[c][i] if "grizzly" in c else df_Velo[c][i]
-            )  * i
-            for c in channels
-            for i in range(len(df_place_hodler))
+                if progress is not None:
+                    progress = ReturnUnitsProgress(progress, returns, channel_spend_grid, pre)
+                x, status, timings, model = self._solve_milp(
+                    MILP_BACKENDS[backend["selected"]], channels, spend_grid, returns, pre, progress
+                )
+        timings = {"load": load_time, "presolve": presolve_time, **timings}
+
+        result = self.result(channels, x, returns, channel_spend_grid, status, timings, model, backend)
+        result["presolve"] = pre.removed if pre is not None else None
+        result["feasibility"] = report
+        return result
+
+    def backend(self, selected, reason):
+        return {"requested": self.engine, "selected": selected, "reason": reason}
+
+    def select_engine(self, spend_grid, n_channels, n_vars, budget, streaming=False):
+        """The ``backend`` entry for a problem: the requested engine, or the 'auto' policy's pick."""
+        if self.engine != 'auto':
+            return self.backend(self.engine, "requested")
+        return self.backend(*choose_engine(spend_grid, n_channels, n_vars, budget, streaming))
+
+    def result(self, channels, x, returns, channel_spend_grid, status, timings, model=None, backend=None):
+        """
+        Response for a channel x placement selection ``x``.
+
+        ``timings`` gets the extraction time added to it; ``model`` holds the
+        problem size and solver effort of the solve, and its ``gap`` and
+        ``lp_status`` are reported next to ``status``. ``backend`` says which
+        engine ran and why; it is reported with the engine's build and solve
+        time.
+        """
+        start = time.perf_counter()
+        backend = backend or self.backend(self.engine, "requested")
+        model = dict(model or {})
+        gap = model.pop("gap", None)
+        lp_status = model.pop("lp_status", status)
+        channel_spend, channel_return, total_return = self._summarize(
+            channels, x, returns, channel_spend_grid
         )
-        model += total_return_expr  # Add the objective function to the model
-        # Solve the model
-        model.solve()
-        channel_spend = {}
-        channel_return = {}
-        for c in channels:
-            spend = 0
-            ret = 0
-            for i in range(len(df_place_hodler)):
-                val = vars[c][i].varValue
-                if val is None:
-                    continue
-                if c.endswith("_velo"):
-                    spend += df_Velo.iloc[i, 0] * val
-                    ret += df_Velo[f"{c}"][i] * val * df_Velo.iloc[i, 0] 
-                elif c.endswith("_grizzly"):
-                    spend += df_Grizzly.iloc[i, 0] * val
-                    ret += df_Grizzly[f"{c}"][i] * val * df_Grizzly.iloc[i, 0] 
-            channel_spend[c] = spend
-            channel_return[c] = ret
-        total_return = sum(channel_return.values())
-        print("spend", channel_spend,
-            "return", channel_return,
-            "total_return", total_return,
-            "budget", self.budget)
+        logger.debug("spend %s return %s total_return %s budget %s",
+                     channel_spend, channel_return, total_return, self.budget)
+        timings["extract"] = timings.get("extract", 0.0) + time.perf_counter() - start
         return {
             "spend": channel_spend,
             "return": channel_return,
             "total_return": total_return,
-            "budget": self.budget
+            "budget": self.budget,
+            "status": status,
+            "lp_status": lp_status,
+            "gap": gap,
+            "engine": backend["selected"],
+            "backend": {**backend, "seconds": timings.get("build", 0.0) + timings.get("solve", 0.0)},
+            "timings": timings,
+            "model": model,
+        }
+
+    def frontier(self, budgets):
+        """
+        Solve the problem for every budget in ``budgets`` in one go.
+
+        The DP engine builds one table up to the largest budget and reads
+        every point off it; the MILP engines build the model once and only
+        change the budget row between solves.
+        """
+        curves = self.curves or curve_store.get()
+        channels, spend_grid, returns, channel_spend_grid = self.select_curves(curves)
+        lower, upper, frozen = channel_limits(channels, self.bounds_dict, self.frozen_channels_data)
+        budgets = sorted(budgets)
+        points = []
+
+        start = time.perf_counter()
+        backend = self.select_engine(spend_grid, len(channels), returns.size, budgets[-1])
+        if backend["selected"] == 'dp':
+            table = KnapsackTable(
+                spend_grid, placement_objective(returns), lower, upper, frozen, budgets[-1]
+            )
+            build_time = time.perf_counter() - start
+            for budget in budgets:
+                picks = table.choices(budget)
+                x = picks_to_selection(picks, returns.shape)
+                points.append((budget, x, "Optimal" if picks is not None else "Infeasible"))
+        else:
+            solver = MILP_BACKENDS[backend["selected"]]
+            placement_model = build_placement_model(
+                channels, spend_grid, returns, budgets[-1], lower, upper, frozen
+            )
+            problem = solver.build(placement_model)
+            build_time = time.perf_counter() - start
+            for budget in budgets:
+                solver.set_budget(problem, budget)
+                values, status, _ = solver.solve(problem, **self.solver_options)
+                points.append((budget, placement_model.selection(values), status))
+        solve_time = time.perf_counter() - start - build_time
+
+        frontier = []
+        for budget, x, status in points:
+            channel_spend, _, total_return = self._summarize(channels, x, returns, channel_spend_grid)
+            frontier.append({
+                "budget": budget,
+                "total_return": total_return,
+                "spend": channel_spend,
+                "status": status,
+            })
+        return {
+            "frontier": frontier,
+            "engine": backend["selected"],
+            "backend": {**backend, "seconds": build_time + solve_time},
+            "timings": {"build": build_time, "solve": solve_time},
+        }
+
+    @staticmethod
+    def _summarize(channels, x, returns, channel_spend_grid):
+        spend = (x * channel_spend_grid).sum(axis=1)
+        ret = (x * returns * channel_spend_grid).sum(axis=1)
+        channel_spend = dict(zip(channels, spend.tolist()))
+        channel_return = dict(zip(channels, ret.tolist()))
+        return channel_spend, channel_return, sum(channel_return.values())
+
+    def _solve_milp(self, solver, channels, spend_grid, returns, pre, progress=None):
+        if pre.n_vars == 0:
+            # Presolve fixed or ruled out every row; nothing is left to choose.
+            stats = {"variables": 0, "constraints": pre.n_rows, "iterations": 0, "nodes": 0, "gap": 0.0}
+            return pre.selection(np.zeros(returns.shape)), "Optimal", {"build": 0.0, "solve": 0.0}, stats
+
+        start = time.perf_counter()
+        nan = np.full(len(channels), np.nan)
+        placement_model = build_placement_model(channels, spend_grid, returns, self.budget, nan, nan, nan, pre)
+        problem = solver.build(placement_model)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        values, status, counts = solver.solve(problem, progress=progress, **self.solver_options)
+        solve_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        x = placement_model.selection(values)
+        if status in ("Optimal", "Feasible"):
+            x = pre.selection(x)
+        timings = {"build": build_time, "solve": solve_time, "extract": time.perf_counter() - start}
+        stats = {"variables": placement_model.n_vars, "constraints": placement_model.n_rows, **counts}
+        return x, status, timings, stats
+
+    def _solve_dp(self, spend_grid, returns, pre, progress=None):
+        start = time.perf_counter()
+        table = KnapsackTable(
+            spend_grid, placement_objective(returns), None, None, None, pre.budget, progress,
+            allowed=(pre.keep, ~pre.must_choose),
+        )
+        picks = table.choices(pre.budget)
+        solve_time = time.perf_counter() - start
+
+        status = "Optimal" if picks is not None else "Infeasible"
+        x = picks_to_selection(picks, returns.shape)
+        if picks is not None:
+            x = pre.selection(x)
+        timings = {"build": 0.0, "solve": solve_time}
+        return x, status, timings, knapsack_stats(table, pre.n_vars, pre.n_rows, status)
+
+
+def knapsack_stats(table, variables, constraints, status):
+    """Problem size of a DP solve in the MILP's terms; the table cells filled count as iterations."""
+    return {
+        "variables": variables,
+        "constraints": constraints,
+        "iterations": table.choice.size,
+        "nodes": None,
+        "gap": 0.0 if status == "Optimal" else None,
+    }
+
+
+def _same_limits(a, b):
+    return all(np.array_equal(x, y, equal_nan=True) for x, y in zip(a, b))
+
+
+class OptimizationSession:
+    """
+    One scenario's model and last solution, kept between interactive edits.
+
+    ``update`` merges a delta (budget, some channel limits, some frozen
+    channels) into the scenario and ``solve`` re-solves it incrementally:
+    the PuLP engine only replaces the rows of channels whose limits changed,
+    moves the budget row and warm-starts CBC from the previous incumbent;
+    the DP engine keeps its table while only the budget moves within it.
+    HiGHS has no such state and rebuilds the model on every solve. With
+    'auto' the engine is chosen again for every solve.
+    """
+
+    def __init__(self, opt, curves):
+        self.opt = opt
+        self.version = curves.version
+        self.channels, self.spend_grid, self.returns, self.channel_spend_grid = opt.select_curves(curves)
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self._limits = None
+        self._x = None
+        self._model_limits = None
+        self._table_limits = None
+        self._model = None
+        self._variables = None
+        self._channel_rows = None
+        self._table = None
+
+    @property
+    def n_vars(self):
+        return self.returns.size
+
+    @property
+    def nbytes(self):
+        """Approximate memory the session keeps between solves."""
+        size = self.returns.nbytes + self.channel_spend_grid.nbytes
+        if self._table is not None:
+            size += self._table.choice.nbytes + self._table.value.nbytes
+        if self._variables is not None:
+            size += SESSION_PULP_VARIABLE_BYTES * len(self._variables)
+        return size
+
+    def request(self, budget=None, channelLimits=None, frozen_channels_data=None):
+        """The OptimizationRequest of the scenario with a delta merged in, as ``update`` would merge it."""
+        return OptimizationRequest(
+            budget=self.opt.budget if budget is None else budget,
+            channelLimits={**self.opt.bounds_dict, **(channelLimits or {})},
+            frozen_channels_data={**self.opt.frozen_channels_data, **(frozen_channels_data or {})},
+            brand=self.opt.brand,
+            engine=self.opt.engine,
+            **self.opt.solver_options,
+        )
+
+    def update(self, budget=None, channelLimits=None, frozen_channels_data=None):
+        if budget is not None:
+            self.opt.budget = budget
+        if channelLimits:
+            self.opt.bounds_dict = {**self.opt.bounds_dict, **channelLimits}
+        if frozen_channels_data:
+            self.opt.frozen_channels_data = {**self.opt.frozen_channels_data, **frozen_channels_data}
+
+    def solve(self):
+        self.last_used = time.monotonic()
+        limits = channel_limits(self.channels, self.opt.bounds_dict, self.opt.frozen_channels_data)
+        backend = self.opt.select_engine(self.spend_grid, len(self.channels), self.n_vars, self.opt.budget)
+        if backend["selected"] == 'dp':
+            x, status, timings, model = self._solve_dp(limits)
+        elif backend["selected"] == 'highs':
+            x, status, timings, model = self._solve_highs(limits)
+        else:
+            x, status, timings, model = self._solve_pulp(limits)
+        self._limits = limits
+        self._x = x
+        return self.opt.result(
+            self.channels, x, self.returns, self.channel_spend_grid, status, timings, model, backend
+        )
+
+    def _solve_dp(self, limits):
+        start = time.perf_counter()
+        table = self._table
+        if (table is None or not _same_limits(limits, self._table_limits)
+                or self.opt.budget >= (table.capacity + 1) * table.unit):
+            table = KnapsackTable(self.spend_grid, placement_objective(self.returns), *limits, self.opt.budget)
+            # A table too big to keep is rebuilt by the next solve instead.
+            keep = table.choice.size <= MAX_SESSION_TABLE_CELLS
+            self._table = table if keep else None
+            self._table_limits = limits if keep else None
+        build_time = time.perf_counter() - start
+        picks = table.choices(self.opt.budget)
+        status = "Optimal" if picks is not None else "Infeasible"
+        timings = {"build": build_time, "solve": time.perf_counter() - start - build_time}
+        stats = knapsack_stats(table, self.returns.size, placement_rows(*limits), status)
+        return picks_to_selection(picks, self.returns.shape), status, timings, stats
+
+    def _solve_pulp(self, limits):
+        start = time.perf_counter()
+        if self._model is None:
+            placement_model = build_placement_model(
+                self.channels, self.spend_grid, self.returns, self.opt.budget, *limits
+            )
+            self._model, self._variables, row_constraints = to_pulp(placement_model)
+            self._budget_row = self._model.constraints[row_constraints["total_budget"][0]]
+            self._channel_rows = [
+                row_constraints.get(f"{c}_frozen_spend", []) + row_constraints.get(f"{c}_limit_spend", [])
+                for c in self.channels
+            ]
+        else:
+            self._apply_limits(limits)
+            self._budget_row.changeRHS(self.opt.budget)
+        # The previous solution, from whichever engine, is CBC's start; the
+        # first solve has none.
+        warm_start = self._x is not None
+        if warm_start:
+            for v, value in zip(self._variables, self._x.ravel().tolist()):
+                v.setInitialValue(value)
+        self._model_limits = limits
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        status, counts = solve_cbc(self._model, warm_start=warm_start, **self.opt.solver_options)
+        solve_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        x = solution_values(self._variables, status)
+        x = x.reshape(self.returns.shape)
+        timings = {"build": build_time, "solve": solve_time, "extract": time.perf_counter() - start}
+        stats = {
+            "variables": len(self._variables),
+            "constraints": self.returns.shape[0] + 1 + sum(1 for rows in self._channel_rows if rows),
+            **counts,
+        }
+        return x, status, timings, stats
+
+    def _solve_highs(self, limits):
+        start = time.perf_counter()
+        placement_model = build_placement_model(
+            self.channels, self.spend_grid, self.returns, self.opt.budget, *limits
+        )
+        solver = MILP_BACKENDS['highs']
+        problem = solver.build(placement_model)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        values, status, counts = solver.solve(problem, **self.opt.solver_options)
+        solve_time = time.perf_counter() - start
+        timings = {"build": build_time, "solve": solve_time}
+        stats = {"variables": placement_model.n_vars, "constraints": placement_model.n_rows, **counts}
+        return placement_model.selection(values), status, timings, stats
+
+    def _apply_limits(self, limits):
+        lower, upper, frozen = limits
+        old_lower, old_upper, old_frozen = self._model_limits
+        n_placements = self.returns.shape[1]
+        for k, c in enumerate(self.channels):
+            if _same_limits((lower[k], upper[k], frozen[k]), (old_lower[k], old_upper[k], old_frozen[k])):
+                continue
+            for name in self._channel_rows[k]:
+                del self._model.constraints[name]
+            if np.isnan(frozen[k]):
+                name, lo, hi = f"{c}_limit_spend", lower[k], upper[k]
+            else:
+                name, lo, hi = f"{c}_frozen_spend", frozen[k], frozen[k]
+            terms = list(zip(self._variables[k * n_placements:(k + 1) * n_placements], self.spend_grid.tolist()))
+            self._channel_rows[k] = add_pulp_row(
+                self._model, terms, name, np.nan_to_num(lo, nan=-np.inf), np.nan_to_num(hi, nan=np.inf)
+            )
+
+
+def monte_carlo_totals(returns, factor=None, draws=None, samples=0, seed=None,
+                       chunk_bytes=MONTE_CARLO_CHUNK_BYTES):
+    """
+    Total return of the per-channel ``returns`` under random return
+    multipliers, one total per sample.
+
+    The multipliers are either given as ``draws`` (samples x channels) or
+    drawn as ``1 + factor @ z`` for ``samples`` standard normal ``z``.
+    Samples are processed in chunks of at most ``chunk_bytes`` of
+    multipliers, each as one matrix product.
+    """
+    n = len(returns)
+    if draws is not None:
+        return sampled_totals(lambda batch: batch @ returns, 8 * n, draws=draws, chunk_bytes=chunk_bytes)
+    # The total is linear in the multipliers: 1 + factor @ z contributes
+    # returns.sum() + z @ (factor.T @ returns).
+    weights = factor.T @ returns
+    return sampled_totals(lambda z: returns.sum() + z @ weights, 8 * n, shape=(n,),
+                          samples=samples, seed=seed, chunk_bytes=chunk_bytes)
+
+
+RESULT_CACHE_SIZE = 256
+RESULT_CACHE_TTL = 600
+
+
+class ResultCache:
+    """
+    Bounded LRU cache of /optimize results with a time-to-live.
+
+    Concurrent calls for a key that is still being computed wait for the
+    first one instead of solving again.
+    """
+
+    def __init__(self, maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_or_submit(self, key, submit):
+        """
+        Return ``(future, hit)`` for ``key``: the future is already resolved
+        on a hit, the pending one if the same key is in flight, otherwise the
+        one from ``submit()``; ``hit`` tells the first case from the others,
+        which may be resolved by the time they are returned.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, result = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    future = Future()
+                    future.set_result(result)
+                    return future, True
+                del self._entries[key]
+                self.expirations += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = self._inflight[key] = Future()
+            self.misses += 1
+
+        try:
+            source = submit()
+        except BaseException as exc:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(exc)
+            raise
+        source.add_done_callback(lambda done: self._complete(key, future, done))
+        return future, False
+
+    def get_or_compute(self, key, compute):
+        def submit():
+            future = Future()
+            try:
+                future.set_result(compute())
+            except BaseException as exc:
+                future.set_exception(exc)
+            return future
+
+        return self.get_or_submit(key, submit)[0].result()
+
+    def _complete(self, key, future, source):
+        if source.cancelled():
+            # e.g. the executor shut down before running it; waiters must not hang.
+            with self._lock:
+                del self._inflight[key]
+            future.cancel()
+            return
+        exc = source.exception()
+        with self._lock:
+            del self._inflight[key]
+            if exc is None:
+                self._entries[key] = (time.monotonic() + self.ttl, source.result())
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        if exc is None:
+            future.set_result(source.result())
+        else:
+            future.set_exception(exc)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
+
+
+def request_key(input, version):
+    """
+    Canonical hash of an OptimizationRequest and the curve data version.
+
+    Requests that the optimizer treats the same hash the same: empty frozen
+    entries are dropped, limits are parsed the way ``channel_limits`` parses
+    them and limits of frozen channels are ignored.
+    """
+    frozen = {
+        c: int(v) for c, v in (input.frozen_channels_data or {}).items()
+        if v not in [None, [], {}, '']
+    }
+    limits = {}
+    for c, bounds in (input.channelLimits or {}).items():
+        if c in frozen or not isinstance(bounds, dict):
+            continue
+        lower_bound = _limit_value(bounds.get("lower"))
+        upper_bound = _limit_value(bounds.get("upper"))
+        if lower_bound is not None or upper_bound is not None:
+            limits[c] = [lower_bound, upper_bound]
+    payload = {
+        "budget": input.budget,
+        "brand": input.brand,
+        "engine": input.engine or 'auto',
+        "limits": limits,
+        "frozen": frozen,
+        "solver": _solver_options(input),
+        "version": version,
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+result_cache = ResultCache()
+
+
+# A warm worker takes about 130 MB next to the API process's 106 MB, so by
+# default the pool stops at MAX_SOLVER_WORKERS even on a host with more
+# CPUs; set SOLVER_WORKERS to size it explicitly.
+MAX_SOLVER_WORKERS = 2
+
+
+def _available_cpus():
+    """CPUs this process may run on, which in a container can be fewer than the host has."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+SOLVER_WORKERS = max(1, int(os.environ.get('SOLVER_WORKERS') or min(_available_cpus(), MAX_SOLVER_WORKERS)))
+SOLVER_QUEUE_LIMIT = 4 * SOLVER_WORKERS
+
+
+class SolverBusy(Exception):
+    pass
+
+
+# Set OPTIMIZER_WARMUP=0 to skip the warm-up solves: workers then start
+# cold and /readyz reports ready as soon as the curves are loaded.
+WARMUP = os.environ.get('OPTIMIZER_WARMUP', '1') != '0'
+WARMUP_ENGINES = ('dp', 'pulp', 'highs')
+
+
+def warm_up_solve(curves):
+    """
+    Solve one small request with every engine, so that the first real solve
+    in this process does not pay for SciPy's import or CBC's first launch.
+    """
+    budget = float(curves.brands['velo']['spend'][-1])
+    for engine in WARMUP_ENGINES:
+        SpendOptimization(budget, None, None, 'velo', curves=curves, engine=engine,
+                          time_limit=DEFAULT_TIME_LIMIT).run()
+
+
+def _init_solver_worker():
+    try:
+        curves = curve_store.get()
+    except FileNotFoundError:
+        return
+    if WARMUP:
+        start = time.perf_counter()
+        try:
+            warm_up_solve(curves)
+        except Exception:
+            logger.exception("Warm-up solve failed in worker %d", os.getpid())
+            return
+        logger.info("Worker %d warmed up in %.3fs", os.getpid(), time.perf_counter() - start)
+
+
+def solve_request(kwargs, progress=None):
+    return SpendOptimization(**kwargs).run(progress)
+
+
+def solve_frontier(kwargs, budgets):
+    return SpendOptimization(**kwargs).frontier(budgets)
+
+
+def _solver_context():
+    """
+    Multiprocessing context of the solver pool. Its processes are forked
+    from a fork server that has only imported this module: forking the
+    threaded API process itself can copy a lock held by another thread
+    (e.g. the import lock of a module being imported on first use), which
+    the child then waits on forever.
+    """
+    context = multiprocessing.get_context('forkserver')
+    if __name__ != '__main__':
+        context.set_forkserver_preload([__name__])
+    return context
+
+
+class SolverPool:
+    """
+    Process pool that runs the solves off the event loop.
+
+    At most ``queue_limit`` solves may be queued or running at once; beyond
+    that ``submit`` raises SolverBusy so the request can be rejected right
+    away instead of piling up.
+    """
+
+    def __init__(self, workers=SOLVER_WORKERS, queue_limit=SOLVER_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._lock = threading.Lock()
+        self._executor = None
+        self._manager = None
+        self._pending = 0
+        self._local_slots = threading.BoundedSemaphore(workers)
+
+    def submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.queue_limit:
+                raise SolverBusy(f"{self._pending} solves already queued")
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=_solver_context(), initializer=_init_solver_worker
+                )
+            future = self._executor.submit(fn, *args)
+            self._pending += 1
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future=None):
+        with self._lock:
+            self._pending -= 1
+
+    @contextlib.contextmanager
+    def local_solve(self):
+        """
+        Admit a solve that has to run in this process, like a session's
+        whose model lives here: it counts against the same queue limit as
+        submitted solves (SolverBusy beyond it), and at most ``workers`` of
+        them run at once.
+        """
+        with self._lock:
+            if self._pending >= self.queue_limit:
+                raise SolverBusy(f"{self._pending} solves already queued")
+            self._pending += 1
+        try:
+            with self._local_slots:
+                yield
+        finally:
+            self._release()
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def warm_up(self):
+        """
+        Start every worker and wait until all of them are up. Each submit
+        finds no idle worker and spawns one, and a worker only takes tasks
+        once its initializer (and so its warm-up solve) has finished.
+        """
+        futures = [self.submit(os.getpid) for _ in range(self.workers)]
+        return {future.result() for future in futures}
+
+    def progress(self):
+        """A new SolveProgress whose queue and flag live in the pool's manager process."""
+        with self._lock:
+            if self._manager is None:
+                self._manager = _solver_context().Manager()
+            manager = self._manager
+        return SolveProgress(manager.Queue(), manager.Event())
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            manager, self._manager = self._manager, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if manager is not None:
+            manager.shutdown()
+
+
+JOB_TTL = 3600
+MAX_JOBS = 1000
+
+
+class JobStore:
+    """
+    Keeps the futures of /optimize/jobs submissions; finished and cancelled
+    jobs expire after ``ttl``.
+
+    A job's future is the result cache's, which identical requests share,
+    so cancelling a job only stops it from reporting: the solve goes on and
+    its result is still cached.
+    """
+
+    def __init__(self, ttl=JOB_TTL, max_jobs=MAX_JOBS):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+
+    def add(self, future):
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = {"submitted": time.time(), "future": future}
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        future = job["future"]
+        status = {"id": job_id, "submitted": job["submitted"]}
+        if job.get("cancelled") or future.cancelled():
+            status["status"] = "cancelled"
+        elif not future.done():
+            status["status"] = "pending"
+        elif future.exception() is not None:
+            status["status"] = "failed"
+            status["error"] = repr(future.exception())
+        else:
+            status["status"] = "done"
+            status["result"] = future.result()
+        return status
+
+    def cancel(self, job_id):
+        """Cancel a pending job; returns its status, or None for an unknown id."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and not job["future"].done():
+                job["cancelled"] = True
+        return None if job is None else self.get(job_id)
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [j for j, job in self._jobs.items()
+                       if (job["future"].done() or job.get("cancelled")) and job["submitted"] < cutoff]:
+            del self._jobs[job_id]
+        while len(self._jobs) >= self.max_jobs:
+            self._jobs.popitem(last=False)
+
+
+SESSION_TTL = 900
+MAX_SESSIONS = 64
+MAX_SESSION_VARIABLES = 200_000
+# Memory the sessions may hold in the API process between edits. A session
+# keeps its DP table only up to MAX_SESSION_TABLE_CELLS (int32 choices);
+# a kept PuLP model costs about SESSION_PULP_VARIABLE_BYTES per variable
+# (the variables, their names and their constraint terms, as measured).
+MAX_SESSION_BYTES = 512 * 2**20
+MAX_SESSION_TABLE_CELLS = 10_000_000
+SESSION_PULP_VARIABLE_BYTES = 600
+
+
+class SessionStore:
+    """
+    LRU of OptimizationSession objects; sessions idle for ``ttl`` seconds
+    are dropped, and the least recently used ones once there are more than
+    ``max_sessions`` or they hold more than ``max_bytes`` together.
+    """
+
+    def __init__(self, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS, max_bytes=MAX_SESSION_BYTES):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+
+    def add(self, session):
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self._prune()
+            while len(self._sessions) >= self.max_sessions:
+                self._sessions.popitem(last=False)
+            self._sessions[session_id] = session
+            self._fit()
+        return session_id
+
+    def fit(self):
+        """Evict sessions until they fit ``max_bytes`` again, e.g. after a solve grew one."""
+        with self._lock:
+            self._fit()
+
+    def get(self, session_id):
+        with self._lock:
+            self._prune()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def remove(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.ttl
+        for session_id in [s for s, session in self._sessions.items() if session.last_used < cutoff]:
+            del self._sessions[session_id]
+
+    def _fit(self):
+        # The most recently used session stays even if it alone is too big.
+        total = sum(session.nbytes for session in self._sessions.values())
+        while total > self.max_bytes and len(self._sessions) > 1:
+            total -= self._sessions.popitem(last=False)[1].nbytes
+
+
+session_store = SessionStore()
+
+
+solver_pool = SolverPool()
+job_store = JobStore()
+
+
+STARTUP_PHASES = ('curves', 'overview', 'workers', 'streams') if WARMUP else ('curves',)
+
+
+class Readiness:
+    """
+    Startup phases of the service and how long each took.
+
+    ``imports`` is recorded when the module has been imported, the others by
+    the background warm-up started with the app. The service is ready once
+    every phase has finished; a failed phase keeps it unready.
+    """
+
+    def __init__(self, phases):
+        self.phases = dict.fromkeys(phases)
+        self.errors = {}
+        self.started = time.perf_counter()
+
+    def record(self, phase, seconds):
+        self.phases[phase] = seconds
+        logger.info("Startup phase %s took %.3fs", phase, seconds)
+
+    def run(self, phase, fn):
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception as exc:
+            logger.exception("Startup phase %s failed", phase)
+            self.errors[phase] = str(exc)
+            return False
+        self.record(phase, time.perf_counter() - start)
+        return True
+
+    @property
+    def ready(self):
+        return not self.errors and all(seconds is not None for seconds in self.phases.values())
+
+    def report(self):
+        status = "failed" if self.errors else "ready" if self.ready else "starting"
+        report = {
+            "status": status,
+            "phases": {phase: (None if seconds is None else round(seconds, 4))
+                       for phase, seconds in self.phases.items()},
         }
-    
+        if self.errors:
+            report["errors"] = self.errors
+        return report
+
+
+readiness = Readiness(('imports',) + STARTUP_PHASES)
+readiness.record('imports', time.perf_counter() - _import_started)
+
+
+def _load_overview():
+    try:
+        overview_store.get()
+    except FileNotFoundError:
+        logger.warning("Workbook not found at %s; /overview and /channels are unavailable", INPUT_PATH)
+
+
+def warm_up():
+    """Load the curves and overview, start the solver workers and the progress manager."""
+    if not readiness.run('curves', curve_store.get):
+        return
+    if WARMUP:
+        if not readiness.run('overview', _load_overview):
+            return
+        if not readiness.run('workers', solver_pool.warm_up):
+            return
+        # The manager process behind streamed progress is otherwise started
+        # by the first /optimize/stream request.
+        if not readiness.run('streams', solver_pool.progress):
+            return
+    logger.info("Ready %.3fs after startup", time.perf_counter() - readiness.started)
+
+
+warm_up_thread = None
+
+
+@app.on_event("startup")
+def start_warm_up():
+    global warm_up_thread
+    readiness.started = time.perf_counter()
+    warm_up_thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+    warm_up_thread.start()
+
+
+@app.on_event("shutdown")
+def shutdown_solver_pool():
+    # A warm-up still running would start workers and the progress manager
+    # after the shutdown, and the process would then wait on them at exit.
+    if warm_up_thread is not None:
+        warm_up_thread.join()
+    solver_pool.shutdown()
+
+
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    return JSONResponse(status_code=200 if readiness.ready else 503, content=readiness.report())
+
+
+@app.exception_handler(SolverBusy)
+def solver_busy(request, exc):
+    return JSONResponse(status_code=503, content={"error": f"Solver queue is full: {exc}"},
+                        headers={"Retry-After": "1"})
+
+
+SOLVE_PHASES = ('load', 'presolve', 'build', 'solve', 'extract')
+PHASE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+solve_phase_seconds = Histogram(
+    "optimize_solve_phase_seconds",
+    "Time spent in each phase of a solve.",
+    ["phase", "engine", "status", "variables", "constraints", "iterations"],
+    buckets=PHASE_BUCKETS,
+)
+request_phase_seconds = Histogram(
+    "optimize_request_phase_seconds",
+    "Response serialization and total time per endpoint.",
+    ["endpoint", "phase"],
+    buckets=PHASE_BUCKETS,
+)
+
+
+def _magnitude(n):
+    """Order-of-magnitude label for a count, so model sizes keep the label set small."""
+    if n is None:
+        return "none"
+    return "0" if n <= 0 else f"1e{len(str(int(n))) - 1}"
+
+
+def record_solve(result):
+    """Observe the phase timings of one solve, labeled by engine, status and model size."""
+    model = result.get("model") or {}
+    labels = (
+        result["engine"],
+        result["status"],
+        _magnitude(model.get("variables")),
+        _magnitude(model.get("constraints")),
+        _magnitude(model.get("iterations")),
+    )
+    for phase in SOLVE_PHASES:
+        if phase in result["timings"]:
+            solve_phase_seconds.labels(phase, *labels).observe(result["timings"][phase])
+
+
+def _record_solve_future(future):
+    if not future.cancelled() and future.exception() is None:
+        record_solve(future.result())
+
+
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.spend-optimization.columnar+json"
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+# Keys of a result that map each channel to a value.
+CHANNEL_MAPPINGS = ("spend", "return")
+
+
+def response_format(request):
+    """
+    Media type of the response: the first type in the Accept header that can
+    be produced, else plain JSON. msgpack needs the msgpack package.
+    """
+    available = (JSON, COLUMNAR_JSON) + (MSGPACK_TYPES if msgpack is not None else ())
+    for part in request.headers.get("accept", "").split(","):
+        media_type = part.split(";")[0].strip().lower()
+        if media_type in available:
+            return media_type
+    return JSON
+
+
+def columnar(content):
+    """
+    ``content`` with the channel -> value mappings of every result turned into
+    parallel arrays: one ``channels`` list and a value list per mapping.
+    """
+    if isinstance(content, list):
+        return [columnar(item) for item in content]
+    if not isinstance(content, dict):
+        return content
+    channels = next((list(content[key]) for key in CHANNEL_MAPPINGS if isinstance(content.get(key), dict)), None)
+    compact = {} if channels is None else {"channels": channels}
+    for key, value in content.items():
+        if key in CHANNEL_MAPPINGS and isinstance(value, dict) and list(value) == channels:
+            compact[key] = list(value.values())
+        else:
+            compact[key] = columnar(value)
+    return compact
+
+
+def encode_content(content, media_type=JSON):
+    """
+    Body of ``content`` in ``media_type``. Plain JSON keeps the nested
+    shape; the compact formats are columnar and use orjson (when installed)
+    or msgpack.
+    """
+    if media_type == JSON:
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+    content = columnar(content)
+    if media_type == COLUMNAR_JSON:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+    return msgpack.packb(content, use_bin_type=True)
+
+
+def timed_response(endpoint, content, start, timings=None, cached=False, media_type=JSON):
+    """
+    Response for ``content``, encoded as ``media_type`` (see response_format).
+
+    Serialization and the total time since ``start`` are recorded per
+    endpoint and reported, after the solve ``timings``, in a Server-Timing
+    header (in milliseconds).
+    """
+    serialize_start = time.perf_counter()
+    body = encode_content(content, media_type)
+    end = time.perf_counter()
+    timings = {**(timings or {}), "serialize": end - serialize_start, "total": end - start}
+    request_phase_seconds.labels(endpoint, "serialize").observe(timings["serialize"])
+    request_phase_seconds.labels(endpoint, "total").observe(timings["total"])
+
+    entries = ['cache;desc="hit"'] if cached else []
+    entries += [f"{name};dur={seconds * 1000:.3f}" for name, seconds in timings.items()]
+    return Response(body, media_type=media_type, headers={"Server-Timing": ", ".join(entries), "Vary": "Accept"})
+
+
+@app.get("/metrics")
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+# Server-side caps on the MILP solver options a request may ask for.
+DEFAULT_TIME_LIMIT = 30
+MAX_TIME_LIMIT = 120
+MAX_SOLVER_THREADS = os.cpu_count() or 1
+
+
+DEFAULT_ROBUSTNESS_SAMPLES = 1000
+MAX_ROBUSTNESS_SAMPLES = 100_000
+
+
+class RobustnessRequest(BaseModel):
+    """
+    Uncertainty of each channel's return curve, as a relative error: the
+    curve is scaled by a multiplier with mean 1. Give per-channel ``std``
+    (independent), a ``covariance`` matrix or explicit multiplier ``draws``
+    (one row per sample); the rows and columns of the latter two follow
+    ``channels``. Channels left out are taken as certain.
+    """
+    samples: int = DEFAULT_ROBUSTNESS_SAMPLES
+    seed: Optional[int] = None
+    std: Optional[Dict[str, float]] = None
+    channels: Optional[List[str]] = None
+    covariance: Optional[List[List[float]]] = None
+    draws: Optional[List[List[float]]] = None
+    percentiles: Optional[List[float]] = None
+
+
 # Define the Pydantic model to accept the budget in the request
 class OptimizationRequest(BaseModel):
     channelLimits: Optional[Dict[str, Any]] = None
     budget: Optional[int] = None
     frozen_channels_data: Optional[Dict[str, Any]] = None 
     brand: Optional[Union[int, str]] = None
+    engine: Optional[str] = None
+    time_limit: Optional[float] = None
+    mip_gap: Optional[float] = None
+    threads: Optional[int] = None
+    # Only /optimize evaluates it (the result then has a "robustness"
+    # summary); the other endpoints reject requests that set it.
+    robustness: Optional[RobustnessRequest] = None
 
-@app.post("/optimize")
-def optimize(input: OptimizationRequest):
-    if input.budget is not None:
-        opt = SpendOptimization(channelLimits=input.channelLimits ,frozen_channels_data=input.frozen_channels_data, budget=input.budget, brand=input.brand)
+def _solver_options(input):
+    """MILP solver options of a request, capped by the server limits."""
+    return {
+        "time_limit": min(input.time_limit or DEFAULT_TIME_LIMIT, MAX_TIME_LIMIT),
+        "mip_gap": input.mip_gap,
+        "threads": min(input.threads, MAX_SOLVER_THREADS) if input.threads else None,
+    }
+
+def _optimization_kwargs(input):
+    return {
+        "budget": input.budget,
+        "channelLimits": input.channelLimits,
+        "frozen_channels_data": input.frozen_channels_data,
+        "brand": input.brand,
+        "engine": input.engine,
+        **_solver_options(input),
+    }
+
+def _validate_solver_options(input):
+    if input.time_limit is not None and input.time_limit <= 0:
+        return {"error": "time_limit must be a positive number of seconds"}
+    if input.mip_gap is not None and not 0 <= input.mip_gap < 1:
+        return {"error": "mip_gap must be between 0 and 1"}
+    if input.threads is not None and input.threads < 1:
+        return {"error": "threads must be at least 1"}
+    return None
+
+def _check_feasibility(input):
+    # Runs in the API process so that infeasible requests never reach the
+    # solver pool; requests it cannot judge (e.g. an unknown brand) go on
+    # and fail the way they always did.
+    try:
+        report = SpendOptimization(**_optimization_kwargs(input)).check_feasibility()
+    except (KeyError, ValueError, FileNotFoundError):
+        return None
+    if report["feasible"]:
+        return None
+    return {"error": "The request's limits cannot be met", "feasibility": report}
+
+def _robustness_inputs(robustness, channels):
+    """``(factor, draws)`` for ``monte_carlo_totals`` in ``channels`` order; ValueError if malformed."""
+    position = {c: k for k, c in enumerate(channels)}
+    given = [robustness.std is not None, robustness.covariance is not None, robustness.draws is not None]
+    if sum(given) != 1:
+        raise ValueError("Give exactly one of std, covariance or draws")
+    if robustness.std is not None:
+        named = list(robustness.std)
     else:
+        named = robustness.channels or []
+        if not named:
+            raise ValueError("covariance and draws need the channels their columns belong to")
+    unknown = [c for c in named if c not in position]
+    if unknown:
+        raise ValueError(f"Unknown channels: {', '.join(unknown[:10])}")
+    cols = np.array([position[c] for c in named], dtype=int)
+    n = len(channels)
+
+    if robustness.std is not None:
+        factor = np.zeros((n, n))
+        factor[cols, cols] = list(robustness.std.values())
+        if np.any(np.diagonal(factor) < 0):
+            raise ValueError("std must not be negative")
+        return factor, None
+    if robustness.covariance is not None:
+        covariance = np.array(robustness.covariance, dtype=float)
+        if covariance.shape != (len(cols), len(cols)):
+            raise ValueError("covariance must be a square matrix with one row per channel")
+        factor = np.zeros((n, n))
+        factor[np.ix_(cols, cols)] = covariance_factor(covariance)
+        return factor, None
+    given_draws = np.array(robustness.draws, dtype=float)
+    if given_draws.ndim != 2 or given_draws.shape[1] != len(cols) or not len(given_draws):
+        raise ValueError("draws must have one row per sample and one column per channel")
+    if len(given_draws) > MAX_ROBUSTNESS_SAMPLES:
+        raise ValueError(f"At most {MAX_ROBUSTNESS_SAMPLES} draws")
+    draws = np.ones((len(given_draws), n))
+    draws[:, cols] = given_draws
+    return None, draws
+
+def _validate_robustness(input):
+    robustness = input.robustness
+    if robustness is None:
+        return None
+    if not 1 <= robustness.samples <= MAX_ROBUSTNESS_SAMPLES:
+        return {"error": f"robustness samples must be between 1 and {MAX_ROBUSTNESS_SAMPLES}"}
+    if robustness.percentiles is not None and not all(0 <= q <= 100 for q in robustness.percentiles):
+        return {"error": "robustness percentiles must be between 0 and 100"}
+    try:
+        channels = SpendOptimization(**_optimization_kwargs(input)).select_curves(curve_store.get())[0]
+    except (KeyError, FileNotFoundError):
+        return None
+    try:
+        _robustness_inputs(robustness, channels)
+    except ValueError as exc:
+        return {"error": f"Invalid robustness request: {exc}"}
+    return None
+
+def robustness_summary(robustness, result):
+    """Return distribution of a solved allocation under the request's curve uncertainty."""
+    channels = list(result["return"])
+    factor, draws = _robustness_inputs(robustness, channels)
+    returns = np.array([result["return"][c] for c in channels], dtype=float)
+    totals = monte_carlo_totals(returns, factor, draws, robustness.samples, robustness.seed)
+    return summarize_returns(totals, result["total_return"], robustness.percentiles or RISK_PERCENTILES)
+
+def _check_dp_size(input, budget):
+    # The worker refuses a DP table beyond MAX_KNAPSACK_CELLS, so a request
+    # for the 'dp' engine that needs one is turned away here.
+    if input.engine != 'dp':
+        return None
+    try:
+        channels, spend_grid, _, _ = SpendOptimization(budget, None, None, input.brand).select_curves(curve_store.get())
+    except (KeyError, FileNotFoundError):
+        return None
+    if knapsack_work(spend_grid, len(channels), len(channels) * len(spend_grid), budget) is None:
+        return {"error": "The 'dp' engine cannot take this budget at the curves' spend step; use another engine"}
+    return None
+
+def _validate(input):
+    if input.budget is None:
         return {"error": "Please provide a budget"}
+    if input.engine not in (None,) + ENGINES:
+        return {"error": f"Unknown engine: {input.engine}. Use one of {', '.join(ENGINES)}"}
+    if input.brand not in BRANDS:
+        return {"error": f"Unknown brand: {input.brand}. Use one of {', '.join(BRANDS)}"}
+    return (_validate_solver_options(input) or _validate_robustness(input) or _check_feasibility(input)
+            or _check_dp_size(input, input.budget))
+
+def _submit_optimization(input):
+    def submit():
+        future = solver_pool.submit(solve_request, _optimization_kwargs(input))
+        future.add_done_callback(_record_solve_future)
+        return future
+
+    key = request_key(input, curve_store.get().version)
+    return result_cache.get_or_submit(key, submit)
+
+@app.post("/optimize")
+async def optimize(input: OptimizationRequest, request: Request):
+    start = time.perf_counter()
+    # Both may re-hash or re-parse Input.xlsx after it changed, so they run
+    # off the event loop.
+    error = await asyncio.to_thread(_validate, input)
+    if error:
+        return error
+
+    future, cached = await asyncio.to_thread(_submit_optimization, input)
+    result = await asyncio.wrap_future(future)
+    timings = {} if cached else dict(result["timings"])
+    if input.robustness is not None:
+        # The cached result is shared, so the summary goes on a copy.
+        robustness_start = time.perf_counter()
+        summary = await asyncio.to_thread(robustness_summary, input.robustness, result)
+        result = {**result, "robustness": summary}
+        timings["robustness"] = time.perf_counter() - robustness_start
+    return timed_response("optimize", result, start, timings, cached, response_format(request))
+
+def _reject_robustness(*inputs):
+    if any(input.robustness is not None for input in inputs):
+        raise HTTPException(status_code=400, detail="robustness is only evaluated by POST /optimize")
+
+@app.post("/optimize/jobs")
+def submit_optimize_job(input: OptimizationRequest):
+    _reject_robustness(input)
+    error = _validate(input)
+    if error:
+        return error
+    job_id = job_store.add(_submit_optimization(input)[0])
+    return {"id": job_id, "status": "pending"}
+
+@app.get("/optimize/jobs/{job_id}")
+def get_optimize_job(job_id: str, request: Request):
+    start = time.perf_counter()
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return timed_response("jobs", job, start, media_type=response_format(request))
+
+@app.delete("/optimize/jobs/{job_id}")
+def cancel_optimize_job(job_id: str):
+    job = job_store.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return {"id": job_id, "status": job["status"]}
+
+MAX_BATCH_SCENARIOS = 100
+
+@app.post("/optimize/batch")
+async def optimize_batch(scenarios: List[OptimizationRequest], request: Request):
+    batch_start = time.perf_counter()
+    if len(scenarios) > MAX_BATCH_SCENARIOS:
+        return {"error": f"At most {MAX_BATCH_SCENARIOS} scenarios per batch"}
+    _reject_robustness(*scenarios)
+    # Keep one batch from filling the whole solver queue by itself.
+    slots = asyncio.Semaphore(solver_pool.workers)
+
+    async def run_scenario(scenario):
+        start = time.perf_counter()
+        error = await asyncio.to_thread(_validate, scenario)
+        if error:
+            return {"status": "error", **error, "elapsed": 0.0}
+        async with slots:
+            try:
+                future, _ = await asyncio.to_thread(_submit_optimization, scenario)
+                result = await asyncio.wrap_future(future)
+            except Exception as exc:
+                return {"status": "error", "error": repr(exc), "elapsed": time.perf_counter() - start}
+        return {"status": "ok", "result": result, "elapsed": time.perf_counter() - start}
+
+    results = await asyncio.gather(*(run_scenario(s) for s in scenarios))
+    return timed_response("batch", {"results": results}, batch_start, media_type=response_format(request))
+
+PROGRESS_POLL_INTERVAL = 0.25
+progress_streams = {}
+
+
+def sse_event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data, allow_nan=False)}\n\n"
+
+
+def cancel_solve(progress, future):
+    # A solve still waiting in the queue is dropped; a running one stops at
+    # its next progress check.
+    future.cancel()
+    progress.cancel()
+
+@app.post("/optimize/stream")
+async def optimize_stream(input: OptimizationRequest, request: Request):
+    """
+    Solve one scenario and stream its progress as Server-Sent Events:
+    ``started`` (with the stream id), ``progress`` (incumbents with their
+    objective and bound in ``total_return`` units, or DP channels done,
+    plus elapsed seconds), then one of
+    ``result``, ``cancelled`` or ``error``. Disconnecting or
+    DELETE /optimize/stream/{id} cancels the solve and frees its worker.
+    """
+    _reject_robustness(input)
+    error = await asyncio.to_thread(_validate, input)
+    if error:
+        return error
+    progress = await asyncio.to_thread(solver_pool.progress)
+    future = await asyncio.to_thread(solver_pool.submit, solve_request, _optimization_kwargs(input), progress)
+    future.add_done_callback(_record_solve_future)
+    stream_id = uuid.uuid4().hex
+    progress_streams[stream_id] = (progress, future)
+
+    async def events():
+        try:
+            yield sse_event("started", {"id": stream_id})
+            while True:
+                if await request.is_disconnected():
+                    return
+                done = future.done()
+                event = await asyncio.to_thread(progress.next_event, PROGRESS_POLL_INTERVAL)
+                if event is not None:
+                    yield sse_event("progress", event)
+                elif done:
+                    break
+            if future.cancelled() or isinstance(future.exception(), SolveCancelled):
+                yield sse_event("cancelled", {"id": stream_id})
+            elif future.exception() is not None:
+                yield sse_event("error", {"error": repr(future.exception())})
+            else:
+                yield sse_event("result", future.result())
+        finally:
+            progress_streams.pop(stream_id, None)
+            if not future.done():
+                cancel_solve(progress, future)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.delete("/optimize/stream/{stream_id}")
+def cancel_optimize_stream(stream_id: str):
+    entry = progress_streams.get(stream_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Unknown or finished stream id")
+    cancel_solve(*entry)
+    return {"id": stream_id, "cancelled": True}
+
+class SessionUpdate(BaseModel):
+    budget: Optional[int] = None
+    channelLimits: Optional[Dict[str, Any]] = None
+    frozen_channels_data: Optional[Dict[str, Any]] = None
+
+@app.post("/optimize/sessions")
+def create_optimize_session(input: OptimizationRequest, request: Request):
+    start = time.perf_counter()
+    _reject_robustness(input)
+    error = _validate(input)
+    if error:
+        return error
+    session = OptimizationSession(SpendOptimization(**_optimization_kwargs(input)), curve_store.get())
+    if session.n_vars > MAX_SESSION_VARIABLES:
+        return {"error": f"Scenario is too large for a session ({session.n_vars} variables)"}
+    with solver_pool.local_solve(), session.lock:
+        result = session.solve()
+    record_solve(result)
+    return timed_response("sessions", {"session_id": session_store.add(session), "result": result},
+                          start, result["timings"], media_type=response_format(request))
+
+@app.patch("/optimize/sessions/{session_id}")
+def update_optimize_session(session_id: str, update: SessionUpdate, request: Request):
+    start = time.perf_counter()
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired session id")
+    with solver_pool.local_solve(), session.lock:
+        # A rejected delta leaves the session as it was.
+        error = _validate(session.request(update.budget, update.channelLimits, update.frozen_channels_data))
+        if error:
+            return error
+        curves = curve_store.get()
+        if curves.version != session.version:
+            # Input.xlsx changed under the session; start over from the current curves.
+            session = OptimizationSession(session.opt, curves)
+            session_store.remove(session_id)
+            session_id = session_store.add(session)
+        session.update(update.budget, update.channelLimits, update.frozen_channels_data)
+        result = session.solve()
+    session_store.fit()
+    record_solve(result)
+    return timed_response("sessions", {"session_id": session_id, "result": result}, start, result["timings"],
+                          media_type=response_format(request))
+
+@app.delete("/optimize/sessions/{session_id}")
+def delete_optimize_session(session_id: str):
+    if not session_store.remove(session_id):
+        raise HTTPException(status_code=404, detail="Unknown or expired session id")
+    return {"session_id": session_id, "deleted": True}
+
+@app.get("/optimize/cache")
+def optimize_cache_stats():
+    return result_cache.stats()
+
+
+MAX_FRONTIER_POINTS = 200
+
+
+class FrontierRequest(BaseModel):
+    channelLimits: Optional[Dict[str, Any]] = None
+    frozen_channels_data: Optional[Dict[str, Any]] = None
+    brand: Optional[Union[int, str]] = None
+    engine: Optional[str] = None
+    time_limit: Optional[float] = None
+    mip_gap: Optional[float] = None
+    threads: Optional[int] = None
+    budget_min: int
+    budget_max: int
+    budget_step: int
+
+@app.post("/optimize/frontier")
+async def optimize_frontier(input: FrontierRequest, request: Request):
+    start = time.perf_counter()
+    if input.budget_step <= 0 or input.budget_min < 0 or input.budget_min > input.budget_max:
+        return {"error": "Please provide 0 <= budget_min <= budget_max and a positive budget_step"}
+    budgets = list(range(input.budget_min, input.budget_max + 1, input.budget_step))
+    if len(budgets) > MAX_FRONTIER_POINTS:
+        return {"error": f"At most {MAX_FRONTIER_POINTS} budget points per sweep"}
+    # The sweep is checked as the /optimize request at its largest budget:
+    # smaller budgets the limits cannot meet come back as infeasible points.
+    largest = OptimizationRequest(budget=input.budget_max, **input.model_dump(exclude={"budget_min", "budget_max", "budget_step"}))
+    error = await asyncio.to_thread(_validate, largest)
+    if error:
+        return error
+    future = await asyncio.to_thread(solver_pool.submit, solve_frontier, _optimization_kwargs(largest), budgets)
+    result = await asyncio.wrap_future(future)
+    return timed_response("frontier", result, start, result["timings"], media_type=response_format(request))
+
+
+# The overview sheets are addressed by position, the way the dashboard has
+# always read them: the channel mapping, the weekly activity per segment and
+# the weekly Rx totals with the activity per channel.
+OVERVIEW_SHEETS = {'mapping': 0, 'segments': 1, 'weekly': 2}
+OVERVIEW_PERIODS = ('quarter', 'yyyymm', 'year')
+# Mapping-sheet column of each grouping; 'dev' keeps the workbook's own columns.
+OVERVIEW_GROUPINGS = {'dev': None, 'channel': 'Channel', 'sub_category': 'Sub_Category', 'category': 'Category'}
+ACTIVITY_EXCLUDED = ('Actual Rx', 'Predicted Rx')
+SEGMENT_EXCLUDED = ('Actual Rx', 'Predicted Rx', 'HCP')
+OVERVIEW_GZIP_MIN_BYTES = 1024
+
+
+def week_labels(weeks):
+    """Date ('2023-01-02'), quarter ('2023Q1'), month ('2023-01') and year ('2023') of every week."""
+    import pandas as pd
+
+    dates = pd.to_datetime(pd.Series(weeks))
+    year = dates.dt.year.astype(str)
+    return {
+        'week': dates.dt.strftime('%Y-%m-%d').to_numpy(),
+        'quarter': (year + 'Q' + dates.dt.quarter.astype(str)).to_numpy(),
+        'yyyymm': dates.dt.strftime('%Y-%m').to_numpy(),
+        'year': year.to_numpy(),
+    }
+
+
+def activity_columns(df, excluded):
+    """
+    ``(names, values)``: the trimmed names of the numeric activity columns of
+    a sheet and their weeks x columns values, blanks counted as 0.
+    """
+    import pandas as pd
+
+    names, columns = [], []
+    for col in df.columns:
+        if col in ('Week', 'Segment') or col in excluded:
+            continue
+        values = pd.to_numeric(df[col], errors='coerce')
+        if values.isna().all():
+            continue
+        names.append(str(col).strip())
+        columns.append(values.fillna(0).to_numpy(dtype=float))
+    values = np.column_stack(columns) if columns else np.zeros((len(df), 0))
+    return names, values
+
+
+def column_groups(names, mapping):
+    """``(groups, onehot)``: group names in first-seen order and the columns x groups indicator."""
+    mapped = [mapping.get(name, name) for name in names]
+    groups = list(dict.fromkeys(mapped))
+    onehot = np.zeros((len(names), len(groups)))
+    onehot[np.arange(len(names)), [groups.index(g) for g in mapped]] = 1
+    return groups, onehot
+
+
+def overview_aggregates(mapping_df, segments_df, weekly_df):
+    """
+    Everything the overview page charts, summed per period.
+
+    ``weekly`` holds the weekly Rx series with each week's period labels.
+    ``activity[period][grouping]`` is ``{"groups", "values"}`` with values laid
+    out groups x periods, ``segments[period][grouping]`` the same per segment
+    (segments x periods x groups). Periods and segments are sorted; groups
+    follow the workbook's column order.
+    """
+    mappings = {'dev': {}}
+    for grouping, column in OVERVIEW_GROUPINGS.items():
+        if column is None:
+            continue
+        rows = mapping_df.dropna(subset=['variable', column]) if column in mapping_df else mapping_df.iloc[:0]
+        mappings[grouping] = {str(v).strip(): str(g).strip() for v, g in zip(rows['variable'], rows[column])}
+
+    weekly_periods = week_labels(weekly_df['Week'])
+    names, values = activity_columns(weekly_df, ACTIVITY_EXCLUDED)
+    activity = {}
+    for period in OVERVIEW_PERIODS:
+        labels, inverse = np.unique(weekly_periods[period], return_inverse=True)
+        per_period = np.zeros((len(labels), values.shape[1]))
+        np.add.at(per_period, inverse, values)
+        activity[period] = {"periods": labels.tolist()}
+        for grouping, mapping in mappings.items():
+            groups, onehot = column_groups(names, mapping)
+            activity[period][grouping] = {"groups": groups, "values": (per_period @ onehot).T.tolist()}
+
+    segment_periods = week_labels(segments_df['Week'])
+    segment_names, segment_values = activity_columns(segments_df, SEGMENT_EXCLUDED)
+    segment_labels, segment_inverse = np.unique(segments_df['Segment'].astype(str).str.strip(), return_inverse=True)
+    segments = {}
+    for period in OVERVIEW_PERIODS:
+        labels, inverse = np.unique(segment_periods[period], return_inverse=True)
+        cube = np.zeros((len(segment_labels), len(labels), segment_values.shape[1]))
+        np.add.at(cube, (segment_inverse, inverse), segment_values)
+        segments[period] = {"periods": labels.tolist(), "segments": segment_labels.tolist()}
+        for grouping, mapping in mappings.items():
+            groups, onehot = column_groups(segment_names, mapping)
+            segments[period][grouping] = {"groups": groups, "values": (cube @ onehot).tolist()}
+
+    weekly = {label: weekly_periods[label].tolist() for label in ('week',) + OVERVIEW_PERIODS}
+    for key, column in (("actual_rx", "Actual Rx"), ("predicted_rx", "Predicted Rx")):
+        weekly[key] = weekly_df[column].fillna(0).to_numpy(dtype=float).tolist()
+    return {"weekly": weekly, "activity": activity, "segments": segments}
+
+
+def load_overview(file_path, version=None):
+    """Parse the overview and curve sheets in one pass; returns ``(aggregates, channel headers)``."""
+    import pandas as pd
+
+    sheets = pd.read_excel(file_path, sheet_name=list(OVERVIEW_SHEETS.values()) + list(CURVE_SHEETS.values()))
+    aggregates = overview_aggregates(*(sheets[position] for position in OVERVIEW_SHEETS.values()))
+    channels = {brand: [str(c) for c in sheets[sheet].columns[1:]] for brand, sheet in CURVE_SHEETS.items()}
+    return Overview(version or _file_digest(file_path), {"overview": aggregates, "channels": channels})
+
+
+class Overview:
+    """
+    Overview aggregates and curve channel headers of one workbook version.
+
+    Each resource is encoded once, as compact JSON and gzipped, and served
+    with an ETag derived from the workbook's content hash.
+    """
+
+    def __init__(self, version, resources):
+        self.version = version
+        self.resources = resources
+        self._lock = threading.Lock()
+        self._encoded = {}
+
+    def encoded(self, name):
+        """``(etag, body, gzipped body)`` of a resource."""
+        with self._lock:
+            if name not in self._encoded:
+                content = {"version": self.version, name: self.resources[name]}
+                body = json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+                self._encoded[name] = (f'"{name}-{self.version[:16]}"', body, gzip.compress(body, 6))
+            return self._encoded[name]
+
+
+class OverviewStore:
+    """Process-wide cache of the Overview, re-parsed when the workbook's content hash changes."""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._data = None
+        self._mtime = None
+
+    def get(self):
+        mtime = os.stat(self.file_path).st_mtime_ns
+        data = self._data
+        if data is not None and mtime == self._mtime:
+            return data
+        with self._lock:
+            if self._data is None or mtime != self._mtime:
+                version = _file_digest(self.file_path)
+                if self._data is None or version != self._data.version:
+                    logger.info("Loading overview data from %s", self.file_path)
+                    self._data = load_overview(self.file_path, version)
+                self._mtime = mtime
+            return self._data
+
+
+overview_store = OverviewStore(INPUT_PATH)
+
+
+def _etag_matches(if_none_match, etags):
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") in etags for tag in tags)
+
+
+def conditional_response(request, endpoint, name, start):
+    """
+    The encoded ``name`` resource of the Overview, or a 304 when the client
+    already has it. Clients must revalidate (``no-cache``), so a page load
+    costs one conditional request while the workbook is unchanged.
+    """
+    try:
+        overview = overview_store.get()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Workbook not found")
+    etag, body, gzipped = overview.encoded(name)
+    use_gzip = len(body) >= OVERVIEW_GZIP_MIN_BYTES and "gzip" in request.headers.get("accept-encoding", "")
+    # The gzipped body is another representation and gets its own strong ETag.
+    gzip_etag = etag[:-1] + '-gzip"'
+    headers = {"ETag": gzip_etag if use_gzip else etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if _etag_matches(request.headers.get("if-none-match"), (etag, gzip_etag)):
+        response = Response(status_code=304, headers=headers)
+    elif use_gzip:
+        response = Response(gzipped, media_type="application/json", headers={**headers, "Content-Encoding": "gzip"})
+    else:
+        response = Response(body, media_type="application/json", headers=headers)
+    request_phase_seconds.labels(endpoint, "total").observe(time.perf_counter() - start)
+    return response
+
+
+@app.get("/overview")
+def overview(request: Request):
+    return conditional_response(request, "overview", "overview", time.perf_counter())
+
 
-    return opt.run()
+@app.get("/channels")
+def channel_headers(request: Request):
+    return conditional_response(request, "channels", "channels", time.perf_counter())
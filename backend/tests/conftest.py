@@ -0,0 +1,83 @@
+"""
+The API on a small synthetic workbook, for the endpoint tests.
+
+``client`` is a TestClient (which needs httpx) with fresh curve, overview,
+result, job and session stores; ``server`` serves the same app from
+uvicorn in a thread, for what the TestClient cannot do, e.g. read a
+stream while it is still being written.
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.dirname(HERE)
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.join(BACKEND, 'benchmarks'))
+
+# Workers start cold, and the app is ready once the curves are loaded.
+os.environ.setdefault('OPTIMIZER_WARMUP', '0')
+
+import spend_optimization  # noqa: E402
+import synthetic  # noqa: E402
+
+CHANNELS = 4
+PLACEMENTS = 21
+
+
+@pytest.fixture(scope='session')
+def workdir(tmp_path_factory):
+    """A directory laid out like the app's, with public/data/Input.xlsx."""
+    directory = tmp_path_factory.mktemp('app')
+    data = directory / 'public' / 'data'
+    data.mkdir(parents=True)
+    synthetic.write_curve_workbook(str(data / 'Input.xlsx'), CHANNELS, PLACEMENTS, overview_weeks=52)
+    # The solver workers come from a fork server that finds Input.xlsx
+    # relative to the directory it started in.
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(directory)
+        yield directory
+
+
+@pytest.fixture
+def app(workdir, monkeypatch):
+    path = str(workdir / 'public' / 'data' / 'Input.xlsx')
+    monkeypatch.setattr(spend_optimization, 'curve_store', spend_optimization.CurveStore(path))
+    monkeypatch.setattr(spend_optimization, 'overview_store', spend_optimization.OverviewStore(path))
+    monkeypatch.setattr(spend_optimization, 'result_cache', spend_optimization.ResultCache())
+    monkeypatch.setattr(spend_optimization, 'job_store', spend_optimization.JobStore())
+    monkeypatch.setattr(spend_optimization, 'session_store', spend_optimization.SessionStore())
+    return spend_optimization.app
+
+
+@pytest.fixture
+def client(app):
+    from fastapi.testclient import TestClient
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def server(app):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=0, log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        assert thread.is_alive(), "uvicorn did not start"
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    yield f'http://127.0.0.1:{port}'
+    server.should_exit = True
+    thread.join()
+
+
+@pytest.fixture
+def channels(app):
+    """Channel names of each brand."""
+    return {brand: sheet['channels'] for brand, sheet in spend_optimization.curve_store.get().brands.items()}
@@ -0,0 +1,53 @@
+"""
+/optimize/batch: results in input order, with a status per scenario, and
+failing scenarios that do not abort the others.
+"""
+import spend_optimization
+
+REQUEST = {'budget': 15000, 'brand': 'all'}
+
+
+def test_results_in_input_order(client):
+    scenarios = [{**REQUEST, 'budget': budget} for budget in (20000, 5000, 12000)]
+    results = client.post('/optimize/batch', json=scenarios).json()['results']
+    assert [r['status'] for r in results] == ['ok'] * len(scenarios)
+    for scenario, result in zip(scenarios, results):
+        assert result['result']['total_return'] == client.post('/optimize', json=scenario).json()['total_return']
+        assert result['elapsed'] >= 0
+
+
+def test_failing_scenarios_do_not_abort_the_batch(client, channels):
+    scenarios = [
+        REQUEST,
+        {**REQUEST, 'brand': 'nope'},
+        {'brand': 'all'},
+        {**REQUEST, 'frozen_channels_data': {channels['velo'][0]: REQUEST['budget'] + 500}},
+        {**REQUEST, 'engine': 'dp'},
+    ]
+    results = client.post('/optimize/batch', json=scenarios).json()['results']
+    assert [r['status'] for r in results] == ['ok', 'error', 'error', 'error', 'ok']
+    assert results[1]['error'].startswith("Unknown brand: nope")
+    assert results[2]['error'] == "Please provide a budget"
+    assert results[3]['error'] == "The request's limits cannot be met"
+    assert results[3]['feasibility']['feasible'] is False
+    assert results[4]['result']['total_return'] == results[0]['result']['total_return']
+
+
+def test_solver_error_is_reported_per_scenario(client, monkeypatch):
+    submit = spend_optimization.solver_pool.submit
+
+    def failing_submit(fn, kwargs, *args):
+        if kwargs['budget'] == 5000:
+            raise RuntimeError("worker died")
+        return submit(fn, kwargs, *args)
+
+    monkeypatch.setattr(spend_optimization.solver_pool, 'submit', failing_submit)
+    results = client.post('/optimize/batch', json=[{**REQUEST, 'budget': 5000}, REQUEST]).json()['results']
+    assert [r['status'] for r in results] == ['error', 'ok']
+    assert "worker died" in results[0]['error']
+
+
+def test_batch_limits(client):
+    too_many = [REQUEST] * (spend_optimization.MAX_BATCH_SCENARIOS + 1)
+    assert 'error' in client.post('/optimize/batch', json=too_many).json()
+    assert client.post('/optimize/batch', json=[{**REQUEST, 'robustness': {'samples': 10}}]).status_code == 400
@@ -0,0 +1,84 @@
+"""
+The /optimize result cache: hits, equivalent requests sharing an entry,
+coalescing of concurrent identical requests and the counters.
+"""
+import threading
+import time
+
+import spend_optimization
+
+REQUEST = {'budget': 15000, 'brand': 'all'}
+
+
+def _cache_hit(response):
+    return 'cache;desc="hit"' in response.headers['Server-Timing']
+
+
+def test_repeated_request_is_a_hit(client):
+    first = client.post('/optimize', json=REQUEST)
+    second = client.post('/optimize', json=REQUEST)
+    assert not _cache_hit(first)
+    assert _cache_hit(second)
+    assert second.json() == first.json()
+    stats = client.get('/optimize/cache').json()
+    assert (stats['hits'], stats['misses'], stats['size']) == (1, 1, 1)
+
+
+def test_equivalent_requests_share_an_entry(client, channels):
+    frozen, limited = channels['velo'][:2]
+    request = {**REQUEST, 'frozen_channels_data': {frozen: 1000}, 'channelLimits': {limited: {'upper': '5000'}}}
+    client.post('/optimize', json=request)
+    # A frozen channel's limits and empty frozen entries do not change the scenario.
+    equivalent = {
+        **request,
+        'frozen_channels_data': {frozen: '1000', channels['grizzly'][0]: ''},
+        'channelLimits': {limited: {'lower': '', 'upper': '5000'}, frozen: {'upper': '2000'}},
+    }
+    assert _cache_hit(client.post('/optimize', json=equivalent))
+    assert not _cache_hit(client.post('/optimize', json={**request, 'budget': REQUEST['budget'] + 500}))
+
+
+def test_concurrent_identical_requests_are_solved_once(client, monkeypatch):
+    submit = spend_optimization.solver_pool.submit
+    release = threading.Event()
+    submitted = []
+
+    def held_submit(fn, *args):
+        submitted.append(fn)
+        release.wait(30)
+        return submit(fn, *args)
+
+    # The first request stays in flight until the others have joined it.
+    monkeypatch.setattr(spend_optimization.solver_pool, 'submit', held_submit)
+    responses = [None] * 4
+
+    def send(k):
+        responses[k] = client.post('/optimize', json=REQUEST)
+
+    threads = [threading.Thread(target=send, args=(k,)) for k in range(len(responses))]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 30
+    while spend_optimization.result_cache.stats()['coalesced'] < len(responses) - 1:
+        assert time.monotonic() < deadline, "the requests were not coalesced"
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(submitted) == 1
+    assert all(response.json() == responses[0].json() for response in responses)
+    stats = client.get('/optimize/cache').json()
+    assert (stats['misses'], stats['coalesced'], stats['hits']) == (1, len(responses) - 1, 0)
+
+
+def test_least_recently_used_entry_is_evicted(client, monkeypatch):
+    monkeypatch.setattr(spend_optimization, 'result_cache', spend_optimization.ResultCache(maxsize=2))
+    budgets = [10000, 12000, 14000]
+    for budget in budgets[:2]:
+        client.post('/optimize', json={**REQUEST, 'budget': budget})
+    assert _cache_hit(client.post('/optimize', json={**REQUEST, 'budget': budgets[0]}))
+    client.post('/optimize', json={**REQUEST, 'budget': budgets[2]})
+    assert _cache_hit(client.post('/optimize', json={**REQUEST, 'budget': budgets[0]}))
+    assert not _cache_hit(client.post('/optimize', json={**REQUEST, 'budget': budgets[1]}))
+    assert client.get('/optimize/cache').json()['evictions'] == 2
@@ -0,0 +1,126 @@
+"""
+Cross-checks of the exact engines on small random problems.
+
+    python -m pytest -q backend/tests
+
+The placement engines (PuLP/CBC, HiGHS and the DP table) must agree on the
+status and the optimal total return, with presolve (``run``) and without it
+(a session's solve). The alpha optimizer's water-filling is exact for
+concave curves, so the local and piecewise engines must not beat it and
+should land close to it.
+"""
+import importlib.util
+import os
+import sys
+
+import numpy as np
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.dirname(HERE)
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.join(BACKEND, 'benchmarks'))
+
+import spend_optimization  # noqa: E402
+import synthetic  # noqa: E402
+
+PLACEMENT_ENGINES = ('pulp', 'highs', 'dp')
+SPEND_STEP = 100
+
+
+def _load_alpha():
+    path = os.path.join(BACKEND, 'alpha-version', 'SpendOptimization.py')
+    spec = importlib.util.spec_from_file_location('alpha_spend_optimization', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+alpha = _load_alpha()
+
+
+def random_problem(seed, channels=6, placements=12):
+    """Random curves for both brands and a request with some limits and frozen channels."""
+    rng = np.random.default_rng(seed)
+    spend = np.arange(placements) * float(SPEND_STEP)
+    brands = {
+        brand: {
+            'spend': spend,
+            'channels': [f'channel {k}_{brand}' for k in range(channels)],
+            'returns': np.round(rng.uniform(0, 3, size=(channels, placements)), 2),
+        }
+        for brand in spend_optimization.CURVE_SHEETS
+    }
+    curves = spend_optimization.CurveData(f'random-{seed}', brands)
+    brand = spend_optimization.BRANDS[seed % len(spend_optimization.BRANDS)]
+    names = [c for b in ('velo', 'grizzly') if brand in ('all', b) for c in brands[b]['channels']]
+    picked = rng.permutation(names)
+    frozen = {c: int(rng.integers(placements) * SPEND_STEP) for c in picked[:int(rng.integers(0, 3))]}
+    limits = {
+        c: {'lower': str(int(rng.integers(0, 3) * SPEND_STEP)),
+            'upper': str(int(rng.integers(4, placements) * SPEND_STEP))}
+        for c in picked[3:3 + int(rng.integers(0, 4))]
+    }
+    budget = int(rng.uniform(0.1, 0.7) * len(names) * spend[-1])
+    return curves, dict(budget=budget, channelLimits=limits, frozen_channels_data=frozen, brand=brand)
+
+
+def _optimizer(curves, request, engine):
+    return spend_optimization.SpendOptimization(curves=curves, engine=engine, mip_gap=0.0, **request)
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_placement_engines_agree(seed):
+    curves, request = random_problem(seed)
+    results = {engine: _optimizer(curves, request, engine).run() for engine in PLACEMENT_ENGINES}
+    statuses = {engine: result['status'] for engine, result in results.items()}
+    assert len(set(statuses.values())) == 1, statuses
+    if statuses['pulp'] != 'Optimal':
+        return
+    expected = results['pulp']['total_return']
+    for engine in PLACEMENT_ENGINES:
+        assert results[engine]['total_return'] == pytest.approx(expected, rel=1e-9, abs=1e-6), engine
+        assert sum(results[engine]['spend'].values()) <= request['budget'] + 1e-6
+        # Sessions build the model from the limits directly, without presolve.
+        session = spend_optimization.OptimizationSession(_optimizer(curves, request, engine), curves)
+        result = session.solve()
+        assert result['status'] == 'Optimal', engine
+        assert result['total_return'] == pytest.approx(expected, rel=1e-9, abs=1e-6), engine
+
+
+def test_dp_frontier_matches_single_solves():
+    curves, request = random_problem(0)
+    budgets = [request['budget'] // 4, request['budget'] // 2, request['budget']]
+    frontier = _optimizer(curves, {**request, 'budget': budgets[-1]}, 'dp').frontier(budgets)['frontier']
+    for point in frontier:
+        single = _optimizer(curves, {**request, 'budget': point['budget']}, 'pulp').run()
+        assert point['status'] == single['status']
+        assert point['total_return'] == pytest.approx(single['total_return'], rel=1e-9, abs=1e-6)
+
+
+@pytest.fixture(scope='module')
+def document(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('document')
+    prior_total = synthetic.write_document_workbook(
+        str(directory / 'Optimization_document.xlsx'), brands=2, medias=4, periods=4
+    )
+    return directory, prior_total
+
+
+def _alpha_run(engine, budget):
+    alpha._documents.clear()
+    return alpha.SpendOptimization(
+        budget=budget, media_budget_limits=None, media_budget_limits_pct=None,
+        locked_media_allocations=None, brand='all', brand_budget_constraints=None, engine=engine,
+    ).run()
+
+
+@pytest.mark.parametrize('engine', ['trust_constr', 'piecewise'])
+@pytest.mark.parametrize('share', [0.5, 1.0])
+def test_water_filling_is_optimal(document, monkeypatch, engine, share):
+    directory, prior_total = document
+    monkeypatch.chdir(directory)
+    exact = float(_alpha_run('water_filling', prior_total * share)['total_return'])
+    other = float(_alpha_run(engine, prior_total * share)['total_return'])
+    assert other <= exact * (1 + 1e-6)
+    assert other == pytest.approx(exact, rel=1e-3)
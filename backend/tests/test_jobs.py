@@ -0,0 +1,64 @@
+"""
+The /optimize/jobs API: submit, poll, cancel, and admission control of the
+solver pool.
+"""
+import time
+from concurrent.futures import Future
+
+import spend_optimization
+
+REQUEST = {'budget': 15000, 'brand': 'all'}
+
+
+def _poll(client, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f'/optimize/jobs/{job_id}').json()
+        if job['status'] != 'pending':
+            return job
+        assert time.monotonic() < deadline, "the job did not finish"
+        time.sleep(0.02)
+
+
+def test_job_result_matches_optimize(client):
+    submitted = client.post('/optimize/jobs', json=REQUEST).json()
+    assert submitted['status'] == 'pending'
+    job = _poll(client, submitted['id'])
+    assert job['status'] == 'done'
+    assert job['result']['total_return'] == client.post('/optimize', json=REQUEST).json()['total_return']
+
+
+def test_invalid_job_is_rejected_before_submission(client):
+    assert client.post('/optimize/jobs', json={**REQUEST, 'brand': 'nope'}).json() == {
+        'error': "Unknown brand: nope. Use one of all, velo, grizzly"
+    }
+    assert client.post('/optimize/jobs', json={**REQUEST, 'robustness': {'samples': 10}}).status_code == 400
+
+
+def test_unknown_job_is_404(client):
+    assert client.get('/optimize/jobs/nope').status_code == 404
+    assert client.delete('/optimize/jobs/nope').status_code == 404
+
+
+def test_cancelled_job_stays_cancelled(client, monkeypatch):
+    solve = Future()
+    monkeypatch.setattr(spend_optimization.solver_pool, 'submit', lambda fn, *args: solve)
+    job_id = client.post('/optimize/jobs', json=REQUEST).json()['id']
+    assert client.delete(f'/optimize/jobs/{job_id}').json() == {'id': job_id, 'status': 'cancelled'}
+    # The solve is shared with identical requests, so it still fills the cache.
+    solve.set_result({'total_return': 1.0})
+    assert client.get(f'/optimize/jobs/{job_id}').json()['status'] == 'cancelled'
+    assert client.get('/optimize/cache').json()['size'] == 1
+
+
+def test_finished_job_is_not_cancelled(client):
+    job_id = client.post('/optimize/jobs', json=REQUEST).json()['id']
+    _poll(client, job_id)
+    assert client.delete(f'/optimize/jobs/{job_id}').json()['status'] == 'done'
+
+
+def test_full_queue_is_503(client, monkeypatch):
+    monkeypatch.setattr(spend_optimization.solver_pool, 'queue_limit', 0)
+    response = client.post('/optimize/jobs', json=REQUEST)
+    assert response.status_code == 503
+    assert 'queue is full' in response.json()['error']
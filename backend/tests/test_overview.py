@@ -0,0 +1,73 @@
+"""
+/overview and /channels: ETags and 304s, gzip for large bodies only, and
+a new ETag once the workbook changes.
+"""
+import re
+
+import pytest
+
+import spend_optimization
+import synthetic
+
+IDENTITY = {'Accept-Encoding': 'identity'}
+GZIP = {'Accept-Encoding': 'gzip'}
+
+
+@pytest.mark.parametrize('name', ['overview', 'channels'])
+def test_unchanged_resource_is_304(client, name):
+    response = client.get(f'/{name}', headers=IDENTITY)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert re.fullmatch(rf'"{name}-[0-9a-f]{{16}}"', etag)
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert name in response.json()
+
+    for if_none_match in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+        revalidated = client.get(f'/{name}', headers={**IDENTITY, 'If-None-Match': if_none_match})
+        assert revalidated.status_code == 304
+        assert revalidated.content == b''
+        assert revalidated.headers['ETag'] == etag
+    assert client.get(f'/{name}', headers={**IDENTITY, 'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_large_body_is_gzipped_with_its_own_etag(client):
+    plain = client.get('/overview', headers=IDENTITY)
+    assert len(plain.content) >= spend_optimization.OVERVIEW_GZIP_MIN_BYTES
+    assert 'Content-Encoding' not in plain.headers
+
+    gzipped = client.get('/overview', headers=GZIP)
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert int(gzipped.headers['Content-Length']) < len(plain.content)
+    assert gzipped.json() == plain.json()
+    assert gzipped.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+    # Either representation's tag revalidates either one.
+    for etag in (plain.headers['ETag'], gzipped.headers['ETag']):
+        assert client.get('/overview', headers={**GZIP, 'If-None-Match': etag}).status_code == 304
+        assert client.get('/overview', headers={**IDENTITY, 'If-None-Match': etag}).status_code == 304
+
+
+def test_small_body_is_not_gzipped(client):
+    response = client.get('/channels', headers=GZIP)
+    assert len(response.content) < spend_optimization.OVERVIEW_GZIP_MIN_BYTES
+    assert 'Content-Encoding' not in response.headers
+    assert not response.headers['ETag'].endswith('-gzip"')
+
+
+def test_changed_workbook_gets_a_new_etag(client, monkeypatch, tmp_path):
+    path = str(tmp_path / 'Input.xlsx')
+    synthetic.write_curve_workbook(path, channels=3, placements=5, seed=0, overview_weeks=8)
+    monkeypatch.setattr(spend_optimization, 'overview_store', spend_optimization.OverviewStore(path))
+    first = client.get('/overview', headers=IDENTITY)
+    synthetic.write_curve_workbook(path, channels=3, placements=5, seed=1, overview_weeks=8)
+    second = client.get('/overview', headers={**IDENTITY, 'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert second.json() != first.json()
+
+
+def test_missing_workbook_is_404(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(spend_optimization, 'overview_store',
+                        spend_optimization.OverviewStore(str(tmp_path / 'Input.xlsx')))
+    assert client.get('/overview').status_code == 404
+    assert client.get('/channels').status_code == 404
@@ -0,0 +1,76 @@
+"""
+/optimize/sessions: incremental re-solves that match fresh solves of the
+merged scenario, deltas rejected without touching the session, and the
+bounds on session count and memory.
+"""
+import pytest
+
+import spend_optimization
+
+REQUEST = {'budget': 15000, 'brand': 'all'}
+
+
+def _create(client, **request):
+    return client.post('/optimize/sessions', json={**REQUEST, **request}).json()
+
+
+def _patch(client, session_id, **update):
+    return client.patch(f'/optimize/sessions/{session_id}', json=update)
+
+
+@pytest.mark.parametrize('engine', ['pulp', 'highs', 'dp'])
+def test_updates_match_fresh_solves(client, channels, engine):
+    scenario = {**REQUEST, 'engine': engine}
+    created = _create(client, engine=engine)
+    assert created['result']['total_return'] == client.post('/optimize', json=scenario).json()['total_return']
+    frozen, limited = channels['velo'][0], channels['grizzly'][1]
+    updates = [
+        {'frozen_channels_data': {frozen: 2000}},
+        {'channelLimits': {limited: {'lower': '1000', 'upper': '3000'}}},
+        {'budget': 9000},
+    ]
+    for update in updates:
+        result = _patch(client, created['session_id'], **update).json()['result']
+        # A session merges each delta into its scenario.
+        for key, value in update.items():
+            scenario[key] = {**scenario.get(key, {}), **value} if isinstance(value, dict) else value
+        assert result['total_return'] == pytest.approx(client.post('/optimize', json=scenario).json()['total_return'])
+
+
+def test_rejected_delta_leaves_the_session_unchanged(client, channels):
+    created = _create(client, engine='pulp')
+    session_id = created['session_id']
+    over_budget = _patch(client, session_id, frozen_channels_data={channels['velo'][0]: 10000},
+                         budget=5000).json()
+    assert over_budget['error'] == "The request's limits cannot be met"
+    assert _patch(client, session_id).json()['result']['total_return'] == created['result']['total_return']
+
+
+def test_unknown_and_deleted_sessions_are_404(client):
+    assert _patch(client, 'nope', budget=1000).status_code == 404
+    session_id = _create(client)['session_id']
+    assert client.delete(f'/optimize/sessions/{session_id}').json() == {'session_id': session_id, 'deleted': True}
+    assert _patch(client, session_id, budget=1000).status_code == 404
+    assert client.delete(f'/optimize/sessions/{session_id}').status_code == 404
+
+
+def test_least_recently_used_session_is_evicted_beyond_the_memory_bound(client):
+    store = spend_optimization.session_store
+    first = _create(client, engine='pulp')['session_id']
+    # Room for one and a half sessions of this size.
+    store.max_bytes = store.get(first).nbytes * 3 // 2
+    second = _create(client, engine='pulp')['session_id']
+    assert _patch(client, first, budget=1000).status_code == 404
+    assert _patch(client, second, budget=1000).status_code == 200
+
+
+def test_oldest_session_is_evicted_beyond_the_session_count(client):
+    spend_optimization.session_store.max_sessions = 2
+    first, second, third = (_create(client)['session_id'] for _ in range(3))
+    assert _patch(client, first, budget=1000).status_code == 404
+    assert all(_patch(client, s, budget=1000).status_code == 200 for s in (second, third))
+
+
+def test_too_large_scenario_is_refused(client, monkeypatch):
+    monkeypatch.setattr(spend_optimization, 'MAX_SESSION_VARIABLES', 1)
+    assert _create(client)['error'].startswith("Scenario is too large for a session")
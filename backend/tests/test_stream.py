@@ -0,0 +1,90 @@
+"""
+/optimize/stream: progress events and the result as Server-Sent Events,
+and cancellation by DELETE or by the client going away.
+
+The TestClient only hands over a stream once it is complete, so the
+cancellation tests read it from the ``server`` fixture instead. They keep
+every solver worker busy first, which holds the streamed solve in the
+queue until it is cancelled.
+"""
+import json
+import time
+
+import httpx
+import pytest
+
+import spend_optimization
+
+REQUEST = {'budget': 15000, 'brand': 'all'}
+BUSY_SECONDS = 3
+
+
+def _events(lines):
+    """``(event, data)`` of each Server-Sent Event in ``lines``."""
+    name = None
+    for line in lines:
+        if line.startswith('event: '):
+            name = line[len('event: '):]
+        elif line.startswith('data: '):
+            yield name, json.loads(line[len('data: '):])
+
+
+@pytest.fixture
+def busy_workers(app):
+    futures = [spend_optimization.solver_pool.submit(time.sleep, BUSY_SECONDS)
+               for _ in range(spend_optimization.solver_pool.workers)]
+    yield
+    for future in futures:
+        future.result()
+
+
+@pytest.mark.parametrize('engine', ['pulp', 'dp'])
+def test_stream_ends_with_the_result(client, engine):
+    request = {**REQUEST, 'engine': engine}
+    response = client.post('/optimize/stream', json=request)
+    assert response.headers['content-type'].startswith('text/event-stream')
+    events = list(_events(response.iter_lines()))
+    assert events[0][0] == 'started'
+    assert events[-1][0] == 'result'
+    result = events[-1][1]
+    assert result['total_return'] == client.post('/optimize', json=request).json()['total_return']
+    for name, progress in events[1:-1]:
+        assert name == 'progress'
+        assert progress['elapsed'] >= 0
+        # Incumbents are in total_return units, so none beats the optimum.
+        if progress.get('objective') is not None:
+            assert progress['objective'] <= result['total_return'] + 1e-6
+
+
+def test_invalid_stream_is_rejected_before_solving(client):
+    assert client.post('/optimize/stream', json={**REQUEST, 'brand': 'nope'}).json()['error'].startswith("Unknown brand")
+    assert client.post('/optimize/stream', json={**REQUEST, 'robustness': {'samples': 10}}).status_code == 400
+    assert client.delete('/optimize/stream/nope').status_code == 404
+
+
+def test_delete_cancels_the_solve(server, busy_workers):
+    with httpx.stream('POST', f'{server}/optimize/stream', json=REQUEST, timeout=30) as response:
+        events = _events(response.iter_lines())
+        name, started = next(events)
+        assert name == 'started'
+        cancelled = httpx.delete(f"{server}/optimize/stream/{started['id']}", timeout=30)
+        assert cancelled.json() == {'id': started['id'], 'cancelled': True}
+        assert [name for name, _ in events] == ['cancelled']
+    assert httpx.delete(f"{server}/optimize/stream/{started['id']}", timeout=30).status_code == 404
+
+
+def test_disconnect_cancels_the_solve(server, busy_workers):
+    with httpx.stream('POST', f'{server}/optimize/stream', json=REQUEST, timeout=30) as response:
+        name, started = next(_events(response.iter_lines()))
+        assert name == 'started'
+        progress, future = spend_optimization.progress_streams[started['id']]
+    deadline = time.monotonic() + BUSY_SECONDS
+    while not progress.cancelled():
+        assert time.monotonic() < deadline, "the solve was not cancelled"
+        time.sleep(0.02)
+    assert started['id'] not in spend_optimization.progress_streams
+    # The executor may already have handed the solve to a worker's queue;
+    # then the worker stops it at its first progress check.
+    if not future.cancelled():
+        with pytest.raises(spend_optimization.SolveCancelled):
+            future.result(timeout=30)
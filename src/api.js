@@ -0,0 +1,32 @@
+// Base URL of the optimization backend.
+export const API_URL = "https://adspendoptimizer.onrender.com";
+
+// The backend answers /overview and /channels with an ETag and
+// "Cache-Control: no-cache", so the browser revalidates its cached copy with
+// If-None-Match and usually gets a bodiless 304 back. Each resource is
+// fetched once per page load and shared by every component that needs it.
+const requests = {};
+
+const fetchResource = (name) => {
+  if (!requests[name]) {
+    requests[name] = fetch(`${API_URL}/${name}`)
+      .then((response) => {
+        if (!response.ok) {
+          throw new Error(`Failed to fetch ${name}`);
+        }
+        return response.json();
+      })
+      .then((content) => content[name])
+      .catch((error) => {
+        delete requests[name]; // Let the next caller retry
+        throw error;
+      });
+  }
+  return requests[name];
+};
+
+// Weekly Rx series plus the activity and segment sums per period and grouping.
+export const fetchOverview = () => fetchResource("overview");
+
+// Column headers of the Velo and Grizzly curve sheets.
+export const fetchChannelHeaders = () => fetchResource("channels");
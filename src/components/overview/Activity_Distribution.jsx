@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from "react";
 import { PieChart, Pie, Tooltip, Cell, ResponsiveContainer } from "recharts";
-import * as XLSX from "xlsx";
+import { fetchOverview } from "../../api";
 import { motion } from "framer-motion";
 
 const COLORS = [
@@ -12,206 +12,33 @@ const COLORS = [
   "#ff5252"
 ];
 
-// Columns to exclude
-const columnsToExclude = ["Actual Rx", "Predicted Rx"]; 
-
-// Fetching data from Excel
-const fetchExcelData = async () => {
-  const response = await fetch("/data/Input.xlsx");
-  const arrayBuffer = await response.arrayBuffer();
-  const workbook = XLSX.read(arrayBuffer, { type: "array" });
-  const sheetName = workbook.SheetNames[2]; 
-  const sheet = workbook.Sheets[sheetName];
-  const jsonData = XLSX.utils.sheet_to_json(sheet);
-  
-  // Filter out unwanted columns
-  const filteredData = jsonData.map((row) => {
-    const filteredRow = { ...row }; // Clone to avoid mutation
-    columnsToExclude.forEach((col) => {
-      delete filteredRow[col]; // Delete the column if it exists
-    });
-    return filteredRow;
-  });
-  return filteredData;
-};
-
-// Aggregating data based on selected option (quarter, year, or month)
-const aggregateData = (data, selectedOption) => {
-  const result = {};
-
-  data.forEach((item) => {
-    const rawDate = item.Week;
-    const date = new Date(rawDate);
-    const year = date.getFullYear();
-    const month = date.getMonth();
-    const quarter = Math.floor(month / 3) + 1;
-    const yyyymm = `${year}-${(month + 1).toString().padStart(2, '0')}`; // Year-Month format
-    const yearQuarter = `${year}Q${quarter}`;
-
-    let aggregationLevel;
-    if (selectedOption === "quarter") {
-      aggregationLevel = yearQuarter; // Aggregate by quarter
-    } else if (selectedOption === "year") {
-      aggregationLevel = year; // Aggregate by year
-    } else if (selectedOption === "yyyymm") {
-      aggregationLevel = yyyymm; // Aggregate by year-month
-    }
-
-    // Initialize the result object based on the aggregation level
-    if (!result[aggregationLevel]) {
-      result[aggregationLevel] = {};
-    }
-
-    Object.keys(item).forEach((key) => {
-      // Skip the columns to exclude
-      if (columnsToExclude.includes(key)) {
-        return;
-      }
-
-      if (key !== "Week") {
-        const cleanKey = key.trim();
-        const value = item[key];
-        if (isNaN(value)) {
-          return;
-        }
-
-        if (!result[aggregationLevel][cleanKey]) {
-          result[aggregationLevel][cleanKey] = 0;
-        }
-
-        result[aggregationLevel][cleanKey] += value;
-      }
-    });
-  });
-
-  return result;
-};
-
-// Pivoting aggregated data into usable format
-const pivotData = (aggregatedData) => {
-  const columns = Object.keys(aggregatedData).sort();
-  const rows = Array.from(new Set(Object.values(aggregatedData).flatMap(Object.keys)));
-
-  const pivotedData = rows.map((row) => {
-    const rowData = columns.map((column) => aggregatedData[column][row] || 0);
-    return { row, data: rowData };
-  });
+// Pivoting the backend's per-period sums into usable format
+const pivotData = (activity) => {
+  const columns = activity.periods;
+  const pivotedData = activity.groups.map((row, index) => ({ row, data: activity.values[index] }));
   return { columns, pivotedData };
 };
 
 // Dropdown menu logic
 const Activity_Distribution = ({ selectedOption, selectedValue }) => {
-  const [aggregatedData, setAggregatedData] = useState({});
+  const [overview, setOverview] = useState(null);
   const [pivotedData, setPivotedData] = useState({ columns: [], pivotedData: [] });
-  const [data, setData] = useState([]);
-  const [processedData, setProcessedData] = useState([]);
-  const [mappingData, setMappingData] = useState([]);
   const [currentOption, setCurrentOption] = useState("dev");
 
   useEffect(() => {
-    const loadData = async () => {
-      // Fetch main data
-      const fetchedData = await fetchExcelData();
-  
-      // Fetch mapping data for prod/business
-      const mappingResponse = await fetch("/data/Input.xlsx");
-      const mappingArrayBuffer = await mappingResponse.arrayBuffer();
-      const mappingWorkbook = XLSX.read(mappingArrayBuffer, { type: "array" });
-      const mappingSheetName = mappingWorkbook.SheetNames[0];
-      const mappingSheet = mappingWorkbook.Sheets[mappingSheetName];
-      const mappingJson = XLSX.utils.sheet_to_json(mappingSheet);
-  
-      // Update state versions
-      setData(fetchedData);
-      setMappingData(mappingJson);
-
-    };
-  
-    loadData();
+    fetchOverview()
+      .then(setOverview)
+      .catch((error) => console.error("Error fetching overview:", error));
   }, []);
-  console.log('ABCBA',data)
 
-useEffect(() => {
-      let tempData = data;
-      if (currentOption !== "dev" ) {
-        tempData = handleMapping(currentOption, data, mappingData);
-      }
-      const aggregated = aggregateData(tempData, selectedOption);
-      setAggregatedData(aggregated);
-
-      const pivot = pivotData(aggregated);
-      setPivotedData(pivot);
-
-}, [selectedOption, currentOption]);
-
-  // Handles mapping logic
-
-  const handleMapping = (option, dataArray, mappingJson) => {
-    let categoryMap = {};
-  
-    // Step 1: Create the mapping based on the selected option
-    if (option === "dev") {
-      return dataArray;
-    } else if (option === "channel") {
-      // Map for channel
-      categoryMap = mappingJson.reduce((acc, item) => {
-        if (item.variable && item.Channel) {
-          acc[item.variable.trim()] = item.Channel.trim();
-        }
-        return acc;  // Return accumulator to continue building the map
-      }, {});
-    } else if (option === "sub_category") {
-      // Map for sub_category
-      categoryMap = mappingJson.reduce((acc, item) => {
-        if (item.variable && item.Sub_Category) {
-          acc[item.variable.trim()] = item.Sub_Category.trim();
-        }
-        return acc;  // Return accumulator to continue building the map
-      }, {});
-    } else if (option === "category") {
-      // Map for category
-      categoryMap = mappingJson.reduce((acc, item) => {
-        if (item.variable && item.Category) {
-          acc[item.variable.trim()] = item.Category.trim();
-        }
-        return acc;  // Return accumulator to continue building the map
-      }, {});
+  useEffect(() => {
+    if (!overview) {
+      return;
     }
-  
-    // Step 2: Map through the dataArray and apply the transformation
-    const mappedData = dataArray.map((row) => {
-      const mappedRow = {};
-  
-      // Iterate over each key-value pair in the row
-      Object.entries(row).forEach(([key, value]) => {
-        // Skip columns to exclude
-        if (columnsToExclude.includes(key)) {
-          mappedRow[key] = value;
-          return;
-        }
-  
-        // Look up the mapped key in categoryMap
-        const mappedKey = categoryMap[key.trim()];
-        if (mappedKey) {
-          // If the mapped key exists, accumulate the values
-          if (!mappedRow[mappedKey]) {
-            mappedRow[mappedKey] = 0;
-          }
-          mappedRow[mappedKey] += Number(value) || 0;
-        } else {
-          // Otherwise, keep the original key
-          mappedRow[key] = value;
-        }
-      });
-  
-      return mappedRow;
-    });
-  
-    return mappedData;  // Return the final transformed data
-  };
-  
-  
-  
+    // Sums per channel ("dev") or per mapped channel/sub category/category
+    const byPeriod = overview.activity[selectedOption] ?? overview.activity.quarter;
+    setPivotedData(pivotData({ periods: byPeriod.periods, ...byPeriod[currentOption] }));
+  }, [overview, selectedOption, currentOption]);
 
   const getSelectedQuartersInselectedValue = () => {
     const sortedColumns = [...pivotedData.columns].sort();
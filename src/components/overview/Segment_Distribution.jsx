@@ -2,7 +2,7 @@ import React, { useState, useEffect } from "react";
 import {
   BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer,
 } from 'recharts';
-import * as XLSX from "xlsx";
+import { fetchOverview } from "../../api";
 import { motion } from "framer-motion";
 
 const COLORS = [
@@ -15,160 +15,45 @@ const COLORS = [
 ];
 
 
-// Columns to exclude
-const columnsToExclude = ["Actual Rx", "Predicted Rx", "HCP"]; 
-
-// Fetching data from Excel
-const fetchExcelData = async () => {
-  const response = await fetch("/data/Input.xlsx");
-  const arrayBuffer = await response.arrayBuffer();
-  const workbook = XLSX.read(arrayBuffer, { type: "array" });
-  const sheetName = workbook.SheetNames[1]; 
-  const sheet = workbook.Sheets[sheetName];
-  const jsonData = XLSX.utils.sheet_to_json(sheet);
-  
-  // Filter out unwanted columns
-  const filteredData = jsonData.map((row) => {
-    const filteredRow = { ...row }; // Clone to avoid mutation
-    columnsToExclude.forEach((col) => {
-      delete filteredRow[col]; // Delete the column if it exists
-    });
-    return filteredRow;
-  });
-  return filteredData;
-};
-
-// Aggregating data based on selected option (quarter, year, or month)
-const aggregateData = (data, selectedOption) => {
-  const result = {};
-
-  data.forEach((item) => {
-    const rawDate = item.Week;
-    const date = new Date(rawDate);
-    const year = date.getFullYear();
-    const month = date.getMonth();
-    const quarter = Math.floor(month / 3) + 1;
-    const yyyymm = `${year}-${(month + 1).toString().padStart(2, '0')}`;
-    const yearQuarter = `${year}Q${quarter}`;
-
-    let aggregationLevel;
-    if (selectedOption === "quarter") {
-      aggregationLevel = yearQuarter;
-    } else if (selectedOption === "year") {
-      aggregationLevel = year;
-    } else if (selectedOption === "yyyymm") {
-      aggregationLevel = yyyymm;
-
-    }
-
-    const segment = item.Segment;
-    const combinedKey = `${aggregationLevel}_${segment}`;
-
-    // ✅ Initialize combinedKey group
-    if (!result[combinedKey]) {
-      result[combinedKey] = {};
-    }
-
-    Object.keys(item).forEach((fieldKey) => {
-      if (columnsToExclude.includes(fieldKey)) return;
-      if (fieldKey === "Week" || fieldKey === "Segment") return;
-
-      const cleanKey = fieldKey.trim();
-      const value = item[fieldKey];
-
-      if (isNaN(value)) return;
-
-      if (!result[combinedKey][cleanKey]) {
-        result[combinedKey][cleanKey] = 0;
-      }
-
-      result[combinedKey][cleanKey] += value;
-    });
-  });
-
-  return result;
-};
-
-const convertAggregatedToTable = (aggregated) => {
-  const result = Object.entries(aggregated).map(([key, metrics]) => {
-    // Split the key into Time and Group, and trim any leading/trailing spaces
-    const [Time, Group] = key.split('_').map(value => value.trim());
-
-    // Return the transformed object with Time, Group, and metrics
-    return { Time, Group, ...metrics };
-  });
-
-  return result;
+// One row per period and segment, with the sum of every group
+const convertAggregatedToTable = (segments, grouping) => {
+  const { groups, values } = segments[grouping];
+  return segments.periods.flatMap((Time, periodIndex) =>
+    segments.segments.map((Group, segmentIndex) => {
+      const metrics = {};
+      groups.forEach((group, groupIndex) => {
+        metrics[group] = values[segmentIndex][periodIndex][groupIndex];
+      });
+      return { Time, Group, ...metrics };
+    })
+  );
 };
 
 
 
 // Dropdown menu logic
 const Segment_Distribution = ({ selectedOption, selectedValue, timelist }) => {
-  const [aggregatedData, setAggregatedData] = useState({});
-  const [data, setData] = useState([]);
-  const [aggregated_table, setAggregatedTable] = useState({});
-  const [mappingData, setMappingData] = useState([]);
+  const [overview, setOverview] = useState(null);
+  const [aggregated_table, setAggregatedTable] = useState([]);
   const [currentOption, setCurrentOption] = useState("dev");
   const [filteredData, setFilteredData] = useState([]);
   const [loading, setLoading] = useState(true);  // Track loading state
 
   useEffect(() => {
-    const loadData = async () => {
-      setLoading(true);
-      // Fetch main data
-      const fetchedData = await fetchExcelData();
-  
-      // Fetch mapping data for prod/business
-      const mappingResponse = await fetch("/data/Input.xlsx");
-      const mappingArrayBuffer = await mappingResponse.arrayBuffer();
-      const mappingWorkbook = XLSX.read(mappingArrayBuffer, { type: "array" });
-      const mappingSheetName = mappingWorkbook.SheetNames[0];
-      const mappingSheet = mappingWorkbook.Sheets[mappingSheetName];
-      const mappingJson = XLSX.utils.sheet_to_json(mappingSheet);
-  
-      // Update state versions
-      setData(fetchedData);
-      setMappingData(mappingJson);
-
-    };
-  
-    loadData();
+    fetchOverview()
+      .then(setOverview)
+      .catch((error) => console.error("Error fetching overview:", error));
   }, []);
 
   useEffect(() => {
-
-      // ✅ Map or not based on selectedOption
-      let tempData = data;
-      if (currentOption !== "dev" ) {
-        tempData = handleMapping(currentOption, data, mappingData);
+      if (!overview) {
+        return;
       }
-      
-      const aggregated = aggregateData(tempData, selectedOption);
-      setAggregatedData(aggregated);
-
-      const formattedAgg = convertAggregatedToTable(aggregated);
-      setAggregatedTable(formattedAgg)
-
-      const sortedData = [...formattedAgg].sort((a, b) => {
-        const timeA = a.Time;
-        const timeB = b.Time;
-  
-        if (timeA < timeB) return -1;
-        if (timeA > timeB) return 1;
-  
-        const groupA = a.Group;
-        const groupB = b.Group;
-  
-        if (groupA < groupB) return -1;
-        if (groupA > groupB) return 1;
-  
-        return 0;
-      });
-  
-      setAggregatedTable(sortedData);
+      // Periods and segments come sorted, so the table is ordered by Time, then Group
+      const segments = overview.segments[selectedOption] ?? overview.segments.quarter;
+      setAggregatedTable(convertAggregatedToTable(segments, currentOption));
       setLoading(false);
-}, [selectedValue, selectedOption, currentOption]);
+}, [overview, selectedValue, selectedOption, currentOption]);
 
   useEffect(() => {
     if (!loading) {
@@ -221,69 +106,6 @@ const Segment_Distribution = ({ selectedOption, selectedValue, timelist }) => {
   };
 
 
-  const handleMapping = (option, dataArray, mappingJson) => {
-    let categoryMap = {};
-  
-    // Step 1: Create the mapping based on the selected option
-    if (option === "dev") {
-      return dataArray;
-    } else if (option === "channel") {
-      // Map for channel
-      categoryMap = mappingJson.reduce((acc, item) => {
-        if (item.variable && item.Channel) {
-          acc[item.variable.trim()] = item.Channel.trim();
-        }
-        return acc;  // Return accumulator to continue building the map
-      }, {});
-    } else if (option === "sub_category") {
-      // Map for sub_category
-      categoryMap = mappingJson.reduce((acc, item) => {
-        if (item.variable && item.Sub_Category) {
-          acc[item.variable.trim()] = item.Sub_Category.trim();
-        }
-        return acc;  // Return accumulator to continue building the map
-      }, {});
-    } else if (option === "category") {
-      // Map for category
-      categoryMap = mappingJson.reduce((acc, item) => {
-        if (item.variable && item.Category) {
-          acc[item.variable.trim()] = item.Category.trim();
-        }
-        return acc;  // Return accumulator to continue building the map
-      }, {});
-    }
-  
-    // Step 2: Map through the dataArray and apply the transformation
-    const mappedData = dataArray.map((row) => {
-      const mappedRow = {};
-  
-      // Iterate over each key-value pair in the row
-      Object.entries(row).forEach(([key, value]) => {
-        // Skip columns to exclude
-        if (columnsToExclude.includes(key)) {
-          mappedRow[key] = value;
-          return;
-        }
-  
-        // Look up the mapped key in categoryMap
-        const mappedKey = categoryMap[key.trim()];
-        if (mappedKey) {
-          // If the mapped key exists, accumulate the values
-          if (!mappedRow[mappedKey]) {
-            mappedRow[mappedKey] = 0;
-          }
-          mappedRow[mappedKey] += Number(value) || 0;
-        } else {
-          // Otherwise, keep the original key
-          mappedRow[key] = value;
-        }
-      });
-  
-      return mappedRow;
-    });
-  
-    return mappedData;  // Return the final transformed data
-  };
   // Object.keys(aggregated_table[0])
 
   const keys = filteredData && filteredData.length > 0 
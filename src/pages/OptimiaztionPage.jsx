@@ -1,5 +1,5 @@
 import { useEffect, useState } from "react";
-import * as XLSX from "xlsx";
+import { API_URL, fetchChannelHeaders } from "../api";
 
 import { motion } from "framer-motion";
 import Header from "../components/common/Header";
@@ -95,7 +95,7 @@ const OptimizationPage = () => {
       return;
     }
     try {
-      const response = await fetch("https://adspendoptimizer.onrender.com/optimize", {
+      const response = await fetch(`${API_URL}/optimize`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
@@ -130,17 +130,9 @@ const OptimizationPage = () => {
     .toFixed(2);
   // Logic to filter and store spend data based on brand and section lock status
   const fetchFrozenChannels = async () => {
-  const response = await fetch("/data/Input.xlsx");
-  const arrayBuffer = await response.arrayBuffer();
-  const workbook = XLSX.read(arrayBuffer, { type: "array" });
-  // Sheet index 3 for velo
-  const veloSheet = workbook.Sheets[workbook.SheetNames[3]];
-  const veloData = XLSX.utils.sheet_to_json(veloSheet, { header: 1 });
-  const veloHeaders = veloData[0].slice(1).map((col) => ({ [`${col}_velo`]: null }));
-  // Sheet index 4 for grizzly
-  const grizzlySheet = workbook.Sheets[workbook.SheetNames[4]];
-  const grizzlyData = XLSX.utils.sheet_to_json(grizzlySheet, { header: 1 });
-  const grizzlyHeaders = grizzlyData[0].slice(1).map((col) => ({ [`${col}_grizzly`]: null }));
+  const headers = await fetchChannelHeaders();
+  const veloHeaders = headers.velo.map((col) => ({ [`${col}_velo`]: null }));
+  const grizzlyHeaders = headers.grizzly.map((col) => ({ [`${col}_grizzly`]: null }));
   return { veloHeaders, grizzlyHeaders };
   };
   useEffect(() => {
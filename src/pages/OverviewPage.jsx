@@ -1,7 +1,7 @@
 import { Crosshair, PillBottle, Pill } from "lucide-react";
 import { motion } from "framer-motion";
 import { useEffect, useState } from "react";
-import * as XLSX from "xlsx";
+import { fetchOverview } from "../api";
 import Activity_Distribution from "../components/overview/Activity_Distribution"; 
 import Segment_Distribution from "../components/overview/Segment_Distribution";
 import OverviewChart from "../components/overview/OverviewChart";
@@ -23,36 +23,17 @@ const OverviewPage = () => {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const response = await fetch("/data/Input.xlsx"); // Load the file from public folder
-        if (!response.ok) {
-          throw new Error("Failed to fetch data");
-        }
-        const arrayBuffer = await response.arrayBuffer();
-        const workbook = XLSX.read(arrayBuffer, { type: "array" });
-        const sheetName = workbook.SheetNames[2];
-        const sheet = workbook.Sheets[sheetName];
-        const jsonData = XLSX.utils.sheet_to_json(sheet);
-
-        // Add 'Month', 'Year', 'Quarter' columns to the data
-        const formattedData = jsonData.map((item) => {
-          const rawDate = item.Week;
-          const date = new Date(rawDate); // Convert the raw string to a Date object
-          const year = date.getFullYear();
-          const month = date.getMonth(); // Month index (0-11)
-          const quarter = Math.floor(month / 3) + 1; // 1, 2, 3, or 4 for Quarter
-          const formattedQuarter = `${year}Q${quarter}`;
-          const yyyymm = `${year}-${(month + 1).toString().padStart(2, "0")}`;
-
-          return {
-            name: item.Week,
-            actual_rx: item["Actual Rx"] || 0, // Ensure it defaults to 0 if undefined
-            pred_rx: item["Predicted Rx"],
-            year,
-            month,
-            formattedQuarter,
-            yyyymm,
-          };
-        });
+        const { weekly } = await fetchOverview();
+
+        // One row per week, with the period labels computed by the backend
+        const formattedData = weekly.week.map((week, i) => ({
+          name: week,
+          actual_rx: weekly.actual_rx[i],
+          pred_rx: weekly.predicted_rx[i],
+          year: weekly.year[i],
+          formattedQuarter: weekly.quarter[i],
+          yyyymm: weekly.yyyymm[i],
+        }));
 
         setSalesData(formattedData);
         setFilteredData(formattedData);